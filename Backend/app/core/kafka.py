@@ -23,6 +23,23 @@ class KafkaProducer:
         except Exception as e:
             print(f"Failed to publish to Kafka: {e}")
     
+    def publish_batch(self, topic: str, messages: list):
+        if not self.producer or not messages:
+            return
+        for message in messages:
+            try:
+                self.producer.produce(topic, json.dumps(message).encode('utf-8'), callback=self.delivery_report)
+            except BufferError:
+                # Local queue is full; serve delivery callbacks to drain it, then retry once
+                self.producer.poll(1)
+                try:
+                    self.producer.produce(topic, json.dumps(message).encode('utf-8'), callback=self.delivery_report)
+                except Exception as e:
+                    print(f"Failed to publish to Kafka: {e}")
+            except Exception as e:
+                print(f"Failed to publish to Kafka: {e}")
+        self.producer.poll(0)
+    
     def delivery_report(self, err, msg):
         if err is not None:
             print(f"Message delivery failed: {err}")
@@ -0,0 +1,233 @@
+import time
+import atexit
+import asyncio
+import logging
+import threading
+import httpx
+import numpy as np
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+COMPUTE_ROUTES_URL = "https://routes.googleapis.com/directions/v2:computeRoutes"
+COMPUTE_ROUTE_MATRIX_URL = "https://routes.googleapis.com/distanceMatrix/v2:computeRouteMatrix"
+
+class RoutesProviderError(Exception):
+    pass
+
+class CircuitOpenError(RoutesProviderError):
+    pass
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failed or slow calls and rejects
+    calls until `reset_seconds` pass; then one trial call decides whether it closes."""
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0, slow_call_seconds: float = 2.0):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.slow_call_seconds = slow_call_seconds
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self._opened_at >= self.reset_seconds:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record(self, ok: bool, elapsed: float):
+        with self._lock:
+            self._trial_in_flight = False
+            if ok and elapsed <= self.slow_call_seconds:
+                self._failures = 0
+                self._opened_at = None
+                return
+            self._failures += 1
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logger.warning(f"Routes provider circuit opened after {self._failures} failed or slow calls")
+                self._opened_at = time.monotonic()
+
+class LatencyStats:
+    """Outcome counters plus latency percentiles over the last `window` calls"""
+
+    def __init__(self, window: int = 1000):
+        self._latencies = deque(maxlen=window)
+        self._counts = {"ok": 0, "error": 0, "timeout": 0, "short_circuited": 0}
+        self._lock = threading.Lock()
+
+    def record(self, outcome: str, elapsed: Optional[float] = None):
+        with self._lock:
+            self._counts[outcome] += 1
+            if elapsed is not None:
+                self._latencies.append(elapsed)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            latencies = np.array(self._latencies, dtype=np.float64)
+            stats = dict(self._counts)
+        if latencies.size:
+            p50, p95 = np.percentile(latencies, [50, 95])
+            stats.update(p50_ms=round(p50 * 1000, 1), p95_ms=round(p95 * 1000, 1), max_ms=round(latencies.max() * 1000, 1))
+        return stats
+
+class RoutesClient:
+    """Shared Google Routes client: pooled keep-alive connections, strict deadlines,
+    a circuit breaker so callers fall back immediately while the provider is down
+    or slow, and latency metrics. Every call raises RoutesProviderError (or
+    CircuitOpenError) on failure; callers own the fallback."""
+
+    def __init__(
+        self,
+        api_key: Optional[str],
+        timeout: float = 3.0,
+        connect_timeout: float = 1.0,
+        max_connections: int = 20,
+        breaker: Optional[CircuitBreaker] = None
+    ):
+        self.api_key = api_key
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.deadline = timeout + connect_timeout
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self.breaker = breaker or CircuitBreaker()
+        self.latency = LatencyStats()
+        self._client: Optional[httpx.Client] = None
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._executor = ThreadPoolExecutor(max_workers=max_connections, thread_name_prefix="routes")
+        self._lock = threading.Lock()
+
+    @property
+    def client(self) -> httpx.Client:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = httpx.Client(timeout=self.timeout, limits=self.limits)
+        return self._client
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        # One pool for the app's event loop, opened on first use and released by aclose()
+        if self._async_client is None or self._async_client.is_closed:
+            self._async_client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits)
+        return self._async_client
+
+    def _headers(self, field_mask: str) -> Dict[str, str]:
+        if not self.api_key:
+            raise RoutesProviderError("Google Maps API key is not configured")
+        return {"Content-Type": "application/json", "X-Goog-Api-Key": self.api_key, "X-Goog-FieldMask": field_mask}
+
+    def _before_call(self):
+        if not self.breaker.allow():
+            self.latency.record("short_circuited")
+            raise CircuitOpenError("Routes provider circuit is open")
+
+    def _after_call(self, started: float, response: Optional[httpx.Response], error: Optional[Exception]) -> Any:
+        elapsed = time.perf_counter() - started
+        if error is not None or response.status_code != 200:
+            self.breaker.record(False, elapsed)
+            if isinstance(error, (httpx.TimeoutException, asyncio.TimeoutError)):
+                self.latency.record("timeout", elapsed)
+                raise RoutesProviderError(f"Routes API timed out after {elapsed:.2f}s") from error
+            self.latency.record("error", elapsed)
+            if error is not None:
+                raise RoutesProviderError(f"Routes API request failed: {error}") from error
+            raise RoutesProviderError(f"Routes API error: {response.status_code} - {response.text}")
+        self.breaker.record(True, elapsed)
+        self.latency.record("ok", elapsed)
+        return response.json()
+
+    def post(self, url: str, payload: Dict[str, Any], field_mask: str) -> Any:
+        headers = self._headers(field_mask)
+        self._before_call()
+        started = time.perf_counter()
+        response, error = None, None
+        try:
+            response = self.client.post(url, headers=headers, json=payload)
+        except Exception as e:
+            error = e
+        return self._after_call(started, response, error)
+
+    async def apost(self, url: str, payload: Dict[str, Any], field_mask: str) -> Any:
+        headers = self._headers(field_mask)
+        self._before_call()
+        started = time.perf_counter()
+        response, error = None, None
+        try:
+            response = await asyncio.wait_for(
+                self.async_client.post(url, headers=headers, json=payload), timeout=self.deadline
+            )
+        except Exception as e:
+            error = e
+        return self._after_call(started, response, error)
+
+    @staticmethod
+    def _first_route(data: Dict[str, Any]) -> Dict[str, Any]:
+        if "routes" not in data or not data["routes"]:
+            raise RoutesProviderError("No routes found in response")
+        return data["routes"][0]
+
+    def compute_route(self, payload: Dict[str, Any], field_mask: str) -> Dict[str, Any]:
+        return self._first_route(self.post(COMPUTE_ROUTES_URL, payload, field_mask))
+
+    async def acompute_route(self, payload: Dict[str, Any], field_mask: str) -> Dict[str, Any]:
+        return self._first_route(await self.apost(COMPUTE_ROUTES_URL, payload, field_mask))
+
+    def compute_route_matrix(self, payload: Dict[str, Any], field_mask: str) -> List[Dict[str, Any]]:
+        return self.post(COMPUTE_ROUTE_MATRIX_URL, payload, field_mask)
+
+    async def acompute_route_matrix(self, payload: Dict[str, Any], field_mask: str) -> List[Dict[str, Any]]:
+        return await self.apost(COMPUTE_ROUTE_MATRIX_URL, payload, field_mask)
+
+    def compute_routes(self, requests: Sequence[Tuple[Dict[str, Any], str]]) -> List[Any]:
+        """Overlapping compute_route calls over the shared pool; failed calls yield their exception"""
+        futures = [self._executor.submit(self.compute_route, payload, mask) for payload, mask in requests]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+        return results
+
+    async def acompute_routes(self, requests: Sequence[Tuple[Dict[str, Any], str]]) -> List[Any]:
+        return await asyncio.gather(
+            *(self.acompute_route(payload, mask) for payload, mask in requests), return_exceptions=True
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.latency.snapshot(), "circuit": self.breaker.state}
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+        self._executor.shutdown(wait=False)
+
+    async def aclose(self):
+        """Release the async pool; run on app shutdown inside the loop that used it"""
+        client, self._async_client = self._async_client, None
+        if client is not None:
+            await client.aclose()
+
+routes_client = RoutesClient(settings.GOOGLE_MAPS_API_KEY)
+atexit.register(routes_client.close)
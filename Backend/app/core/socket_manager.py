@@ -1,5 +1,5 @@
 import socketio
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple
 import asyncio
 
 sio_server = socketio.AsyncServer(
@@ -47,6 +47,12 @@ class SocketManager:
             "order_id": order_id,
             "update_data": update_data
         }, room=f"order_{order_id}")
+
+    @staticmethod
+    async def notify_order_updates(updates: List[Tuple[str, Dict[str, Any]]]):
+        await asyncio.gather(*(
+            SocketManager.notify_order_update(order_id, data) for order_id, data in updates
+        ), return_exceptions=True)
     
     @staticmethod
     async def notify_new_order_to_driver(driver_id: str, order_data: Dict[str, Any]):
@@ -56,6 +62,12 @@ class SocketManager:
     async def notify_order_offer(driver_id: str, order_data: Dict[str, Any]):
         await sio_server.emit("order_offer", order_data, room=f"driver_{driver_id}")
     
+    @staticmethod
+    async def notify_order_offers(offers: List[Tuple[str, Dict[str, Any]]]):
+        await asyncio.gather(*(
+            SocketManager.notify_order_offer(driver_id, data) for driver_id, data in offers
+        ), return_exceptions=True)
+    
     @staticmethod
     async def notify_order_accepted(order_id: str, driver_id: str, driver_name: str):
         await sio_server.emit("order_accepted", {
@@ -102,6 +114,12 @@ class SocketManager:
             
         await sio_server.emit("driver_allocated", payload, room=f"driver_{driver_id}")
     
+    @staticmethod
+    async def notify_driver_allocations(allocations: List[Dict[str, Any]]):
+        await asyncio.gather(*(
+            SocketManager.notify_driver_allocation(**allocation) for allocation in allocations
+        ), return_exceptions=True)
+    
     # Safety alerts
     @staticmethod
     async def notify_safety_alert(driver_id: str, alert_data: Dict[str, Any]):
@@ -120,6 +138,12 @@ class SocketManager:
     async def notify_driver_assignment(driver_id: str, assignment_data: Dict[str, Any]):
         await sio_server.emit("driver_assigned", assignment_data, room=f"driver_{driver_id}")
 
+    @staticmethod
+    async def notify_driver_assignments(assignments: List[Dict[str, Any]]):
+        await asyncio.gather(*(
+            SocketManager.notify_driver_assignment(a["driver_id"], a) for a in assignments
+        ), return_exceptions=True)
+
     @staticmethod
     async def notify_order_offer_expired(driver_id: str, order_id: str):
         await sio_server.emit("order_offer_expired", {"order_id": order_id}, room=f"driver_{driver_id}")
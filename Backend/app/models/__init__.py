@@ -7,7 +7,7 @@ from app.models.assignment import Assignment
 from app.models.break_model import Break
 from app.models.sensor_record import SensorRecord
 from app.models.event import Event
-from app.models.gps_track import GPSTrack
+from app.models.gps_track import GPSTrack, GPSTrackPartition
 from app.models.analytics import DailyMetrics, Demand, GenInsights, DriverMetrics, ZoneMetrics, PerformanceReport
 from app.models.weather import Weather
 
@@ -22,6 +22,7 @@ __all__ = [
     "SensorRecord",
     "Event",
     "GPSTrack",
+    "GPSTrackPartition",
     "DailyMetrics",
     "Demand",
     "GenInsights",
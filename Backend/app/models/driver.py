@@ -18,6 +18,8 @@ class Driver(Base):
     status = Column(String, default="offline")  
 
     location = Column(Geometry('POINT'))
+    # When the fix in location was taken; guards the location write-behind against stale fixes
+    location_updated_at = Column(DateTime)
     current_speed = Column(Float, default=0.0)
     heading = Column(Float, default=0.0)
 
@@ -29,6 +31,9 @@ class Driver(Base):
     exit_time = Column(DateTime)
     duty_status = Column(String, default="off_duty")
     orders_received = Column(Integer, default=0)
+    # Maintained on every flush by app.services.driver_capacity_service
+    active_orders = Column(Integer, default=0, server_default="0", nullable=False)  # assigned + picked_up
+    offered_orders = Column(Integer, default=0, server_default="0", nullable=False)  # exclusive offers awaiting a reply
 
     rating = Column(Float, default=0.0)
     breaks = Column(Integer, default=0)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, ForeignKey, Float, DateTime
+from sqlalchemy import Column, String, ForeignKey, Float, DateTime, Date, Integer, Index, PrimaryKeyConstraint
 from geoalchemy2 import Geometry
 from sqlalchemy.orm import relationship
 from app.db.database import Base
@@ -7,7 +7,7 @@ import uuid
 class GPSTrack(Base):
     __tablename__ = "gps_tracks"
 
-    track_id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    track_id = Column(String, nullable=False, default=lambda: str(uuid.uuid4()))
     driver_id = Column(String, ForeignKey('drivers.driver_id'), nullable=False)
 
     location = Column(Geometry('POINT'), nullable=False)
@@ -24,5 +24,24 @@ class GPSTrack(Base):
 
     session_id = Column(String, nullable=True)
     recorded_at = Column(DateTime, nullable=False)
-    
-    driver = relationship("Driver", back_populates="gps_tracks")
\ No newline at end of file
+
+    driver = relationship("Driver", back_populates="gps_tracks")
+
+    __table_args__ = (
+        # Partitioned by day on recorded_at; partitions are created, compacted and
+        # dropped by app.services.gps_track_storage_service
+        PrimaryKeyConstraint("recorded_at", "track_id"),
+        # Last-point recovery and per-session stats read one session in time order
+        Index("ix_gps_tracks_driver_session_recorded", "driver_id", "session_id", "recorded_at"),
+        Index("ix_gps_tracks_recorded_brin", "recorded_at", postgresql_using="brin"),
+        {"postgresql_partition_by": "RANGE (recorded_at)"},
+    )
+
+class GPSTrackPartition(Base):
+    """One row per daily gps_tracks partition and what maintenance has done to it"""
+    __tablename__ = "gps_track_partitions"
+
+    day = Column(Date, primary_key=True)
+    raw_points = Column(Integer)
+    kept_points = Column(Integer)
+    compacted_at = Column(DateTime)
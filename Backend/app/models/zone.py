@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, String, Integer, Float, JSON, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, String, Integer, Float, JSON, Boolean, DateTime, ForeignKey, Index
 from sqlalchemy.dialects.postgresql import UUID
 from geoalchemy2 import Geometry
 from app.db.database import Base
@@ -53,6 +53,11 @@ class DemandForecast(Base):
 
     created_at = Column(DateTime)
 
+    __table_args__ = (
+        # Latest-forecast-per-zone lookups filter on zone and horizon, newest first
+        Index("ix_demand_forecasts_zone_horizon_created", "zone_id", "forecast_horizon", "created_at"),
+    )
+
 class DemandPattern(Base):
     __tablename__ = "demand_patterns"
 
@@ -0,0 +1,25 @@
+from .transport_solver import solve_transportation, UNASSIGNED
+from .cost_matrix import haversine_km, haversine_matrix_km, decode_points, travel_time_matrix, driver_penalties
+from .candidates import nearest_zone_candidates
+from .pdp_solver import solve_pdp, solve_multi_vehicle_pdp, NO_PREDECESSOR
+from .road_graph import RoadGraph
+from .zone_index import ZoneIndex
+from .polyline import encode_polyline, decode_polyline, simplify_polyline
+__all__ = [
+	"solve_transportation",
+	"UNASSIGNED",
+	"haversine_km",
+	"haversine_matrix_km",
+	"decode_points",
+	"travel_time_matrix",
+	"driver_penalties",
+	"nearest_zone_candidates",
+	"solve_pdp",
+	"solve_multi_vehicle_pdp",
+	"NO_PREDECESSOR",
+	"RoadGraph",
+	"ZoneIndex",
+	"encode_polyline",
+	"decode_polyline",
+	"simplify_polyline",
+]
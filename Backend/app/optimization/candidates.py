@@ -0,0 +1,47 @@
+import numpy as np
+from typing import Optional
+from scipy.sparse import csr_matrix
+from sklearn.neighbors import BallTree
+
+from app.optimization.cost_matrix import EARTH_RADIUS_KM, DEFAULT_SPEED_KMH
+
+def nearest_zone_candidates(
+    driver_lat: np.ndarray, driver_lon: np.ndarray,
+    zone_lat: np.ndarray, zone_lon: np.ndarray,
+    k: int = 8,
+    max_minutes: Optional[float] = None,
+    speed_kmh: float = DEFAULT_SPEED_KMH
+) -> csr_matrix:
+    """Sparse drivers x zones matrix of straight-line travel minutes to each driver's k nearest zones.
+
+    Zones beyond max_minutes are dropped, but every located driver keeps its nearest
+    zone so it stays matchable. Drivers or zones without coordinates get no edges.
+    Cost is O(n_drivers * k * log n_zones) time and O(n_drivers * k) memory.
+    """
+    driver_lat = np.asarray(driver_lat, dtype=np.float64)
+    driver_lon = np.asarray(driver_lon, dtype=np.float64)
+    zone_lat = np.asarray(zone_lat, dtype=np.float64)
+    zone_lon = np.asarray(zone_lon, dtype=np.float64)
+    n_drivers, n_zones = driver_lat.size, zone_lat.size
+
+    located_drivers = np.flatnonzero(~(np.isnan(driver_lat) | np.isnan(driver_lon)))
+    located_zones = np.flatnonzero(~(np.isnan(zone_lat) | np.isnan(zone_lon)))
+    if located_drivers.size == 0 or located_zones.size == 0 or k <= 0:
+        return csr_matrix((n_drivers, n_zones))
+
+    k = min(k, located_zones.size)
+    tree = BallTree(np.radians(np.column_stack([zone_lat[located_zones], zone_lon[located_zones]])), metric="haversine")
+    dist_rad, nearest = tree.query(
+        np.radians(np.column_stack([driver_lat[located_drivers], driver_lon[located_drivers]])),
+        k=k
+    )
+    minutes = dist_rad * EARTH_RADIUS_KM / speed_kmh * 60.0
+
+    keep = np.ones_like(minutes, dtype=bool)
+    if max_minutes is not None:
+        keep = minutes <= max_minutes
+        keep[:, 0] = True
+
+    rows = np.repeat(located_drivers, k).reshape(-1, k)[keep]
+    cols = located_zones[nearest][keep]
+    return csr_matrix((minutes[keep], (rows, cols)), shape=(n_drivers, n_zones))
@@ -0,0 +1,73 @@
+import numpy as np
+import shapely
+from typing import Iterable, Optional, Tuple
+from geoalchemy2.elements import WKBElement, WKTElement
+
+EARTH_RADIUS_KM = 6371.0
+DEFAULT_SPEED_KMH = 45.0
+MISSING_TRAVEL_TIME = 999.0
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km; arguments broadcast like any NumPy ufunc"""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+def haversine_matrix_km(
+    lat_a: np.ndarray, lon_a: np.ndarray,
+    lat_b: np.ndarray, lon_b: np.ndarray
+) -> np.ndarray:
+    return haversine_km(
+        np.asarray(lat_a)[:, None], np.asarray(lon_a)[:, None],
+        np.asarray(lat_b)[None, :], np.asarray(lon_b)[None, :]
+    )
+
+def decode_points(geometries: Iterable[Optional[object]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Decode WKB/WKT point elements into (lat, lon) float64 arrays, NaN where missing"""
+    geometries = list(geometries)
+    lat = np.full(len(geometries), np.nan)
+    lon = np.full(len(geometries), np.nan)
+
+    wkb_idx, wkb_data, wkt_idx, wkt_data = [], [], [], []
+    for i, geom in enumerate(geometries):
+        if geom is None:
+            continue
+        if isinstance(geom, WKBElement):
+            wkb_idx.append(i)
+            # psycopg2 hands back hex strings, from_shape() gives raw bytes
+            data = geom.data
+            wkb_data.append(data if isinstance(data, str) else bytes(data))
+        elif isinstance(geom, WKTElement):
+            wkt_idx.append(i)
+            wkt_data.append(geom.data.split(";", 1)[-1])
+
+    for idx, shapes in (
+        (wkb_idx, shapely.from_wkb(wkb_data, on_invalid="ignore") if wkb_data else None),
+        (wkt_idx, shapely.from_wkt(wkt_data, on_invalid="ignore") if wkt_data else None),
+    ):
+        if not idx:
+            continue
+        lon[idx] = shapely.get_x(shapes)
+        lat[idx] = shapely.get_y(shapes)
+
+    return lat, lon
+
+def travel_time_matrix(
+    origin_lat: np.ndarray, origin_lon: np.ndarray,
+    dest_lat: np.ndarray, dest_lon: np.ndarray,
+    speed_kmh: float = DEFAULT_SPEED_KMH,
+    missing: float = MISSING_TRAVEL_TIME
+) -> np.ndarray:
+    """Straight-line travel time in minutes; pairs with an unknown endpoint cost `missing`"""
+    minutes = haversine_matrix_km(origin_lat, origin_lon, dest_lat, dest_lon) / speed_kmh * 60.0
+    return np.where(np.isnan(minutes), missing, minutes)
+
+def driver_penalties(fatigue_scores: np.ndarray, battery_levels: np.ndarray) -> np.ndarray:
+    fatigue = np.nan_to_num(np.asarray(fatigue_scores, dtype=np.float64), nan=0.0)
+    battery = np.nan_to_num(np.asarray(battery_levels, dtype=np.float64), nan=100.0)
+
+    penalty = np.where(fatigue > 0.65, 60.0, np.where(fatigue > 0.4, fatigue * 50, 0.0))
+    penalty += np.where(battery < 20, 30.0, 0.0)
+    return penalty
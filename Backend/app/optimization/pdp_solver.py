@@ -0,0 +1,300 @@
+import numpy as np
+from typing import List, Sequence, Tuple
+
+NO_PREDECESSOR = -1
+EXACT_MAX_NODES = 8
+
+def route_cost(dist: np.ndarray, route: Sequence[int]) -> float:
+    """Open path cost starting at the origin (index 0)"""
+    path = np.concatenate(([0], np.asarray(route, dtype=np.int64)))
+    return float(dist[path[:-1], path[1:]].sum())
+
+def is_feasible(route: Sequence[int], predecessor: Sequence[int]) -> bool:
+    position = {node: i for i, node in enumerate(route)}
+    return all(
+        predecessor[node - 1] == NO_PREDECESSOR or position.get(predecessor[node - 1], -1) < position[node]
+        for node in route
+    )
+
+def solve_pdp(dist: np.ndarray, predecessor: Sequence[int], exact_max_nodes: int = EXACT_MAX_NODES) -> Tuple[List[int], float]:
+    """Shortest open path from the origin through every node, respecting precedence.
+
+    dist is an (n+1) x (n+1) matrix (may be asymmetric) with the origin at index 0
+    and nodes at 1..n. predecessor[i-1] is the node that must be visited before
+    node i (a dropoff's pickup), or NO_PREDECESSOR. Returns (route, cost) with
+    route as node indices 1..n.
+
+    Up to exact_max_nodes nodes are solved exactly with a bitmask DP over the
+    precedence-closed subsets (3^k for k pickup/dropoff pairs); larger instances
+    use cheapest insertion followed by or-opt and 2-opt moves that keep every
+    pickup ahead of its dropoff.
+    """
+    dist = np.asarray(dist, dtype=np.float64)
+    predecessor = np.asarray(predecessor, dtype=np.int64)
+    n = dist.shape[0] - 1
+    if n <= 0:
+        return [], 0.0
+
+    if n <= exact_max_nodes:
+        route = _solve_exact(dist, predecessor)
+    else:
+        route = _local_search(dist, predecessor, _cheapest_insertion(dist, predecessor))
+    return route, route_cost(dist, route)
+
+def _solve_exact(dist: np.ndarray, predecessor: np.ndarray) -> List[int]:
+    n = dist.shape[0] - 1
+    # Bit b stands for node b+1; a node becomes available once its predecessor's bit is set
+    need = np.array([0 if p == NO_PREDECESSOR else 1 << (p - 1) for p in predecessor], dtype=np.int64)
+    node_bits = 1 << np.arange(n, dtype=np.int64)
+
+    start = np.full(n + 1, np.inf)
+    start[0] = 0.0
+    cost = {0: start}
+    parent = {}
+    layer = [0]
+
+    for _ in range(n):
+        next_layer = {}
+        for mask in layer:
+            available = np.flatnonzero(((mask & node_bits) == 0) & ((mask & need) == need))
+            if available.size == 0:
+                continue
+            # via[last, k]: arriving at node available[k] from node `last`
+            via = cost[mask][:, None] + dist[:, available + 1]
+            best_last = via.argmin(axis=0)
+            best_cost = via[best_last, np.arange(available.size)]
+            for k, node in enumerate(available + 1):
+                new_mask = mask | (1 << (node - 1))
+                if new_mask not in next_layer:
+                    next_layer[new_mask] = np.full(n + 1, np.inf)
+                if best_cost[k] < next_layer[new_mask][node]:
+                    next_layer[new_mask][node] = best_cost[k]
+                    parent[(new_mask, node)] = int(best_last[k])
+        cost.update(next_layer)
+        layer = list(next_layer)
+
+    full = (1 << n) - 1
+    last = int(np.argmin(cost[full]))
+    route = []
+    mask = full
+    while last != 0:
+        route.append(last)
+        prev = parent[(mask, last)]
+        mask &= ~(1 << (last - 1))
+        last = prev
+    return route[::-1]
+
+def _insertion_costs(dist: np.ndarray, path: np.ndarray, nodes: np.ndarray) -> np.ndarray:
+    """nodes x gaps cost of inserting each node into path (gap g sits right after path[g])"""
+    added = dist[path][:, nodes].T.copy()
+    if len(path) > 1:
+        after, before = path[:-1], path[1:]
+        added[:, :-1] += dist[nodes][:, before] - dist[after, before]
+    return added
+
+def _cheapest_insertion(dist: np.ndarray, predecessor: np.ndarray) -> List[int]:
+    n = dist.shape[0] - 1
+    dropoff_of = {int(p): i + 1 for i, p in enumerate(predecessor) if p != NO_PREDECESSOR}
+    pairs = [(node, dropoff_of[node]) for node in range(1, n + 1) if node in dropoff_of]
+    singles = [node for node in range(1, n + 1) if node not in dropoff_of and predecessor[node - 1] == NO_PREDECESSOR]
+
+    path = [0]
+    while pairs or singles:
+        path_arr = np.array(path, dtype=np.int64)
+        best_cost, best = np.inf, None
+
+        if pairs:
+            combined = _pair_insertion_costs(dist, path_arr, pairs)
+            r, a, b = np.unravel_index(int(combined.argmin()), combined.shape)
+            best_cost, best = combined[r, a, b], ("pair", int(r), int(a), int(b))
+
+        if singles:
+            ins_single = _insertion_costs(dist, path_arr, np.array(singles, dtype=np.int64))
+            r, a = np.unravel_index(int(ins_single.argmin()), ins_single.shape)
+            if ins_single[r, a] < best_cost:
+                best = ("single", int(r), int(a), None)
+
+        kind, r, gap_first, gap_second = best
+        if kind == "single":
+            path.insert(gap_first + 1, singles.pop(r))
+            continue
+        _insert_pair(path, pairs.pop(r), gap_first, gap_second)
+
+    return path[1:]
+
+def _pair_insertion_costs(dist: np.ndarray, path: np.ndarray, pairs: Sequence[Tuple[int, int]]) -> np.ndarray:
+    """pairs x gaps x gaps cost of inserting each pickup into gap a and its dropoff into gap b >= a"""
+    first = np.array([p for p, _ in pairs], dtype=np.int64)
+    second = np.array([d for _, d in pairs], dtype=np.int64)
+    gaps = len(path)
+    # Dropoff into a strictly later gap...
+    combined = _insertion_costs(dist, path, first)[:, :, None] + _insertion_costs(dist, path, second)[:, None, :]
+    combined[:, np.tri(gaps, dtype=bool)] = np.inf
+    # ...or back to back with the pickup in the same gap
+    adjacent = dist[path][:, first].T + dist[first, second][:, None]
+    if gaps > 1:
+        after, before = path[:-1], path[1:]
+        adjacent[:, :-1] += dist[second][:, before] - dist[after, before]
+    diagonal = np.arange(gaps)
+    combined[:, diagonal, diagonal] = adjacent
+    return combined
+
+def _insert_pair(path: List[int], pair: Tuple[int, int], gap_first: int, gap_second: int):
+    pickup, dropoff = pair
+    if gap_second == gap_first:
+        path[gap_first + 1:gap_first + 1] = [pickup, dropoff]
+    else:
+        path.insert(gap_second + 1, dropoff)
+        path.insert(gap_first + 1, pickup)
+
+def _local_search(dist: np.ndarray, predecessor: np.ndarray, route: List[int], max_passes: int = 50) -> List[int]:
+    successor = {int(p): i + 1 for i, p in enumerate(predecessor) if p != NO_PREDECESSOR}
+    path = [0] + route
+    for _ in range(max_passes):
+        improved = _or_opt(dist, predecessor, successor, path) or _two_opt(dist, predecessor, successor, path)
+        if not improved:
+            break
+    return path[1:]
+
+def _or_opt(dist, predecessor, successor, path: List[int], max_segment: int = 3) -> bool:
+    """Move one segment of up to max_segment nodes to its best feasible gap; True if improved"""
+    m = len(path)
+    arr = np.array(path, dtype=np.int64)
+    position = {node: k for k, node in enumerate(path)}
+    for length in range(1, max_segment + 1):
+        for i in range(1, m - length + 1):
+            end = i + length
+            # Keep every pickup ahead of its dropoff: the segment's outside partners
+            # bound the gaps (indexed on the path without the segment) it may go into
+            lo, hi = 0, m - length - 1
+            for node in path[i:end]:
+                p = predecessor[node - 1]
+                if p != NO_PREDECESSOR and position[p] < i:
+                    lo = max(lo, position[p])
+                d = successor.get(node)
+                if d is not None and position[d] >= end:
+                    hi = min(hi, position[d] - length - 1)
+            if lo > hi:
+                continue
+
+            first, last = arr[i], arr[end - 1]
+            removal_gain = dist[arr[i - 1], first]
+            if end < m:
+                removal_gain += dist[last, arr[end]] - dist[arr[i - 1], arr[end]]
+
+            rest = np.concatenate((arr[:i], arr[end:]))
+            gaps = np.arange(lo, hi + 1)
+            added = dist[rest[gaps], first]
+            inner = gaps + 1 < len(rest)
+            nxt = rest[gaps[inner] + 1]
+            added[inner] += dist[last, nxt] - dist[rest[gaps[inner]], nxt]
+            # Reinserting in the original spot is a no-op
+            added[gaps == i - 1] = np.inf
+
+            k = int(added.argmin())
+            if added[k] < removal_gain - 1e-9:
+                g = int(gaps[k])
+                segment = path[i:end]
+                del path[i:end]
+                path[g + 1:g + 1] = segment
+                return True
+    return False
+
+def _two_opt(dist, predecessor, successor, path: List[int]) -> bool:
+    """Reverse one segment (asymmetric costs included); True if improved"""
+    m = len(path)
+    arr = np.array(path, dtype=np.int64)
+    forward = np.concatenate(([0.0], np.cumsum(dist[arr[:-1], arr[1:]])))
+    backward = np.concatenate(([0.0], np.cumsum(dist[arr[1:], arr[:-1]])))
+    position = {node: k for k, node in enumerate(path)}
+
+    for i in range(1, m - 1):
+        # A segment may not contain both ends of a pair
+        limit = m - 1
+        for k in range(i, m):
+            d = successor.get(path[k])
+            if d is not None and position[d] <= limit:
+                limit = min(limit, position[d] - 1)
+            if k >= limit:
+                break
+        if limit <= i:
+            continue
+
+        j = np.arange(i + 1, limit + 1)
+        delta = dist[arr[i - 1], arr[j]] - dist[arr[i - 1], arr[i]]
+        delta += (backward[j] - backward[i]) - (forward[j] - forward[i])
+        inner = j + 1 < m
+        nxt = arr[np.minimum(j + 1, m - 1)]
+        delta[inner] += dist[arr[i], nxt[inner]] - dist[arr[j[inner]], nxt[inner]]
+
+        k = int(delta.argmin())
+        if delta[k] < -1e-9:
+            jj = int(j[k])
+            path[i:jj + 1] = path[i:jj + 1][::-1]
+            return True
+    return False
+
+def solve_multi_vehicle_pdp(
+    dist: np.ndarray,
+    origins: Sequence[int],
+    pairs: Sequence[Tuple[int, int]],
+    capacities: Sequence[int],
+    max_insertion_cost: float = np.inf
+) -> Tuple[List[List[int]], List[int]]:
+    """Route pickup/dropoff pairs across a fleet in one solve.
+
+    dist is a square matrix over every point; vehicle v starts at point origins[v]
+    and may take capacities[v] more pairs. Each step commits the cheapest
+    (pair, vehicle, gaps) insertion across the whole fleet, skipping insertions
+    above max_insertion_cost, and every route is re-sequenced with solve_pdp at
+    the end. Returns per-vehicle routes of point indices (origin excluded) and the
+    indices of pairs left unassigned.
+    """
+    dist = np.asarray(dist, dtype=np.float64)
+    n_vehicles, n_pairs = len(origins), len(pairs)
+    routes = [[int(o)] for o in origins]
+    remaining = [int(c) for c in capacities]
+    if n_vehicles == 0 or n_pairs == 0:
+        return [[] for _ in origins], list(range(n_pairs))
+
+    # Cheapest insertion of every pair into every vehicle's current route; only the
+    # vehicle that just took a pair needs recomputing
+    best_cost = np.full((n_vehicles, n_pairs), np.inf)
+    best_gaps = np.zeros((n_vehicles, n_pairs, 2), dtype=np.int64)
+
+    def refresh(v: int):
+        if remaining[v] <= 0:
+            best_cost[v] = np.inf
+            return
+        combined = _pair_insertion_costs(dist, np.array(routes[v], dtype=np.int64), pairs)
+        flat = combined.reshape(n_pairs, -1)
+        cheapest = flat.argmin(axis=1)
+        best_cost[v] = flat[np.arange(n_pairs), cheapest]
+        best_gaps[v, :, 0], best_gaps[v, :, 1] = np.divmod(cheapest, combined.shape[2])
+
+    for v in range(n_vehicles):
+        refresh(v)
+
+    assigned = np.zeros(n_pairs, dtype=bool)
+    while not assigned.all():
+        masked = np.where(assigned[None, :], np.inf, best_cost)
+        v, r = np.unravel_index(int(masked.argmin()), masked.shape)
+        if not np.isfinite(masked[v, r]) or masked[v, r] > max_insertion_cost:
+            break
+        _insert_pair(routes[v], pairs[r], int(best_gaps[v, r, 0]), int(best_gaps[v, r, 1]))
+        assigned[r] = True
+        remaining[v] -= 1
+        refresh(int(v))
+
+    dropoff_of = {int(p): int(d) for p, d in pairs}
+    resequenced = []
+    for points in routes:
+        local = {point: i for i, point in enumerate(points)}
+        predecessor = [NO_PREDECESSOR] * (len(points) - 1)
+        for point in points[1:]:
+            if point in dropoff_of:
+                predecessor[local[dropoff_of[point]] - 1] = local[point]
+        order, _ = solve_pdp(dist[np.ix_(points, points)], predecessor)
+        resequenced.append([points[i] for i in order])
+
+    return resequenced, [int(r) for r in np.flatnonzero(~assigned)]
@@ -0,0 +1,81 @@
+import numpy as np
+from typing import Tuple
+from app.optimization.cost_matrix import EARTH_RADIUS_KM
+
+def encode_polyline(lat: np.ndarray, lon: np.ndarray, precision: int = 5) -> str:
+    """Google encoded polyline for the given coordinate arrays"""
+    factor = 10 ** precision
+    points = np.column_stack([
+        np.round(np.asarray(lat, dtype=np.float64) * factor),
+        np.round(np.asarray(lon, dtype=np.float64) * factor)
+    ]).astype(np.int64)
+    if points.size == 0:
+        return ""
+    deltas = np.diff(points, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+    values = np.where(deltas < 0, ~(deltas << 1), deltas << 1)
+
+    chunks = []
+    for value in values.tolist():
+        while value >= 0x20:
+            chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+            value >>= 5
+        chunks.append(chr(value + 63))
+    return "".join(chunks)
+
+def decode_polyline(encoded: str, precision: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+    """Inverse of encode_polyline; returns (lat, lon) float64 arrays"""
+    values = []
+    value, shift = 0, 0
+    for char in encoded:
+        byte = ord(char) - 63
+        value |= (byte & 0x1f) << shift
+        shift += 5
+        if byte < 0x20:
+            values.append(~(value >> 1) if value & 1 else value >> 1)
+            value, shift = 0, 0
+
+    points = np.cumsum(np.array(values, dtype=np.int64).reshape(-1, 2), axis=0) / 10 ** precision
+    return points[:, 0], points[:, 1]
+
+def simplify_polyline(lat: np.ndarray, lon: np.ndarray, tolerance_m: float) -> np.ndarray:
+    """Indices of the vertices Douglas-Peucker keeps at the given tolerance in meters.
+
+    Distances are measured on a local equirectangular projection, which is exact
+    enough at city scale; both endpoints are always kept.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    n = lat.size
+    if n <= 2 or tolerance_m <= 0:
+        return np.arange(n)
+
+    meters_per_deg = EARTH_RADIUS_KM * 1000.0 * np.pi / 180.0
+    xy = np.column_stack([
+        (lon - lon[0]) * meters_per_deg * np.cos(np.radians(lat[0])),
+        (lat - lat[0]) * meters_per_deg
+    ])
+
+    keep = np.zeros(n, dtype=bool)
+    keep[[0, n - 1]] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        a, b = xy[first], xy[last]
+        ab = b - a
+        points = xy[first + 1:last] - a
+        length_sq = ab @ ab
+        if length_sq > 0:
+            t = np.clip(points @ ab / length_sq, 0.0, 1.0)
+            offsets = points - t[:, None] * ab
+        else:
+            offsets = points
+        dist = np.hypot(offsets[:, 0], offsets[:, 1])
+        i = int(np.argmax(dist))
+        if dist[i] > tolerance_m:
+            split = first + 1 + i
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return np.flatnonzero(keep)
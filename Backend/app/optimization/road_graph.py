@@ -0,0 +1,238 @@
+import json
+import heapq
+import numpy as np
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from sklearn.neighbors import BallTree
+
+from app.optimization.cost_matrix import EARTH_RADIUS_KM, haversine_km
+
+# Free-flow speeds by OSM highway class when a way has no usable maxspeed tag
+HIGHWAY_SPEEDS_KMH = {
+    "motorway": 100.0, "motorway_link": 60.0,
+    "trunk": 80.0, "trunk_link": 50.0,
+    "primary": 60.0, "primary_link": 40.0,
+    "secondary": 50.0, "secondary_link": 35.0,
+    "tertiary": 40.0, "tertiary_link": 30.0,
+    "unclassified": 30.0, "residential": 25.0,
+    "living_street": 10.0, "service": 15.0,
+}
+DEFAULT_SPEED_KMH = 30.0
+
+PathResult = Tuple[float, float, List[int]]
+
+class RoadGraph:
+    """Directed road network in CSR form, weighted by free-flow travel seconds.
+
+    Forward adjacency is (indptr, indices, seconds, meters); the reverse graph is
+    kept alongside for the backward half of bidirectional searches. Parallel edges
+    keep only the fastest one.
+    """
+
+    def __init__(self, lat, lon, tails, heads, meters, speed_kmh):
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        tails = np.asarray(tails, dtype=np.int64)
+        heads = np.asarray(heads, dtype=np.int64)
+        meters = np.asarray(meters, dtype=np.float64)
+        seconds = meters / (np.asarray(speed_kmh, dtype=np.float64) / 3.6)
+
+        order = np.lexsort((seconds, heads, tails))
+        tails, heads, meters, seconds = tails[order], heads[order], meters[order], seconds[order]
+        first = np.ones(tails.size, dtype=bool)
+        first[1:] = (tails[1:] != tails[:-1]) | (heads[1:] != heads[:-1])
+        keep = first & (tails != heads)
+        tails, heads, meters, seconds = tails[keep], heads[keep], meters[keep], seconds[keep]
+
+        n = self.lat.size
+        self.indptr = np.searchsorted(tails, np.arange(n + 1)).astype(np.int64)
+        self.indices = heads
+        self.seconds = seconds
+        self.meters = meters
+        self.max_speed_mps = float((meters / seconds).max()) if seconds.size else DEFAULT_SPEED_KMH / 3.6
+
+        reverse = np.argsort(heads, kind="stable")
+        self.rev_indptr = np.searchsorted(heads[reverse], np.arange(n + 1)).astype(np.int64)
+        self.rev_indices = tails[reverse]
+        self.rev_edge = reverse
+        self._tails = tails
+        # Plain lists for the per-edge Python loops; NumPy scalar indexing is far slower there
+        self._fwd = (self.indptr.tolist(), heads.tolist(), list(range(heads.size)))
+        self._bwd = (self.rev_indptr.tolist(), self.rev_indices.tolist(), reverse.tolist())
+        self._seconds = seconds.tolist()
+        self._tree: Optional[BallTree] = None
+        self._csr: Optional[csr_matrix] = None
+
+    @property
+    def n_nodes(self) -> int:
+        return self.lat.size
+
+    @property
+    def n_edges(self) -> int:
+        return self.indices.size
+
+    @classmethod
+    def from_osm(cls, data: Dict[str, Any]) -> "RoadGraph":
+        """Build from Overpass-style JSON: node elements plus highway ways with node refs"""
+        elements = data.get("elements", [])
+        node_ids = [e["id"] for e in elements if e.get("type") == "node"]
+        index = {node_id: i for i, node_id in enumerate(node_ids)}
+        lat = np.array([e["lat"] for e in elements if e.get("type") == "node"], dtype=np.float64)
+        lon = np.array([e["lon"] for e in elements if e.get("type") == "node"], dtype=np.float64)
+
+        tails, heads, speeds = [], [], []
+        for way in elements:
+            tags = way.get("tags", {})
+            if way.get("type") != "way" or "highway" not in tags:
+                continue
+            refs = [index[r] for r in way.get("nodes", []) if r in index]
+            speed = _way_speed(tags)
+            oneway = tags.get("oneway")
+            for a, b in zip(refs[:-1], refs[1:]):
+                if oneway == "-1":
+                    a, b = b, a
+                tails.append(a)
+                heads.append(b)
+                speeds.append(speed)
+                if oneway not in ("yes", "true", "1", "-1"):
+                    tails.append(b)
+                    heads.append(a)
+                    speeds.append(speed)
+
+        tails = np.array(tails, dtype=np.int64)
+        heads = np.array(heads, dtype=np.int64)
+        meters = haversine_km(lat[tails], lon[tails], lat[heads], lon[heads]) * 1000.0
+        return cls(lat, lon, tails, heads, meters, np.array(speeds, dtype=np.float64))
+
+    @classmethod
+    def load(cls, path: str) -> "RoadGraph":
+        with open(path) as f:
+            return cls.from_osm(json.load(f))
+
+    def nearest_nodes(self, lat, lon) -> Tuple[np.ndarray, np.ndarray]:
+        """Closest graph node for each point and the straight-line snap distance in meters"""
+        if self._tree is None:
+            self._tree = BallTree(np.radians(np.column_stack([self.lat, self.lon])), metric="haversine")
+        query = np.radians(np.column_stack([np.atleast_1d(lat), np.atleast_1d(lon)]).astype(np.float64))
+        dist_rad, nearest = self._tree.query(query, k=1)
+        return nearest[:, 0], dist_rad[:, 0] * EARTH_RADIUS_KM * 1000.0
+
+    def shortest_path(self, source: int, target: int, method: str = "bidirectional") -> PathResult:
+        """(seconds, meters, node path) of the fastest route; (inf, inf, []) when unreachable"""
+        source, target = int(source), int(target)
+        if source == target:
+            return 0.0, 0.0, [source]
+        if method == "astar":
+            return self._astar(source, target)
+        return self._bidirectional_dijkstra(source, target)
+
+    def matrix(self, sources: Sequence[int], targets: Sequence[int]) -> np.ndarray:
+        """Travel seconds for every source x target pair (one C Dijkstra per distinct source)"""
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        if sources.size == 0 or targets.size == 0:
+            return np.zeros((sources.size, targets.size))
+        if self._csr is None:
+            self._csr = csr_matrix((self.seconds, self.indices, self.indptr), shape=(self.n_nodes, self.n_nodes))
+        unique, inverse = np.unique(sources, return_inverse=True)
+        return dijkstra(self._csr, directed=True, indices=unique)[inverse][:, targets]
+
+    def _edge_path(self, edges: List[int]) -> PathResult:
+        if not edges:
+            return np.inf, np.inf, []
+        edges = np.array(edges, dtype=np.int64)
+        nodes = [int(self._tails[edges[0]])] + self.indices[edges].tolist()
+        return float(self.seconds[edges].sum()), float(self.meters[edges].sum()), nodes
+
+    def _bidirectional_dijkstra(self, source: int, target: int) -> PathResult:
+        dist = ({source: 0.0}, {target: 0.0})
+        via_edge = ({}, {})
+        done = (set(), set())
+        heaps = ([(0.0, source)], [(0.0, target)])
+        adjacency = (self._fwd, self._bwd)
+        seconds = self._seconds
+        best, meet = np.inf, None
+
+        while heaps[0] and heaps[1]:
+            # Once the two frontiers together exceed the best meeting cost, nothing shorter remains
+            if heaps[0][0][0] + heaps[1][0][0] >= best:
+                break
+            side = 0 if heaps[0][0][0] <= heaps[1][0][0] else 1
+            d, u = heapq.heappop(heaps[side])
+            if u in done[side]:
+                continue
+            done[side].add(u)
+
+            indptr, indices, edge_ids = adjacency[side]
+            for k in range(indptr[u], indptr[u + 1]):
+                v, edge = indices[k], edge_ids[k]
+                nd = d + seconds[edge]
+                if nd < dist[side].get(v, np.inf):
+                    dist[side][v] = nd
+                    via_edge[side][v] = edge
+                    heapq.heappush(heaps[side], (nd, v))
+                    total = nd + dist[1 - side].get(v, np.inf)
+                    if total < best:
+                        best, meet = total, v
+
+        if meet is None:
+            return np.inf, np.inf, []
+
+        edges = []
+        node = meet
+        while node != source:
+            edge = via_edge[0][node]
+            edges.append(edge)
+            node = int(self._tails[edge])
+        edges.reverse()
+        node = meet
+        while node != target:
+            edge = via_edge[1][node]
+            edges.append(edge)
+            node = int(self.indices[edge])
+        return self._edge_path(edges)
+
+    def _astar(self, source: int, target: int) -> PathResult:
+        # Straight line at the network's top speed never overestimates the remaining time
+        heuristic = haversine_km(self.lat, self.lon, self.lat[target], self.lon[target]) * 1000.0 / self.max_speed_mps
+        heuristic = heuristic.tolist()
+        indptr, indices, _ = self._fwd
+        seconds = self._seconds
+        dist = {source: 0.0}
+        via_edge = {}
+        done = set()
+        heap = [(heuristic[source], source)]
+
+        while heap:
+            _, u = heapq.heappop(heap)
+            if u == target:
+                break
+            if u in done:
+                continue
+            done.add(u)
+            d = dist[u]
+            for edge in range(indptr[u], indptr[u + 1]):
+                v = indices[edge]
+                nd = d + seconds[edge]
+                if nd < dist.get(v, np.inf):
+                    dist[v] = nd
+                    via_edge[v] = edge
+                    heapq.heappush(heap, (nd + heuristic[v], v))
+
+        if target not in via_edge:
+            return np.inf, np.inf, []
+        edges = []
+        node = target
+        while node != source:
+            edge = via_edge[node]
+            edges.append(edge)
+            node = int(self._tails[edge])
+        return self._edge_path(edges[::-1])
+
+def _way_speed(tags: Dict[str, str]) -> float:
+    maxspeed = str(tags.get("maxspeed", "")).split()[0] if tags.get("maxspeed") else ""
+    if maxspeed.replace(".", "", 1).isdigit():
+        speed = float(maxspeed)
+        return speed * 1.609344 if "mph" in str(tags.get("maxspeed")) else speed
+    return HIGHWAY_SPEEDS_KMH.get(tags.get("highway"), DEFAULT_SPEED_KMH)
@@ -0,0 +1,109 @@
+import numpy as np
+from typing import Sequence, Union
+from scipy.sparse import issparse, spmatrix
+
+UNASSIGNED = -1
+
+def solve_transportation(cost: Union[np.ndarray, spmatrix], capacities: Sequence[int]) -> np.ndarray:
+    """Min-cost assignment of rows (drivers) to columns (zones) with per-column capacities.
+
+    Equivalent to running linear_sum_assignment on the matrix with every column
+    replicated capacity times: min(n_rows, sum(capacities)) rows are assigned and
+    the total cost is optimal. Returns the column index per row, or UNASSIGNED.
+
+    `cost` may be a scipy sparse matrix, in which case only stored entries are
+    allowed pairs (np.inf marks a forbidden pair in a dense matrix). Rows are then
+    matched maximally first and at minimum cost second.
+
+    Rows are inserted one at a time along a shortest augmenting path (successive
+    shortest paths). Because the number of zones is small, the residual graph is
+    collapsed to a zones x zones "exchange" matrix: exchange[a, b] is the cheapest
+    cost change of moving one driver currently in zone a over to zone b.
+    """
+    if issparse(cost):
+        coo = cost.tocoo()
+        dense = np.full(coo.shape, np.inf)
+        dense[coo.row, coo.col] = coo.data
+        cost = dense
+    cost = np.asarray(cost, dtype=np.float64)
+    n_rows, n_cols = cost.shape
+    caps = np.asarray(capacities, dtype=np.int64).copy()
+    assignment = np.full(n_rows, UNASSIGNED, dtype=np.int64)
+    if n_rows == 0 or n_cols == 0 or caps.sum() <= 0:
+        return assignment
+
+    # An overflow column takes every row that is not matched to a real column; rows
+    # that end up there stay unassigned. Its cost exceeds any augmenting path through
+    # real columns, so real slots are always filled first and a row is only pushed
+    # out when capacity or forbidden pairs leave no alternative.
+    finite = cost[np.isfinite(cost)]
+    spread = float(finite.max() - min(finite.min(), 0.0)) if finite.size else 0.0
+    overflow_cost = (spread + 1.0) * (n_cols + 2)
+    cost = np.hstack([cost, np.full((n_rows, 1), overflow_cost)])
+    caps = np.append(caps, n_rows)
+    n_nodes = cost.shape[1]
+
+    load = np.zeros(n_nodes, dtype=np.int64)
+    exchange = np.full((n_nodes, n_nodes), np.inf)
+    exchange_row = np.full((n_nodes, n_nodes), UNASSIGNED, dtype=np.int64)
+
+    def add_member(zone: int, row: int):
+        delta = cost[row] - cost[row, zone]
+        better = delta < exchange[zone]
+        better[zone] = False
+        exchange[zone, better] = delta[better]
+        exchange_row[zone, better] = row
+
+    def remove_member(zone: int, row: int):
+        # Only columns where the departing row was the cheapest exchange need a rescan
+        cols = np.flatnonzero(exchange_row[zone] == row)
+        if cols.size == 0:
+            return
+        members = np.flatnonzero(assignment == zone)
+        if members.size == 0:
+            exchange[zone, cols] = np.inf
+            exchange_row[zone, cols] = UNASSIGNED
+            return
+        delta = cost[np.ix_(members, cols)] - cost[members, zone][:, None]
+        best = delta.argmin(axis=0)
+        exchange[zone, cols] = delta[best, np.arange(cols.size)]
+        exchange_row[zone, cols] = members[best]
+
+    for row in range(n_rows):
+        dist = cost[row].copy()
+        pred = np.full(n_nodes, UNASSIGNED, dtype=np.int64)
+
+        # Bellman-Ford over zones; the residual graph has no negative cycles
+        # after each shortest-path augmentation, so this converges in < n_nodes rounds.
+        for _ in range(n_nodes):
+            via = dist[:, None] + exchange
+            best_from = via.argmin(axis=0)
+            candidate = via[best_from, np.arange(n_nodes)]
+            improved = candidate < dist - 1e-12
+            if not improved.any():
+                break
+            dist[improved] = candidate[improved]
+            pred[improved] = best_from[improved]
+
+        open_zones = np.flatnonzero(load < caps)
+        sink = open_zones[dist[open_zones].argmin()]
+
+        # Walk the path back from the sink, shifting one driver per hop.
+        moves = []
+        node = sink
+        seen = set()
+        while pred[node] != UNASSIGNED and node not in seen:
+            seen.add(node)
+            prev = pred[node]
+            moves.append((int(exchange_row[prev, node]), prev, node))
+            node = prev
+        for moved_row, src, dst in moves:
+            assignment[moved_row] = dst
+            remove_member(src, moved_row)
+            add_member(dst, moved_row)
+        assignment[row] = node
+        add_member(node, row)
+        load[sink] += 1
+
+    assignment[assignment == n_cols] = UNASSIGNED
+    return assignment
@@ -0,0 +1,58 @@
+import numpy as np
+import shapely
+from typing import Optional, Sequence
+from shapely import STRtree
+
+class ZoneIndex:
+    """STRtree over zone boundaries plus one over centroids, answering the same
+    question as ST_Contains(boundary) with an ST_Distance(centroid) fallback.
+
+    Both trees work in lon/lat degrees, as the PostGIS queries did on SRID 4326.
+    """
+
+    def __init__(self, zone_ids: Sequence[str], boundaries: Sequence[Optional[object]], centroids: Sequence[Optional[object]]):
+        self.zone_ids = np.array(zone_ids, dtype=object)
+        boundaries = np.array(boundaries, dtype=object)
+        centroids = np.array(centroids, dtype=object)
+
+        self._boundary_zones = np.flatnonzero(~shapely.is_missing(boundaries))
+        self._centroid_zones = np.flatnonzero(~shapely.is_missing(centroids))
+        self._boundary_tree = STRtree(boundaries[self._boundary_zones])
+        self._centroid_tree = STRtree(centroids[self._centroid_zones])
+
+    def __len__(self) -> int:
+        return self.zone_ids.size
+
+    def lookup(self, lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+        """Zone id per point (object array, None where there are no zones or no coordinates)"""
+        lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+        lon = np.atleast_1d(np.asarray(lon, dtype=np.float64))
+        result = np.full(lat.size, None, dtype=object)
+        located = np.flatnonzero(np.isfinite(lat) & np.isfinite(lon))
+        if located.size == 0 or self.zone_ids.size == 0:
+            return result
+
+        points = shapely.points(lon[located], lat[located])
+        zone_of = np.full(located.size, -1, dtype=np.int64)
+
+        if self._boundary_zones.size:
+            point_idx, tree_idx = self._boundary_tree.query(points, predicate="within")
+            # Overlapping boundaries: the first zone wins, like an unordered .first()
+            order = np.lexsort((tree_idx, point_idx))
+            point_idx, tree_idx = point_idx[order], tree_idx[order]
+            first = np.unique(point_idx, return_index=True)[1]
+            zone_of[point_idx[first]] = self._boundary_zones[tree_idx[first]]
+
+        outside = np.flatnonzero(zone_of < 0)
+        if outside.size and self._centroid_zones.size:
+            point_idx, tree_idx = self._centroid_tree.query_nearest(points[outside], all_matches=False)
+            zone_of[outside[point_idx]] = self._centroid_zones[tree_idx]
+
+        matched = zone_of >= 0
+        result[located[matched]] = self.zone_ids[zone_of[matched]]
+        return result
+
+    def lookup_one(self, lat: Optional[float], lon: Optional[float]) -> Optional[str]:
+        if lat is None or lon is None:
+            return None
+        return self.lookup([lat], [lon])[0]
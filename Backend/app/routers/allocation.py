@@ -25,6 +25,12 @@ def reallocation(db: Session = Depends(get_db), admin = Depends(get_current_admi
     result = service.reallocation()
     return result
 
+@router.post("/reallocate/incremental")
+def incremental_reallocation(db: Session = Depends(get_db), admin = Depends(get_current_admin)):
+    service = AllocationService(db)
+    result = service.incremental_reallocation()
+    return result
+
 @router.post("/manual")
 def manual_allocation(
     request: ManualAllocationRequest,
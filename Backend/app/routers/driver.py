@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.concurrency import run_in_threadpool
 from typing import Optional, List
 from sqlalchemy.orm import Session
 from sqlalchemy import func
@@ -150,6 +151,14 @@ def get_active_driver_locations(
     locations = driver_service.get_all_active_drivers_locations()
     return locations
 
+@router.post("/order-counts/reconcile")
+def reconcile_driver_order_counts(
+    db: Session = Depends(get_db),
+    admin = Depends(get_current_admin)
+):
+    driver_service = DriverService(db)
+    return {"drivers_updated": driver_service.reconcile_order_counts()}
+
 @router.get("/stats/summary")
 def get_drivers_summary(
     db: Session = Depends(get_db),
@@ -214,7 +223,9 @@ async def update_my_location(
     driver = Depends(get_current_driver)
 ):
     driver_service = DriverService(db)
-    driver_service.update_location(
+    # Redis, Kafka and the ETA check are blocking calls; keep them off the event loop
+    await run_in_threadpool(
+        driver_service.update_location,
         driver_id=driver.driver_id,
         location_data=location_data
     )
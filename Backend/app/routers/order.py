@@ -6,10 +6,12 @@ from datetime import datetime
 from app.db.database import get_db
 from app.core.dependencies import get_current_driver, get_current_admin, get_current_user
 from app.core.socket_manager import socket_manager, emit_sync
+from app.core.routes_client import routes_client
 from app.models.user import User
 from app.models.driver import Driver
-from app.services.order_service import OrderService
-from app.schemas.order import OrderAssign, OrderCreate, OrderDeliver, OrderPickup, OrderResponse, OrderUpdate, OrderStats, OrderStatus
+from app.services.order_service import OrderService, enrich_order_routes
+from app.services.route_geometry_service import route_geometry_store, detail_for_zoom, DETAIL_TOLERANCES_M, FULL_DETAIL
+from app.schemas.order import OrderAssign, OrderBatchCreate, OrderBatchResult, OrderCreate, OrderDeliver, OrderPickup, OrderResponse, OrderUpdate, OrderStats, OrderStatus
 from geoalchemy2.functions import ST_X, ST_Y
 from app.models.order import Order
 from geoalchemy2.functions import ST_Distance
@@ -17,8 +19,12 @@ from geoalchemy2.functions import ST_Distance
 class DispatchOrderRequest(BaseModel):
     driver_id: str
     zone_id: str
+
+class DispatchBatchRequest(BaseModel):
+    zone_ids: List[str]
     
 router = APIRouter()
+router.add_event_handler("shutdown", routes_client.aclose)
 
 @router.post("/", response_model=OrderResponse)
 async def create_order(
@@ -111,6 +117,17 @@ async def webhook_create_order(
     
     return order
 
+@router.post("/webhook/batch", response_model=OrderBatchResult)
+def webhook_create_orders_batch(
+    batch: OrderBatchCreate,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
+    order_service = OrderService(db)
+    result = order_service.create_orders_bulk(batch.orders, auto_offer=batch.auto_offer)
+    background_tasks.add_task(enrich_order_routes, result["order_ids"])
+    return result
+
 @router.get("/", response_model=List[OrderResponse])
 def get_all_orders(
     db: Session = Depends(get_db),
@@ -347,3 +364,34 @@ async def dispatch_order(
     order_service = OrderService(db)
     order = order_service.dispatch_orders(request.driver_id, request.zone_id)
     return order
+
+@router.post("/dispatch/batch")
+def dispatch_zone_batch(
+    request: DispatchBatchRequest,
+    db: Session = Depends(get_db),
+    admin = Depends(get_current_admin)
+):
+    order_service = OrderService(db)
+    return order_service.dispatch_zone_batch(request.zone_ids)
+
+@router.get("/assignments/{assignment_id}/route")
+def get_assignment_route(
+    assignment_id: str,
+    zoom: Optional[float] = None,
+    detail: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    level = detail or detail_for_zoom(zoom)
+    if level != FULL_DETAIL and level not in DETAIL_TOLERANCES_M:
+        raise HTTPException(status_code=400, detail=f"Unknown detail level: {level}")
+
+    geometry = route_geometry_store.get(db, assignment_id)
+    if geometry is None:
+        raise HTTPException(status_code=404, detail="Route not found")
+    return {
+        "assignment_id": assignment_id,
+        "detail": level,
+        "polyline": geometry.encoded(level),
+        "point_count": geometry.point_counts[level]
+    }
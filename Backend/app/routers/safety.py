@@ -6,9 +6,10 @@ from datetime import datetime
 from pydantic import BaseModel
 from app.services.safety_monitoring_service import SafetyMonitoringService
 from app.services.distance_tracking_service import DistanceTrackingService
+from app.services.gps_track_storage_service import run_maintenance as run_gps_track_maintenance
 from app.core.dependencies import get_current_driver, get_current_admin
 from app.core.socket_manager import socket_manager
-from app.schemas.sensor import SensorDataBatch, DistanceStats, SensorDataBatchResponse
+from app.schemas.sensor import SensorDataBatch, DistanceStats, SensorDataBatchResponse, GPSPointBatch, GPSPointBatchResponse
 from app.models.alert import Alert
 from app.models.driver import Driver
 from app.models.user import User
@@ -61,6 +62,26 @@ def submit_sensor_data(
         genai_insights=results.get("genai_insights", [])
     )
 
+@router.post("/gps-points/batch", response_model=GPSPointBatchResponse)
+def submit_gps_points(
+    batch: GPSPointBatch,
+    current_driver = Depends(get_current_driver),
+    db: Session = Depends(get_db)
+):
+    distance_service = DistanceTrackingService(db)
+    return distance_service.record_gps_points(
+        driver_id=current_driver.driver_id,
+        session_id=batch.session_id,
+        points=batch.points
+    )
+
+@router.post("/gps-tracks/maintenance")
+def run_gps_track_storage_maintenance(
+    db: Session = Depends(get_db),
+    admin = Depends(get_current_admin)
+):
+    return run_gps_track_maintenance(db)
+
 @router.get("/distance-stats/{session_id}", response_model=DistanceStats)
 def get_distance_stats(
     session_id: str,
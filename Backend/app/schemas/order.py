@@ -28,6 +28,15 @@ class OrderCreate(BaseModel):
 
     price: float = 0.0
 
+class OrderBatchCreate(BaseModel):
+    orders: List[OrderCreate] = Field(..., min_length=1, max_length=5000)
+    auto_offer: bool = True
+
+class OrderBatchResult(BaseModel):
+    created: int
+    offered: int
+    order_ids: List[str]
+
 class OrderUpdate(BaseModel):
     status: Optional[OrderStatus] = None
     
@@ -35,6 +35,15 @@ class SensorDataBatch(BaseModel):
     location_data: LocationData
     camera_frame_data: Optional[CameraFrameData] = None
 
+class GPSPointBatch(BaseModel):
+    session_id: str
+    points: List[LocationData] = Field(..., min_length=1, max_length=5000, description="In the order the app recorded them")
+
+class GPSPointBatchResponse(BaseModel):
+    session_id: str
+    inserted: int
+    cumulative_distance_km: Optional[float] = None
+
 class FatigueAnalysisResult(BaseModel):
     fatigue_score: float = Field(..., ge=0, le=1, description="0=alert, 1=extremely fatigued")
     eye_blink_rate: Optional[float] = None
@@ -1,15 +1,17 @@
 import math
+import time
 import logging
-import googlemaps
 import numpy as np
+from collections import Counter
+from scipy.sparse import csr_matrix
 from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime, timedelta
 from geoalchemy2.shape import to_shape
-from scipy.optimize import linear_sum_assignment
 from geoalchemy2.functions import ST_X, ST_Y
 
 from app.core.kafka import kafka_producer
 from sqlalchemy.orm import Session
+from sqlalchemy import String, update, values, column
 from app.models.driver import Driver
 from app.models.order import Order
 from app.models.zone import Zone, DemandForecast
@@ -18,6 +20,15 @@ from app.schemas.driver import DriverStatus, DutyStatus
 from app.schemas.order import OrderStatus
 from app.core.config import settings
 from app.services.forecasting_service import ForecastingService
+from app.services.zone_snapshot_service import ZoneSnapshot, ZoneSnapshotService
+from app.services.travel_time_service import travel_time_cache
+from app.services.zone_pressure_service import (
+    zone_pressure_tracker, zone_pressure_index, ZoneIndexView, SURGE, SURPLUS,
+    record_changes as record_zone_pressure_changes
+)
+from app.optimization.transport_solver import solve_transportation, UNASSIGNED
+from app.optimization.cost_matrix import decode_points, travel_time_matrix, driver_penalties, haversine_km
+from app.optimization.candidates import nearest_zone_candidates
 from app.core.socket_manager import socket_manager, emit_sync
 
 logger = logging.getLogger(__name__)
@@ -27,20 +38,29 @@ class AllocationService:
     SURGE_PENDING_RATIO = 3.0
     IDLE_DRIVER_THRESHOLD = 2
     DRIVER_CAPACITY = 1.5 # Average number of orders a driver can handle (batching factor)
+    SNAPSHOT_MAX_AGE_SECONDS = 30
+    CANDIDATE_ZONES_K = 8 # Only the k nearest zones are considered for each driver
+    CANDIDATE_MAX_MINUTES = 40.0
+    FORECAST_HORIZON_MINUTES = 60
+    FORECAST_MAX_AGE_MINUTES = 30 # Older DemandForecast rows fall back to the zone's demand score
+    TRACKER_RESEED_SECONDS = 60 # Bounds drift in the pressure tracker and the Redis zone index
     
     def __init__(self, db: Session):
         self.db = db
         self.forecasting_service = ForecastingService(db)
-        self._gmaps : Optional[googlemaps.Client] = None
-
-    @property
-    def gmaps(self):
-        if self._gmaps is None and settings.GOOGLE_MAPS_API_KEY:
-            try:
-                self._gmaps = googlemaps.Client(key=settings.GOOGLE_MAPS_API_KEY)
-            except Exception as e:
-                logger.error(f"Failed to initialize Google Maps client: {e}")
-        return self._gmaps
+        self._zone_snapshot : Optional[ZoneSnapshot] = None
+        self.travel_time_cache = travel_time_cache
+
+    def get_zone_snapshot(self, max_age_seconds: Optional[float] = None) -> ZoneSnapshot:
+        if max_age_seconds is None:
+            max_age_seconds = self.SNAPSHOT_MAX_AGE_SECONDS
+
+        if self._zone_snapshot is None or self._zone_snapshot.age_seconds > max_age_seconds:
+            self._zone_snapshot = ZoneSnapshotService(self.db).build()
+        return self._zone_snapshot
+
+    def invalidate_zone_snapshot(self):
+        self._zone_snapshot = None
     
     
     def initial_allocation(self) -> Dict[str, Any]:
@@ -73,7 +93,7 @@ class AllocationService:
             zone_demand
         )
 
-        self._apply_assignments(assignments)
+        self._apply_assignments(assignments, zones)
 
         return {
             "status" : "ok",
@@ -106,15 +126,57 @@ class AllocationService:
         if not surge_zones and not surplus_zones:
             return {"status": "skipped", "message": "No reallocation needed"}
         
+        return self._rebalance(surge_zones, surplus_zones, zone_map)
+
+    def incremental_reallocation(self) -> Dict[str, Any]:
+        """Re-solve only around zones that crossed a surge/surplus boundary since the last run"""
+        tracker = zone_pressure_tracker
+        if tracker.age_seconds() > self.TRACKER_RESEED_SECONDS:
+            zones = self.db.query(Zone).all()
+            if not zones:
+                return {"status": "skipped", "message": "No zones found"}
+            self.refresh_zone_pressure(zones)
+
+        dirty = tracker.pop_dirty()
+        if not dirty:
+            return {"status": "skipped", "message": "No zone crossed a reallocation threshold"}
+
+        neighbourhood = tracker.neighbourhood(dirty)
+        zone_stats = tracker.zone_stats(neighbourhood)
+        surge_zones = [zs for zs in zone_stats.values() if tracker.zone_class(zs["zone_id"]) == SURGE]
+        surplus_zones = [zs for zs in zone_stats.values() if tracker.zone_class(zs["zone_id"]) == SURPLUS]
+        if not surge_zones:
+            return {"status": "skipped", "message": "No surge zones near changed zones", "dirty_zones": sorted(dirty)}
+
+        zone_map = {
+            z.zone_id: z for z in
+            self.db.query(Zone).filter(Zone.zone_id.in_([sz["zone_id"] for sz in surge_zones])).all()
+        }
+        surge_zones = [sz for sz in surge_zones if sz["zone_id"] in zone_map]
+        result = self._rebalance(surge_zones, surplus_zones, zone_map)
+        result["dirty_zones"] = sorted(dirty)
+        result["neighbourhood_size"] = len(neighbourhood)
+        return result
+
+    def _rebalance(
+        self,
+        surge_zones: List[Dict[str, Any]],
+        surplus_zones: List[Dict[str, Any]],
+        zone_map: Dict[str, Zone]
+    ) -> Dict[str, Any]:
         allocatable_drivers = []
-        for sz in surplus_zones:
-            drivers_in_zone = self.db.query(Driver).filter(
-                Driver.current_zone == sz["zone_id"],
-                Driver.duty_status == DutyStatus.ON_DUTY.value
+        if surplus_zones:
+            idle_in_surplus = self.db.query(Driver).filter(
+                Driver.current_zone.in_([sz["zone_id"] for sz in surplus_zones]),
+                Driver.duty_status == DutyStatus.ON_DUTY.value,
+                Driver.status == DriverStatus.AVAILABLE.value
             ).all()
-            idle = [d for d in drivers_in_zone if d.status == DriverStatus.AVAILABLE.value]
-            allocatable = idle[self.MIN_DRIVERS_PER_ZONE:]
-            allocatable_drivers.extend(allocatable)
+            idle_by_zone = {}
+            for d in idle_in_surplus:
+                idle_by_zone.setdefault(d.current_zone, []).append(d)
+            for sz in surplus_zones:
+                idle = idle_by_zone.get(sz["zone_id"], [])
+                allocatable_drivers.extend(idle[self.MIN_DRIVERS_PER_ZONE:])
         
         # Also include drivers who are not currently assigned to any zone
         unzoned = self.db.query(Driver).filter(
@@ -131,20 +193,17 @@ class AllocationService:
         #assignments = []
         #assigned_drivers = set()
         
-        zone_slots = []
+        target_zones = []
+        capacities = []
         for sz in surge_zones:
-            #available_to_move = [d for d in allocatable_drivers if d.driver_id not in assigned_drivers]
-            #if not available_to_move:
-            #    break
-            
             zone_id = sz["zone_id"]
-            zone = zone_map[zone_id]
             # Use capacity factor to determine how many actual drivers we need
             needed_drivers = math.ceil(sz["pending_orders"] / self.DRIVER_CAPACITY)
             needed = max(1, needed_drivers - sz["available_drivers"])
-            zone_slots.extend([zone] * needed)
+            target_zones.append(zone_map[zone_id])
+            capacities.append(needed)
 
-        assignments = self._assign_drivers_to_zones_optimized(allocatable_drivers, zone_slots)
+        assignments = self._assign_drivers_to_zones_capacitated(allocatable_drivers, target_zones, capacities)
             #ranked = self._rank_drivers_by_proximity(available_to_move, zone)
 
             #moved = 0
@@ -159,7 +218,7 @@ class AllocationService:
         if not assignments:
             return {"status": "skipped", "message": "No assignments made"}       
 
-        self._apply_assignments(assignments) 
+        self._apply_assignments(assignments, target_zones)
         
         return {
             "status" : "ok",
@@ -191,6 +250,7 @@ class AllocationService:
         self.db.add(driver)
         self.db.commit()
         self.db.refresh(driver)
+        self.invalidate_zone_snapshot()
 
         zone_lat, zone_lon, zone_name = None, None, None
         if zone:
@@ -208,8 +268,10 @@ class AllocationService:
         
         return {"status": "ok", "message": "Driver allocated to zone"}
 
-    def allocate_driver(self, driver_id: str) -> Dict[str, Any]:
-        driver = self.db.query(Driver).filter(Driver.driver_id == driver_id).first()
+    def allocate_driver(self, driver_id: str, driver: Optional[Driver] = None) -> Dict[str, Any]:
+        """JIT allocation for a single freed-up driver, scored against the zone pressure index"""
+        if driver is None:
+            driver = self.db.query(Driver).filter(Driver.driver_id == driver_id).first()
         if not driver:
             return {"status": "skipped", "message": "Driver not found"}
 
@@ -219,102 +281,70 @@ class AllocationService:
         if driver.status != DriverStatus.AVAILABLE.value:
             return {"status": "skipped", "message": "Driver is not available"}
         
-        zones = self.db.query(Zone).all()
-        if not zones:
+        view = self.get_zone_index_view()
+        if view is None:
             return {"status": "skipped", "message": "No zones found"}
-        
-        stats = self._get_zone_stats(zones)
-        
-        # Consider driver's location for JIT allocation to avoid sending them too far
-        driver_lat = None
-        driver_lon = None
-        if driver.location is not None:
-            try:
-                driver_pt = to_shape(driver.location)
-                driver_lon = driver_pt.x
-                driver_lat = driver_pt.y
-            except Exception as e:
-                logger.error(f"Error parsing driver location: {e}")
-
-        best_zone_id = None
-        best_score = float('-inf')
 
-        for zone in zones:
-            zone_stat = stats.get(zone.zone_id, {})
-            score = zone_stat.get("demand_pressure", 0.0)
+        # Consider driver's location for JIT allocation to avoid sending them too far:
+        # a distance penalty (-0.5 score per minute) so closer zones are prioritized
+        # unless demand pressure is overwhelmingly higher elsewhere
+        score = view.pressure.copy()
+        driver_lat, driver_lon = decode_points([driver.location])
+        minutes = haversine_km(driver_lat[0], driver_lon[0], view.lat, view.lon) / 45 * 60
+        score -= np.where(np.isnan(minutes), 0.0, minutes * 0.5)
 
-            if driver_lat is not None and driver_lon is not None and zone.centroid is not None:
-                try:
-                    zone_pt = to_shape(zone.centroid)
-                    zone_lon = zone_pt.x
-                    zone_lat = zone_pt.y
-                    
-                    dist_km = self._calculate_haversine_distance(driver_lat, driver_lon, zone_lat, zone_lon)
-                    # Apply a distance penalty (e.g., -0.5 score per km) 
-                    # so closer zones are prioritized unless demand pressure is overwhelmingly higher elsewhere
-                    score -= (dist_km * 0.5)
-                except Exception as e:
-                    logger.error(f"Error parsing zone {zone.zone_id} centroid: {e}")
-
-            if score > best_score:
-                best_score = score
-                best_zone_id = zone.zone_id
-
-        if not best_zone_id:
-            # Fallback to pure demand pressure if calculation fails
-            sorted_zones = sorted(stats.values(), key=lambda x: x["demand_pressure"], reverse=True)
-            best_zone_id = sorted_zones[0]["zone_id"]
+        best = int(np.argmax(score))
+        best_zone_id = view.zone_ids[best]
 
         logger.info(f"JIT Allocation: Moving driver {driver_id} to highest-demand zone {best_zone_id}")
         driver.current_zone = best_zone_id
         
         self.db.add(driver)
         self.db.commit()
-        self.db.refresh(driver)
+        self.invalidate_zone_snapshot()
 
-        zone_lat, zone_lon, zone_name = None, None, None
-        assigned_zone = next((z for z in zones if z.zone_id == best_zone_id), None)
-        if assigned_zone:
-            zone_name = assigned_zone.name if hasattr(assigned_zone, 'name') else None
-            if assigned_zone.centroid:
-                try:
-                    pt = to_shape(assigned_zone.centroid)
-                    zone_lon = pt.x
-                    zone_lat = pt.y
-                except:
-                    pass
+        zone_lat = None if np.isnan(view.lat[best]) else float(view.lat[best])
+        zone_lon = None if np.isnan(view.lon[best]) else float(view.lon[best])
 
         # Notify driver
-        emit_sync(socket_manager.notify_driver_allocation(driver_id, best_zone_id, zone_lat, zone_lon, zone_name))
+        emit_sync(socket_manager.notify_driver_allocation(driver_id, best_zone_id, zone_lat, zone_lon, view.names[best]))
 
         return {"status": "ok", "zone_id": best_zone_id}
 
+    def get_zone_index_view(self) -> Optional[ZoneIndexView]:
+        view = zone_pressure_index.read(self.DRIVER_CAPACITY)
+        if view is not None and time.time() - view.seeded_at <= self.TRACKER_RESEED_SECONDS:
+            return view
+
+        # Index missing or due for a reseed; fall back to the database for this call
+        zones = self.db.query(Zone).all()
+        if not zones:
+            return None
+        snapshot = self.refresh_zone_pressure(zones)
+        return ZoneIndexView.from_snapshot(snapshot, zones, self.DRIVER_CAPACITY)
+
+    def refresh_zone_pressure(self, zones: List[Zone]) -> ZoneSnapshot:
+        """Reseed the in-process tracker and the shared Redis index from one fresh snapshot"""
+        snapshot = self.get_zone_snapshot(max_age_seconds=0)
+        zone_pressure_tracker.seed(
+            snapshot,
+            zones,
+            surge_ratio=self.SURGE_PENDING_RATIO,
+            idle_threshold=self.IDLE_DRIVER_THRESHOLD,
+            driver_capacity=self.DRIVER_CAPACITY,
+            neighbour_k=self.CANDIDATE_ZONES_K,
+            neighbour_max_minutes=self.CANDIDATE_MAX_MINUTES
+        )
+        zone_pressure_index.seed(snapshot, zones)
+        return snapshot
+
     def get_current_allocation_status(self) -> Dict[str, Any]:
         zones = self.db.query(Zone).all()
+        snapshot = self.get_zone_snapshot()
         result = []
         
         for zone in zones:
-            drivers_in_zone = self.db.query(Driver).filter(
-                Driver.current_zone == zone.zone_id,
-                Driver.duty_status == DutyStatus.ON_DUTY.value
-            ).all()
-            
-            available = [d for d in drivers_in_zone if d.status == DriverStatus.AVAILABLE.value]
-            busy = [d for d in drivers_in_zone if d.status == DriverStatus.BUSY.value]
-            on_break = [d for d in drivers_in_zone if d.status == DriverStatus.ON_BREAK.value]
-
-            pending = self.db.query(Order).filter(
-                Order.pickup_zone == zone.zone_id,
-                Order.status == OrderStatus.pending.value
-            ).count()
-
-            recent_orders = self.db.query(Order).filter(
-                Order.pickup_zone == zone.zone_id,
-                Order.created_at >= datetime.utcnow() - timedelta(minutes=15)
-            ).count()
-
-            effective_supply = (len(available) * self.DRIVER_CAPACITY) or 1
-            demand_pressure = round((pending + recent_orders * 0.5) / effective_supply, 2)
+            zs = snapshot.zone_stats(zone.zone_id, self.DRIVER_CAPACITY)
 
             lat, lon = 25.1972, 55.2744 
             if zone.centroid:
@@ -331,30 +361,34 @@ class AllocationService:
                 "latitude": lat,
                 "longitude": lon,
                 "demand_score": zone.demand_score,
-                "total_drivers": len(drivers_in_zone),
-                "available_drivers": len(available),
-                "busy_drivers": len(busy),
-                "on_break_drivers": len(on_break),
-                "pending_orders": pending,
-                "recent_orders": recent_orders,
-                "demand_pressure": demand_pressure,
-                "supply": effective_supply
+                "total_drivers": zs["total_drivers"],
+                "available_drivers": zs["available_drivers"],
+                "busy_drivers": zs["busy_drivers"],
+                "on_break_drivers": zs["on_break_drivers"],
+                "pending_orders": zs["pending_orders"],
+                "recent_orders": zs["recent_orders"],
+                "demand_pressure": zs["demand_pressure"],
+                "supply": zs["effective_supply"]
             })
         
         return {
             "status": "ok",
             "zones": result, 
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": datetime.utcnow().isoformat(),
+            "snapshot_age_seconds": round(snapshot.age_seconds, 3)
         }
 
     def _get_forecast_demand(self, zones: List[Zone]) -> Dict[str, float]:
+        forecasts = self.forecasting_service.get_zone_forecasts(
+            [zone.zone_id for zone in zones],
+            horizon_minutes=self.FORECAST_HORIZON_MINUTES,
+            max_age_minutes=self.FORECAST_MAX_AGE_MINUTES
+        )
+
         zone_demand = {}
-        # Get city-wide forecast once instead of inside the loop
-        forecast_data = self.forecasting_service.get_demand_forecast(hours=1)
-        
         for zone in zones:
-            if forecast_data.forecasts:
-                zone_demand[zone.zone_id] = forecast_data.forecasts[0].predicted
+            if zone.zone_id in forecasts:
+                zone_demand[zone.zone_id] = forecasts[zone.zone_id]
             else:
                 zone_demand[zone.zone_id] = (zone.demand_score or 1.0) * 10
         return zone_demand
@@ -442,167 +476,177 @@ class AllocationService:
         budget: Dict[str, int],
         zone_demand: Dict[str, float]
     ) -> List[Tuple[str, str]]:
-        zone_slots = []
-        for zone in zones:
-            needed = budget.get(zone.zone_id, 0)
-            zone_slots.extend([zone]*needed)
-        
-        return self._assign_drivers_to_zones_optimized(drivers, zone_slots)
+        target_zones = [z for z in zones if budget.get(z.zone_id, 0) > 0]
+        capacities = [budget[z.zone_id] for z in target_zones]
+
+        return self._assign_drivers_to_zones_capacitated(drivers, target_zones, capacities)
     
     def _assign_drivers_to_zones_optimized(
         self,
         drivers: List[Driver],
         zone_slots: List[Zone]
     ) -> List[Tuple[str, str]]:
-        """Hungarian Algorithm for optimal assignment"""
-        if not drivers or not zone_slots:
+        """Slot-list interface: each repeated zone in zone_slots is one unit of capacity"""
+        unique_zones = list({z.zone_id : z for z in zone_slots}.values())
+        slot_counts = Counter(z.zone_id for z in zone_slots)
+        capacities = [slot_counts[z.zone_id] for z in unique_zones]
+
+        return self._assign_drivers_to_zones_capacitated(drivers, unique_zones, capacities)
+
+    def _assign_drivers_to_zones_capacitated(
+        self,
+        drivers: List[Driver],
+        zones: List[Zone],
+        capacities: List[int]
+    ) -> List[Tuple[str, str]]:
+        """Optimal drivers x zones assignment with per-zone capacities (transportation problem)"""
+        if not drivers or not zones or sum(capacities) <= 0:
             return []
         
-        cost_matrix = np.zeros((len(drivers), len(zone_slots)))
-        matrix = False
-
-        driver_penalties = [self._calculate_driver_penalties(d) for d in drivers]
-
-        if self.gmaps:
-            try:
-                unique_zones = list({z.zone_id : z for z in zone_slots}.values())
-                origins = [f"{to_shape(d.location).y},{to_shape(d.location).x}" for d in drivers]
-                destinations = [f"{to_shape(z.centroid).y},{to_shape(z.centroid).x}" for z in unique_zones]
-
-                if origins and destinations:
-                    response = self.gmaps.distance_matrix(origins=origins, destinations=destinations)
-
-                    if response["status"] == "OK":
-                        for i, row in enumerate(response["rows"]):
-                            penalty = driver_penalties[i]
-                            for j, element in enumerate(row["elements"]):
-                                if element["status"] == "OK":
-                                    base_travel_time = element["duration"]["value"] / 60.0
-                                    unique_zone_id = unique_zones[j].zone_id
-
-                                    travel_time = base_travel_time + penalty
-                                    
-                                    for slot_idx, slot_zone in enumerate(zone_slots):
-                                        if slot_zone.zone_id == unique_zone_id:
-                                            cost_matrix[i, slot_idx] = travel_time
-                                else:
-                                    raise Exception("API Element status not OK")
-                        matrix = True
-            except Exception as e:
-                logger.warning(f"Google Maps batch request failed, fall back to Haversine")
-        if not matrix:
-            for i, driver in enumerate(drivers):
-                penalty = driver_penalties[i]
-                for j, zone in enumerate(zone_slots):
-                    cost_matrix[i, j] = self._get_travel_time(driver, zone) + penalty
-        
-        row_ind, col_ind = linear_sum_assignment(cost_matrix)
+        cost_matrix = self._build_cost_matrix(drivers, zones)
+        zone_idx = solve_transportation(cost_matrix, capacities)
 
         assignments = []
-        for i in range(len(row_ind)):
-            driver = drivers[row_ind[i]]
-            zone = zone_slots[col_ind[i]]
-            assignments.append((driver.driver_id, zone.zone_id))
+        for i, j in enumerate(zone_idx):
+            if j == UNASSIGNED:
+                continue
+            assignments.append((drivers[i].driver_id, zones[j].zone_id))
 
         return assignments
+
+    def _build_cost_matrix(self, drivers: List[Driver], zones: List[Zone]) -> csr_matrix:
+        """Sparse drivers x zones cost: only each driver's nearest candidate zones are kept"""
+        driver_lat, driver_lon = decode_points(d.location for d in drivers)
+        zone_lat, zone_lon = decode_points(z.centroid for z in zones)
+        penalties = self._driver_penalty_vector(drivers)
+
+        cost_matrix = nearest_zone_candidates(
+            driver_lat, driver_lon, zone_lat, zone_lon,
+            k=self.CANDIDATE_ZONES_K,
+            max_minutes=self.CANDIDATE_MAX_MINUTES
+        )
+
+        if self.travel_time_cache.provider is not None and cost_matrix.nnz:
+            # Road times only for candidate pairs; pairs the cache cannot resolve keep the Haversine estimate
+            pattern = cost_matrix.tocoo()
+            origins = list(zip(driver_lat[pattern.row], driver_lon[pattern.row]))
+            destinations = list(zip(zone_lat[pattern.col], zone_lon[pattern.col]))
+            road_minutes = self.travel_time_cache.get_pairs(origins, destinations) / 60.0
+
+            resolved = np.isfinite(road_minutes)
+            if not resolved.all():
+                logger.warning(f"Travel time cache resolved {int(resolved.sum())}/{resolved.size} pairs, rest use Haversine")
+            cost_matrix = csr_matrix(
+                (np.where(resolved, road_minutes, pattern.data), (pattern.row, pattern.col)),
+                shape=cost_matrix.shape
+            )
+
+        cost_matrix.data += np.repeat(penalties, np.diff(cost_matrix.indptr))
+        return cost_matrix
     
     def _get_travel_time(self, driver: Driver, zone: Zone) -> float:
         if not driver.location or not zone.centroid:
             return 999.0
         
-        try:
-            driver_shape = to_shape(driver.location)
-            zone_shape = to_shape(zone.centroid)
-
-            return self._calculate_haversine_distance(
-                driver_shape.y, driver_shape.x,
-                zone_shape.y, zone_shape.x
-            )
-        except Exception as e:
-            logger.error(f"Error calculating haversine distance: {e}")
-            return 999.0
+        driver_lat, driver_lon = decode_points([driver.location])
+        zone_lat, zone_lon = decode_points([zone.centroid])
+        return float(travel_time_matrix(driver_lat, driver_lon, zone_lat, zone_lon)[0, 0])
                 
-    def _apply_assignments(self, assignments):
-        for driver_id, zone_id in assignments:
-            driver = self.db.query(Driver).filter(Driver.driver_id == driver_id).first()
-            if not driver:
-                continue
+    def _apply_assignments(self, assignments: List[Tuple[str, str]], zones: Optional[List[Zone]] = None):
+        """Persist driver -> zone moves with one UPDATE, then publish and notify in bulk"""
+        # Last assignment wins if a driver appears twice
+        target_zone = dict(assignments)
+        if not target_zone:
+            return
+
+        old_zones = dict(
+            self.db.query(Driver.driver_id, Driver.current_zone)
+            .filter(Driver.driver_id.in_(list(target_zone.keys())))
+            .all()
+        )
+        moves = [(d_id, z_id) for d_id, z_id in target_zone.items() if d_id in old_zones]
+        if not moves:
+            return
 
-            old_zone = driver.current_zone
-            logger.info(f"Applying assignment: Driver {driver_id} from {old_zone} -> {zone_id}")
-            driver.current_zone = zone_id
-            self.db.add(driver)
+        if zones is None:
+            zones = self.db.query(Zone).filter(Zone.zone_id.in_({z for _, z in moves})).all()
+        zone_map = {z.zone_id: z for z in zones}
+        centroid_lat, centroid_lon = decode_points(z.centroid for z in zones)
+        zone_coords = {
+            z.zone_id: (
+                None if np.isnan(lat) else float(lat),
+                None if np.isnan(lon) else float(lon)
+            )
+            for z, lat, lon in zip(zones, centroid_lat, centroid_lon)
+        }
 
-            kafka_producer.publish("driver-zone-allocated", {
+        logger.info(f"Applying {len(moves)} zone assignments")
+        moved = values(
+            column("driver_id", String),
+            column("zone_id", String),
+            name="moved"
+        ).data(moves)
+        self.db.execute(
+            update(Driver)
+            .where(Driver.driver_id == moved.c.driver_id)
+            .values(current_zone=moved.c.zone_id)
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+        self.invalidate_zone_snapshot()
+
+        # The bulk UPDATE bypasses the ORM session hooks, so record the moves directly
+        available = DriverStatus.AVAILABLE.value
+        record_zone_pressure_changes([
+            ("driver", (old_zones[driver_id], available), (zone_id, available), None, False)
+            for driver_id, zone_id in moves
+        ])
+
+        timestamp = datetime.now().isoformat()
+        kafka_producer.publish_batch("driver-zone-allocated", [
+            {
                 "driver_id" : driver_id,
-                "old_zone" : old_zone,
+                "old_zone" : old_zones[driver_id],
                 "new_zone" : zone_id,
-                "timestamp" : datetime.now().isoformat()
-            })   
-            
-            zone_lat, zone_lon, zone_name = None, None, None
-            zone_obj = self.db.query(Zone).filter(Zone.zone_id == zone_id).first()
-            if zone_obj:
-                zone_name = zone_obj.name if hasattr(zone_obj, 'name') else None
-                if zone_obj.centroid:
-                    try:
-                        pt = to_shape(zone_obj.centroid)
-                        zone_lon = pt.x
-                        zone_lat = pt.y
-                    except:
-                        pass
-            
-            # Notify driver via Socket
-            emit_sync(socket_manager.notify_driver_allocation(driver_id, zone_id, zone_lat, zone_lon, zone_name))
-
-        self.db.commit()
+                "timestamp" : timestamp
+            }
+            for driver_id, zone_id in moves
+        ])
+
+        # Notify drivers via Socket
+        emit_sync(socket_manager.notify_driver_allocations([
+            {
+                "driver_id": driver_id,
+                "zone_id": zone_id,
+                "zone_lat": zone_coords.get(zone_id, (None, None))[0],
+                "zone_lon": zone_coords.get(zone_id, (None, None))[1],
+                "zone_name": getattr(zone_map.get(zone_id), "name", None)
+            }
+            for driver_id, zone_id in moves
+        ]))
 
     def _get_zone_stats(self, zones: List[Zone]) -> Dict[str, Dict]:
+        snapshot = self.get_zone_snapshot()
         stats = {}
         for zone in zones:
-            drivers = self.db.query(Driver).filter(
-                Driver.current_zone == zone.zone_id,
-                Driver.duty_status == DutyStatus.ON_DUTY.value
-            ).all()
-            available = sum(1 for d in drivers if d.status == DriverStatus.AVAILABLE.value)
-            pending = self.db.query(Order).filter(
-                Order.pickup_zone == zone.zone_id,
-                Order.status == "pending"
-            ).count()
-
-            recent_orders = self.db.query(Order).filter(
-                Order.pickup_zone == zone.zone_id,
-                Order.created_at >= datetime.utcnow() - timedelta(minutes=15)
-            ).count()
-
-            # Supply accounts for the fact that a driver can handle multiple orders (batching)
-            effective_supply = (available * self.DRIVER_CAPACITY) or 1
-            
-            demand_pressure = (pending + recent_orders * 0.5) / effective_supply
-
+            zs = snapshot.zone_stats(zone.zone_id, self.DRIVER_CAPACITY)
             stats[zone.zone_id] = {
                 "zone_id" : zone.zone_id,
-                "available_drivers" : available,
-                "pending_orders" : pending,
-                "recent_orders" : recent_orders,
-                "demand_pressure" : round(demand_pressure, 2),
+                "available_drivers" : zs["available_drivers"],
+                "pending_orders" : zs["pending_orders"],
+                "recent_orders" : zs["recent_orders"],
+                "demand_pressure" : zs["demand_pressure"],
             }
         return stats
 
     def _calculate_driver_penalties(self, driver : Driver) -> float:
-        penalty = 0.0
-
-        fatigue_score = getattr(driver, "fatigue_score", 0.0)
-        if fatigue_score > 0.65:
-            penalty += 60
-        elif fatigue_score > 0.4:
-            penalty += (fatigue_score * 50)
+        return float(self._driver_penalty_vector([driver])[0])
 
-        battery_level = getattr(driver, "battery_level", 100)
-        if battery_level < 20:
-            penalty += 30
-
-        return penalty
+    def _driver_penalty_vector(self, drivers : List[Driver]) -> np.ndarray:
+        return driver_penalties(
+            [getattr(d, "fatigue_score", 0.0) for d in drivers],
+            [getattr(d, "battery_level", 100) for d in drivers]
+        )
         
     
     def _rank_drivers_by_proximity(
@@ -628,40 +672,23 @@ class AllocationService:
             else:
                 driver_positions.append((driver, None, None))
         
-        if self.gmaps:
-            try:
-                origins = [
-                    (d, lat, lon) for d, lat, lon in driver_positions
-                    if lat is not None and lon is not None
-                ]
-                if origins:
-                    coords = [(lat, lon) for _, lat, lon in origins]
-                    dest = (zone_lat, zone_lon)
-
-                    matrix = self.gmaps.distance_matrix(
-                        origins=coords,
-                        destinations=[dest],
-                        mode="driving",
-                        departure_time="now",
-                        traffic_model="best_guess"
-                    )
-
-                    ranked = []
-                    for i, (driver, lat, lon) in enumerate(origins):
-                        row = matrix["rows"][i]["elements"][0]
-                        if row["status"] == "OK":
-                            duration_data = row.get("duration_in_traffic", row.get("duration", {}))
-                            travel_time = duration_data.get("value", 0) / 60.0
-                        else:
-                            travel_time = self._calculate_haversine_distance(lat, lon, zone_lat, zone_lon)
-                        
-                        ranked.append((driver, travel_time))
-
-                    no_loc_drivers = [(d, None) for d, lat, lon in driver_positions if lat is None]
-                    ranked.extend(no_loc_drivers)
-                    return sorted(ranked, key=lambda x: (x[1] is None, x[1] or 0))
-            except Exception as e:
-                logger.warning(f"Google Maps Distance Matrix failed, using Haversine fallback")
+        located = [(d, lat, lon) for d, lat, lon in driver_positions if lat is not None and lon is not None]
+        if self.travel_time_cache.provider is not None and located:
+            seconds = self.travel_time_cache.get_pairs(
+                [(lat, lon) for _, lat, lon in located],
+                [(zone_lat, zone_lon)] * len(located)
+            )
+
+            ranked = []
+            for (driver, lat, lon), duration in zip(located, seconds):
+                if np.isfinite(duration):
+                    travel_time = duration / 60.0
+                else:
+                    travel_time = self._calculate_haversine_distance(lat, lon, zone_lat, zone_lon)
+                ranked.append((driver, travel_time))
+
+            ranked.extend((d, None) for d, lat, lon in driver_positions if lat is None)
+            return sorted(ranked, key=lambda x: (x[1] is None, x[1] or 0))
 
         ranked = []
         for driver, lat, lon in driver_positions:
@@ -677,10 +704,5 @@ class AllocationService:
 
     @staticmethod
     def _calculate_haversine_distance(lat1, lon1, lat2, lon2):
-        R = 6371
-        dlat = math.radians(lat2 - lat1)
-        dlon = math.radians(lon2 - lon1)
-        a = math.sin(dlat / 2) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon/2)**2
-        distance_km = 2 * R * math.atan2(math.sqrt(a), math.sqrt(1-a))
-        return (distance_km / 45) * 60
-    
\ No newline at end of file
+        distance_km = float(haversine_km(lat1, lon1, lat2, lon2))
+        return (distance_km / 45) * 60
\ No newline at end of file
@@ -1,41 +1,178 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from datetime import datetime
-from typing import List, Optional
+from sqlalchemy import func, insert
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Sequence, Dict, Any, NamedTuple
 import math
+import logging
+import uuid
+import numpy as np
 from app.models.gps_track import GPSTrack
 from app.models.driver import Driver
 from app.schemas.sensor import LocationData, DistanceStats
+from app.optimization.cost_matrix import haversine_km
 from geoalchemy2.functions import ST_Distance, ST_MakePoint, ST_SetSRID, ST_Transform
 from geoalchemy2.elements import WKTElement
 import redis
 from app.core.redis_client import redis_client
+from app.services.eta_service import refresh_driver_eta
+from app.services.location_ingest_service import location_write_behind
+from app.services.gps_track_storage_service import gps_track_maintenance
+
+logger = logging.getLogger(__name__)
+
+LAST_POINT_TTL_SECONDS = 24 * 3600
+
+def _naive_utc(ts: datetime) -> datetime:
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+def _epoch_seconds(ts: datetime) -> float:
+    return (_naive_utc(ts) - datetime(1970, 1, 1)).total_seconds()
+
+class LastPoint(NamedTuple):
+    """Latest-recorded fix of a driver session and the distance chained up to it"""
+    latitude: float
+    longitude: float
+    recorded_at: datetime
+    cumulative_distance: float
+
+class LastPointCache:
+    """Per-session chain tail in Redis so ingestion does not re-read gps_tracks.
+
+    Entries are written after the points they describe commit and expire once a
+    session has been idle for a day; a miss falls back to the table. Writes only
+    land if they are at least as recent as the stored tail, so two workers
+    committing out of order cannot move it backwards.
+    """
+    PREFIX = "gps_last"
+    PUT_IF_NEWER = """
+local ts = redis.call('HGET', KEYS[1], 'ts')
+if ts and tonumber(ts) > tonumber(ARGV[3]) then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'lat', ARGV[1], 'lng', ARGV[2], 'ts', ARGV[3], 'km', ARGV[4])
+redis.call('EXPIRE', KEYS[1], ARGV[5])
+return 1
+"""
+
+    def __init__(self, redis=redis_client, ttl_seconds: int = LAST_POINT_TTL_SECONDS):
+        self.redis = redis
+        self.ttl_seconds = ttl_seconds
+        self._put_if_newer = redis.register_script(self.PUT_IF_NEWER)
+
+    def _key(self, driver_id: str, session_id: str) -> str:
+        return f"{self.PREFIX}:{driver_id}:{session_id}"
+
+    def get(self, driver_id: str, session_id: str) -> Optional[LastPoint]:
+        try:
+            cached = self.redis.hgetall(self._key(driver_id, session_id))
+        except redis.exceptions.RedisError as e:
+            logger.warning(f"Last GPS point cache unavailable: {e}")
+            return None
+        if not cached:
+            return None
+        return LastPoint(
+            float(cached["lat"]), float(cached["lng"]),
+            datetime(1970, 1, 1) + timedelta(seconds=float(cached["ts"])),
+            float(cached["km"])
+        )
+
+    def put(self, driver_id: str, session_id: str, point: LastPoint) -> bool:
+        """Store point unless the cached tail is newer; returns whether it was stored"""
+        try:
+            return bool(self._put_if_newer(
+                keys=[self._key(driver_id, session_id)],
+                args=[
+                    repr(point.latitude), repr(point.longitude), repr(_epoch_seconds(point.recorded_at)),
+                    repr(point.cumulative_distance), self.ttl_seconds
+                ]
+            ))
+        except redis.exceptions.RedisError as e:
+            logger.warning(f"Failed to cache last GPS point: {e}")
+            return False
+
+last_point_cache = LastPointCache()
+
+def _later(current: Optional[LastPoint], candidate: LastPoint) -> LastPoint:
+    """The point a one-at-a-time reader would now see as latest; ties go to the newer arrival.
+
+    Covers a tail read from gps_tracks that never made it into the cache; the
+    cache itself rejects writes older than what it holds.
+    """
+    if current is None or _epoch_seconds(candidate.recorded_at) >= _epoch_seconds(current.recorded_at):
+        return candidate
+    return current
+
+def chain_distances(
+    lat: np.ndarray,
+    lon: np.ndarray,
+    recorded_at: np.ndarray,
+    last: Optional[LastPoint] = None
+):
+    """Segment and cumulative km for points in arrival order.
+
+    Mirrors one-at-a-time ingestion: each point links to the latest-recorded point
+    seen before it (the stored last point or an earlier point of the batch), so a
+    late, out-of-order point hangs off the chain without moving it.
+    """
+    if last is not None:
+        lat = np.concatenate(([last.latitude], lat))
+        lon = np.concatenate(([last.longitude], lon))
+        recorded_at = np.concatenate(([_epoch_seconds(last.recorded_at)], recorded_at))
+        base = last.cumulative_distance or 0.0
+    else:
+        base = 0.0
+
+    n = len(lat)
+    positions = np.arange(n)
+    # Ties go to the later arrival
+    is_latest = recorded_at >= np.maximum.accumulate(recorded_at)
+    latest_so_far = np.maximum.accumulate(np.where(is_latest, positions, 0))
+
+    previous = np.concatenate(([0], latest_so_far[:-1]))
+    segment = haversine_km(lat[previous], lon[previous], lat, lon)
+    segment[0] = 0.0
+    chain = base + np.cumsum(np.where(is_latest, segment, 0.0))
+    cumulative = chain + np.where(is_latest, 0.0, segment)
+
+    if last is not None:
+        return segment[1:], cumulative[1:]
+    return segment, cumulative
 
 class DistanceTrackingService:
     def __init__(self, db: Session):
         self.db = db
 
-    def record_gps_point(self, driver_id: str, session_id: str, location_data: LocationData) -> GPSTrack:
-        last_point = self.db.query(GPSTrack).filter(
+    def _last_point(self, driver_id: str, session_id: str) -> Optional[LastPoint]:
+        cached = last_point_cache.get(driver_id, session_id)
+        if cached is not None:
+            return cached
+        row = self.db.query(
+            GPSTrack.latitude, GPSTrack.longitude, GPSTrack.recorded_at, GPSTrack.cumulative_distance
+        ).filter(
             GPSTrack.driver_id == driver_id,
             GPSTrack.session_id == session_id
         ).order_by(GPSTrack.recorded_at.desc()).first()
+        if row is None:
+            return None
+        return LastPoint(row.latitude, row.longitude, _naive_utc(row.recorded_at), row.cumulative_distance or 0.0)
+
+    def record_gps_point(self, driver_id: str, session_id: str, location_data: LocationData) -> GPSTrack:
+        gps_track_maintenance.ensure_running()
+        last_point = self._last_point(driver_id, session_id)
 
         distance_from_last = 0.0
         cumulative_distance = 0.0
 
         new_location_wkt = WKTElement(f'POINT({location_data.longitude} {location_data.latitude})', srid=4326)
 
-        if last_point and last_point.location:
-            distance_meters = self.db.query(
-                func.ST_Distance(
-                    last_point.location,
-                    new_location_wkt,
-                    True
-                )
-            ).scalar()
-
-            distance_from_last = distance_meters / 1000.0 if distance_meters else 0.0
+        if last_point:
+            # Same great-circle formula as the batch path so both build one chain
+            distance_from_last = float(haversine_km(
+                last_point.latitude, last_point.longitude, location_data.latitude, location_data.longitude
+            ))
             cumulative_distance = last_point.cumulative_distance + distance_from_last
 
         driver = self.db.query(Driver).filter(Driver.driver_id == driver_id).first()
@@ -94,36 +231,101 @@ class DistanceTrackingService:
         self.db.add(gps_track)
         self.db.commit()
         self.db.refresh(gps_track)
+        last_point_cache.put(driver_id, session_id, _later(last_point, LastPoint(
+            location_data.latitude, location_data.longitude, _naive_utc(location_data.timestamp), cumulative_distance
+        )))
+
+        refresh_driver_eta(self.db, driver_id, location_data.latitude, location_data.longitude)
         return gps_track
+
+    def record_gps_points(self, driver_id: str, session_id: str, points: Sequence[LocationData]) -> Dict[str, Any]:
+        """Store points buffered by the app in one INSERT, chained exactly as record_gps_point would"""
+        if not points:
+            return {"session_id": session_id, "inserted": 0, "cumulative_distance_km": None}
+        gps_track_maintenance.ensure_running()
+
+        last_point = self._last_point(driver_id, session_id)
+
+        lat = np.fromiter((p.latitude for p in points), dtype=np.float64, count=len(points))
+        lon = np.fromiter((p.longitude for p in points), dtype=np.float64, count=len(points))
+        recorded_at = np.fromiter((_epoch_seconds(p.timestamp) for p in points), dtype=np.float64, count=len(points))
+        segment, cumulative = chain_distances(lat, lon, recorded_at, last_point)
+
+        self.db.execute(insert(GPSTrack), [
+            {
+                "track_id": str(uuid.uuid4()),
+                "driver_id": driver_id,
+                "session_id": session_id,
+                "location": WKTElement(f'POINT({p.longitude} {p.latitude})', srid=4326),
+                "latitude": p.latitude,
+                "longitude": p.longitude,
+                "speed": p.speed,
+                "heading": p.heading,
+                "altitude": p.altitude,
+                "accuracy": p.accuracy,
+                "distance_from_last": float(segment[i]),
+                "cumulative_distance": float(cumulative[i]),
+                "recorded_at": p.timestamp
+            }
+            for i, p in enumerate(points)
+        ])
+
+        # argmax returns the first of equal timestamps; the chain treats the last one as latest
+        latest_index = len(points) - 1 - int(np.argmax(recorded_at[::-1]))
+        latest = points[latest_index]
+        driver = self.db.get(Driver, driver_id)
+        if driver:
+            if driver.status == "offline":
+                driver.status = "available"
+            if driver.duty_status == "off_duty":
+                driver.duty_status = "on_duty"
+                if not driver.report_time:
+                    driver.report_time = datetime.utcnow()
+        self.db.commit()
+        last_point_cache.put(driver_id, session_id, _later(last_point, LastPoint(
+            latest.latitude, latest.longitude, _naive_utc(latest.timestamp), float(cumulative[latest_index])
+        )))
+
+        if driver:
+            location_write_behind.ingest(
+                driver_id, driver.status, latest.latitude, latest.longitude,
+                speed=latest.speed, heading=latest.heading
+            )
+            refresh_driver_eta(self.db, driver_id, latest.latitude, latest.longitude)
+
+        return {
+            "session_id": session_id,
+            "inserted": len(points),
+            "cumulative_distance_km": float(cumulative[latest_index])
+        }
     
     def compute_distance_stats(self, driver_id: str, session_id: str) -> Optional[DistanceStats]:
-        points = self.db.query(GPSTrack).filter(
+        moving = GPSTrack.speed > 0
+        stats = self.db.query(
+            func.count(GPSTrack.track_id).label("points"),
+            func.min(GPSTrack.recorded_at).label("start_time"),
+            func.max(GPSTrack.recorded_at).label("end_time"),
+            func.array_agg(aggregate_order_by(GPSTrack.cumulative_distance, GPSTrack.recorded_at.desc()))[1].label("total_km"),
+            func.avg(GPSTrack.speed).filter(moving).label("avg_speed"),
+            func.max(GPSTrack.speed).filter(moving).label("max_speed")
+        ).filter(
             GPSTrack.driver_id == driver_id,
             GPSTrack.session_id == session_id
-        ).order_by(GPSTrack.recorded_at).all()
+        ).one()
 
-        if not points:
+        if not stats.points:
             return None
-        
-        first_point = points[0]
-        last_point = points[-1]
-
-        total_distance_km = last_point.cumulative_distance
-        duration_seconds = (last_point.recorded_at - first_point.recorded_at).total_seconds() 
-        total_duration_hours = duration_seconds / 3600.0
 
-        speeds = [p.speed for p in points if p.speed and p.speed > 0]
-        avg_speed = sum(speeds) / len(speeds) if speeds else 0.0
-        max_speed = max(speeds) if speeds else 0.0
+        total_duration_hours = (stats.end_time - stats.start_time).total_seconds() / 3600.0
 
         return DistanceStats(
             session_id=session_id,
-            total_distance_km=total_distance_km,
+            total_distance_km=stats.total_km or 0.0,
             total_duration_hours=total_duration_hours,
-            average_speed_kmh=avg_speed,
-            max_speed_kmh=max_speed,
-            start_time=first_point.recorded_at,
-            end_time=last_point.recorded_at if total_duration_hours > 0 else None
+            average_speed_kmh=float(stats.avg_speed or 0.0),
+            max_speed_kmh=float(stats.max_speed or 0.0),
+            start_time=stats.start_time,
+            end_time=stats.end_time if total_duration_hours > 0 else None
         )
     
     def get_today_distance(self, driver_id: str, start_time: Optional[datetime] = None) -> float:
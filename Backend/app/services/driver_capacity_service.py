@@ -0,0 +1,114 @@
+import logging
+from collections import defaultdict
+from typing import Dict, List, Optional
+from sqlalchemy import event, inspect, update, select, func, bindparam
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.models.driver import Driver
+from app.models.order import Order
+from app.schemas.order import OrderStatus
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_ORDER_STATUSES = (OrderStatus.assigned.value, OrderStatus.picked_up.value)
+
+def _counter(driver_id: Optional[str], order_status: Optional[str]) -> Optional[str]:
+    """Driver column an order in this state counts towards"""
+    if driver_id is None:
+        return None
+    if order_status in ACTIVE_ORDER_STATUSES:
+        return "active_orders"
+    if order_status == OrderStatus.offered.value:
+        return "offered_orders"
+    return None
+
+def _previous(obj, attr: str):
+    history = inspect(obj).attrs[attr].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(obj, attr)
+
+def order_count_deltas(session: Session) -> Dict[str, Dict[str, int]]:
+    """Per-driver counter changes implied by the Order rows in the pending flush"""
+    deltas: Dict[str, Dict[str, int]] = defaultdict(lambda: {"active_orders": 0, "offered_orders": 0})
+
+    for obj in session.new:
+        if isinstance(obj, Order):
+            counter = _counter(obj.driver_id, obj.status)
+            if counter:
+                deltas[obj.driver_id][counter] += 1
+
+    for obj in session.dirty:
+        if isinstance(obj, Order):
+            before_driver, before_status = _previous(obj, "driver_id"), _previous(obj, "status")
+            if (before_driver, before_status) == (obj.driver_id, obj.status):
+                continue
+            before = _counter(before_driver, before_status)
+            after = _counter(obj.driver_id, obj.status)
+            if before:
+                deltas[before_driver][before] -= 1
+            if after:
+                deltas[obj.driver_id][after] += 1
+
+    for obj in session.deleted:
+        if isinstance(obj, Order):
+            counter = _counter(_previous(obj, "driver_id"), _previous(obj, "status"))
+            if counter:
+                deltas[_previous(obj, "driver_id")][counter] -= 1
+
+    return {driver_id: d for driver_id, d in deltas.items() if d["active_orders"] or d["offered_orders"]}
+
+def apply_order_count_deltas(connection, deltas: Dict[str, Dict[str, int]]):
+    """Add per-driver counter deltas with one executemany; for writes that bypass the ORM flush"""
+    if not deltas:
+        return
+    drivers = Driver.__table__
+    connection.execute(
+        update(drivers).where(drivers.c.driver_id == bindparam("b_driver_id")).values(
+            active_orders=drivers.c.active_orders + bindparam("b_active"),
+            offered_orders=drivers.c.offered_orders + bindparam("b_offered")
+        ),
+        [
+            {"b_driver_id": driver_id, "b_active": d["active_orders"], "b_offered": d["offered_orders"]}
+            for driver_id, d in deltas.items()
+        ]
+    )
+
+@event.listens_for(Session, "after_flush")
+def _apply_order_count_deltas(session, flush_context):
+    deltas = order_count_deltas(session)
+    if not deltas:
+        return
+
+    # Runs on the flush's own connection, so the counters commit or roll back with the orders
+    apply_order_count_deltas(session.connection(), deltas)
+
+    # Keep already-loaded Driver instances in step without another SELECT
+    mapper = inspect(Driver)
+    for driver_id, d in deltas.items():
+        driver = session.identity_map.get(mapper.identity_key_from_primary_key((driver_id,)))
+        if driver is None:
+            continue
+        for counter, delta in d.items():
+            if counter in driver.__dict__ and delta:
+                set_committed_value(driver, counter, (driver.__dict__[counter] or 0) + delta)
+
+def reconcile_order_counts(db: Session, driver_ids: Optional[List[str]] = None) -> int:
+    """Recompute the counters from the orders table in one UPDATE; returns the number of drivers touched"""
+    active = select(func.count(Order.order_id)).where(
+        Order.driver_id == Driver.driver_id,
+        Order.status.in_(ACTIVE_ORDER_STATUSES)
+    ).scalar_subquery()
+    offered = select(func.count(Order.order_id)).where(
+        Order.driver_id == Driver.driver_id,
+        Order.status == OrderStatus.offered.value
+    ).scalar_subquery()
+
+    statement = update(Driver).values(active_orders=active, offered_orders=offered)
+    if driver_ids is not None:
+        statement = statement.where(Driver.driver_id.in_(driver_ids))
+    result = db.execute(statement.execution_options(synchronize_session=False))
+    db.commit()
+    logger.info(f"Reconciled order counters for {result.rowcount} drivers")
+    return result.rowcount
@@ -0,0 +1,166 @@
+import time
+import logging
+import numpy as np
+import redis as redis_lib
+from typing import Dict, List, Optional, Tuple, Iterable
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app.models.driver import Driver
+from app.core.redis_client import redis_client
+from app.schemas.driver import DriverStatus
+from app.optimization.cost_matrix import decode_points
+
+logger = logging.getLogger(__name__)
+
+# (driver_id, distance_meters, latitude, longitude)
+NearbyDriver = Tuple[str, float, float, float]
+
+class DriverGeoIndex:
+    """Live driver positions in Redis GEO sets, one set per driver status.
+
+    Location pings write straight to the index; status changes and other committed
+    Driver edits reach it through the session hooks below. PostGIS is only read to
+    rebuild the index, which happens on first use and again once built_at expires
+    so that writes bypassing the ORM cannot drift for long.
+    """
+    PREFIX = "driver_geo"
+    STATUSES = tuple(s.value for s in DriverStatus)
+    REBUILD_SECONDS = 3600
+
+    def __init__(self, redis=redis_client):
+        self.redis = redis
+
+    def _key(self, name: str) -> str:
+        return f"{self.PREFIX}:{name}"
+
+    def queue_upsert(self, pipe, driver_id: str, driver_status: Optional[str], lat: float, lng: float):
+        driver_status = driver_status or DriverStatus.OFFLINE.value
+        for other in self.STATUSES:
+            if other != driver_status:
+                pipe.zrem(self._key(other), driver_id)
+        pipe.geoadd(self._key(driver_status), [lng, lat, driver_id])
+
+    def queue_remove(self, pipe, driver_id: str):
+        for driver_status in self.STATUSES:
+            pipe.zrem(self._key(driver_status), driver_id)
+
+    def upsert(self, driver_id: str, driver_status: Optional[str], lat: float, lng: float):
+        self.apply([(driver_id, driver_status, lat, lng)])
+
+    def apply(self, updates: Iterable[Tuple[str, Optional[str], Optional[float], Optional[float]]]):
+        """Apply (driver_id, status, lat, lng) records in one round trip; a missing position removes the driver"""
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            queued = False
+            for driver_id, driver_status, lat, lng in updates:
+                if lat is None or lng is None or np.isnan(lat) or np.isnan(lng):
+                    self.queue_remove(pipe, driver_id)
+                else:
+                    self.queue_upsert(pipe, driver_id, driver_status, float(lat), float(lng))
+                queued = True
+            if queued:
+                pipe.execute()
+        except redis_lib.exceptions.RedisError as e:
+            logger.warning(f"Failed to update driver geo index: {e}")
+
+    def rebuild(self, db: Session) -> bool:
+        """Reload every located driver from PostGIS; returns False if Redis is unavailable"""
+        rows = db.query(Driver.driver_id, Driver.status, Driver.location).filter(Driver.location.isnot(None)).all()
+        lat, lng = decode_points(row.location for row in rows)
+
+        try:
+            # MULTI/EXEC so readers never see a half-loaded index
+            pipe = self.redis.pipeline()
+            pipe.delete(*(self._key(s) for s in self.STATUSES))
+            for row, row_lat, row_lng in zip(rows, lat, lng):
+                if not np.isnan(row_lat):
+                    pipe.geoadd(self._key(row.status or DriverStatus.OFFLINE.value), [float(row_lng), float(row_lat), row.driver_id])
+            pipe.set(self._key("built_at"), repr(time.time()), ex=self.REBUILD_SECONDS)
+            pipe.execute()
+        except redis_lib.exceptions.RedisError as e:
+            logger.warning(f"Failed to rebuild driver geo index: {e}")
+            return False
+
+        logger.info(f"Rebuilt driver geo index with {len(rows)} drivers")
+        return True
+
+    def _search(self, lat, lng, radius_km, statuses, count) -> Optional[List[NearbyDriver]]:
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.get(self._key("built_at"))
+        for driver_status in statuses:
+            pipe.geosearch(
+                self._key(driver_status), longitude=lng, latitude=lat, radius=radius_km, unit="km",
+                sort="ASC", count=count, withdist=True, withcoord=True
+            )
+        built_at, *partitions = pipe.execute()
+        if built_at is None:
+            return None
+
+        # Each partition is already sorted; merging a handful of short lists
+        found = [
+            (driver_id, float(distance_km) * 1000, float(coords[1]), float(coords[0]))
+            for partition in partitions
+            for driver_id, distance_km, coords in partition
+        ]
+        found.sort(key=lambda item: item[1])
+        return found[:count] if count else found
+
+    def nearby(
+        self,
+        db: Session,
+        lat: float,
+        lng: float,
+        radius_km: float,
+        statuses: Optional[Iterable[str]] = None,
+        count: Optional[int] = None
+    ) -> Optional[List[NearbyDriver]]:
+        """Drivers within radius_km in the given statuses, nearest first.
+
+        A cold index is rebuilt from db by whichever worker takes the rebuild lock;
+        None means the caller should query PostGIS instead.
+        """
+        statuses = list(statuses) if statuses is not None else list(self.STATUSES)
+        try:
+            found = self._search(lat, lng, radius_km, statuses, count)
+            if found is None and self.redis.set(self._key("rebuilding"), "1", nx=True, ex=30):
+                if self.rebuild(db):
+                    found = self._search(lat, lng, radius_km, statuses, count)
+            return found
+        except redis_lib.exceptions.RedisError as e:
+            logger.warning(f"Driver geo index unavailable: {e}")
+            return None
+
+
+driver_geo_index = DriverGeoIndex()
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_driver_positions(session, flush_context):
+    changed: Dict[str, Tuple[Optional[str], object]] = session.info.setdefault("driver_geo_changes", {})
+    for obj in session.new:
+        if isinstance(obj, Driver) and obj.location is not None:
+            changed[obj.driver_id] = (obj.status, obj.location)
+    for obj in session.dirty:
+        if isinstance(obj, Driver):
+            state = inspect(obj)
+            if state.attrs.status.history.has_changes() or state.attrs.location.history.has_changes():
+                changed[obj.driver_id] = (obj.status, obj.location)
+    for obj in session.deleted:
+        if isinstance(obj, Driver):
+            changed[obj.driver_id] = (None, None)
+
+@event.listens_for(Session, "after_commit")
+def _apply_driver_positions(session):
+    changed = list(session.info.pop("driver_geo_changes", {}).items())
+    if not changed:
+        return
+    lat, lng = decode_points(location for _, (_, location) in changed)
+    driver_geo_index.apply(
+        (driver_id, driver_status, lat[i], lng[i])
+        for i, (driver_id, (driver_status, _)) in enumerate(changed)
+    )
+
+@event.listens_for(Session, "after_rollback")
+def _discard_driver_positions(session):
+    session.info.pop("driver_geo_changes", None)
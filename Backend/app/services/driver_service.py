@@ -20,13 +20,18 @@ from app.schemas.driver import (
 )
 from app.services.allocation_service import AllocationService
 from app.services.distance_tracking_service import DistanceTrackingService
+from app.services.eta_service import refresh_driver_eta
+from app.services.driver_capacity_service import reconcile_order_counts
+from app.services.driver_geo_service import driver_geo_index
+from app.services.location_ingest_service import location_write_behind
 import logging
-import redis as redis_lib
 import math
 
 logger = logging.getLogger(__name__)
 
 class DriverService:
+    CAPACITY_OVERSAMPLE = 4
+
     def __init__(self, db: Session):
         self.db = db
 
@@ -131,51 +136,22 @@ class DriverService:
         self.db.commit()
     
     def update_location(self, driver_id: str, location_data: LocationSchema) -> Driver:
-        driver = self.get_driver_by_id(driver_id)
+        # Identity-map hit when the caller already loaded the driver on this session
+        driver = self.db.get(Driver, driver_id)
 
         if not driver:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Driver not found"
             )
-        
-        point_wkt = WKTElement(f'POINT({location_data.longitude} {location_data.latitude})', srid=4326)
-        driver.location = point_wkt
-        driver.updated_at = datetime.utcnow()
 
-        try:
-            if location_data.speed is not None:
-                redis_client.set(f"driver:{driver_id}:speed", str(location_data.speed))
-            if location_data.heading is not None:
-                redis_client.set(f"driver:{driver_id}:heading", str(location_data.heading))
-        except redis_lib.exceptions.ConnectionError:
-            pass
-
-        throttle_key = f"driver_location_throttle:{driver_id}"
-        try:
-            is_throttled = redis_client.get(throttle_key)
-            if not is_throttled:
-                cached_speed = redis_client.get(f"driver:{driver_id}:speed")
-                cached_heading = redis_client.get(f"driver:{driver_id}:heading")
-                if cached_speed is not None:
-                    driver.current_speed = float(cached_speed)
-                if cached_heading is not None:
-                    driver.heading = float(cached_heading)
-                self.db.commit()
-                redis_client.setex(throttle_key, 30, "1")
-        except redis_lib.exceptions.ConnectionError:
-            if location_data.speed is not None:
-                driver.current_speed = location_data.speed
-            if location_data.heading is not None:
-                driver.heading = location_data.heading
-            self.db.commit()
-
-        try:
-            publish_speed = float(redis_client.get(f"driver:{driver_id}:speed") or driver.current_speed or 0)
-            publish_heading = float(redis_client.get(f"driver:{driver_id}:heading") or driver.heading or 0)
-        except Exception:
-            publish_speed = driver.current_speed or 0
-            publish_heading = driver.heading or 0
+        # drivers.location / current_speed / heading are written behind in bulk
+        speed, heading = location_write_behind.ingest(
+            driver_id, driver.status, location_data.latitude, location_data.longitude,
+            speed=location_data.speed, heading=location_data.heading
+        )
+        publish_speed = speed if speed is not None else (driver.current_speed or 0)
+        publish_heading = heading if heading is not None else (driver.heading or 0)
 
         kafka_producer.publish("driver-location", {
             "driver_id": driver.driver_id,
@@ -187,6 +163,8 @@ class DriverService:
             "timestamp": str(datetime.now())
         })
 
+        refresh_driver_eta(self.db, driver_id, location_data.latitude, location_data.longitude)
+
         return driver
     
     def update_telemetry(self, driver_id: str, telemetry: TelemetryUpdate) -> Driver:
@@ -234,7 +212,39 @@ class DriverService:
 
         return LocationSchema(latitude=latitude, longitude=longitude)
     
+    @staticmethod
+    def _nearby_response(driver: Driver, distance: float, lat: float, lon: float) -> NearbyDriverResponse:
+        return NearbyDriverResponse(
+            driver_id=driver.driver_id,
+            name=driver.name,
+            status=DriverStatus(driver.status),
+            rating=driver.rating,
+            latitude=lat,
+            longitude=lon,
+            distance_meters=float(distance),
+            current_zone=driver.current_zone
+        )
+
+    def _load_indexed(self, found, *filters) -> List[NearbyDriverResponse]:
+        """Load geo index hits by primary key, re-checking status and capacity against the database"""
+        if not found:
+            return []
+        drivers = {
+            driver.driver_id: driver
+            for driver in self.db.query(Driver).filter(Driver.driver_id.in_([hit[0] for hit in found]), *filters).all()
+        }
+        return [
+            self._nearby_response(drivers[driver_id], distance, lat, lon)
+            for driver_id, distance, lat, lon in found if driver_id in drivers
+        ]
+
     def get_nearby_drivers(self, latitude: float, longitude: float, radius_km: float, status: Optional[DriverStatus] = DriverStatus.AVAILABLE, limit: int = 10):
+        statuses = [status.value] if status else None
+        found = driver_geo_index.nearby(self.db, latitude, longitude, radius_km, statuses, count=limit)
+        if found is not None:
+            filters = [Driver.status.in_(statuses)] if statuses else []
+            return self._load_indexed(found, *filters)
+
         point_wkt = WKTElement(f'POINT({longitude} {latitude})', srid=4326)
         radius_meters = radius_km * 1000  
 
@@ -254,22 +264,45 @@ class DriverService:
 
         results = query.all()
 
-        nearby_drivers = []
-        for driver, distance, lat, lon in results:
-            nearby_drivers.append(
-                NearbyDriverResponse(
-                    driver_id=driver.driver_id,
-                    name=driver.name,
-                    status=DriverStatus(driver.status),
-                    rating=driver.rating,
-                    latitude=lat,
-                    longitude=lon,
-                    distance_meters=float(distance),
-                    current_zone=driver.current_zone
-                )
-            )
+        return [self._nearby_response(driver, distance, lat, lon) for driver, distance, lat, lon in results]
+    
+    def get_nearby_drivers_with_capacity(
+        self, latitude: float, longitude: float, radius_km: float, max_orders: int,
+        limit: int = 5, exclude_driver_ids: Optional[List[str]] = None
+    ) -> List[NearbyDriverResponse]:
+        """Available or busy drivers within radius_km holding fewer than max_orders active or offered orders, nearest first"""
+        statuses = [DriverStatus.AVAILABLE.value, DriverStatus.BUSY.value]
+        exclude_driver_ids = exclude_driver_ids or []
+        filters = [Driver.status.in_(statuses), Driver.active_orders + Driver.offered_orders < max_orders]
+
+        # Capacity lives in PostgreSQL, so over-fetch candidates and widen to the whole radius if too few qualify
+        count = limit * self.CAPACITY_OVERSAMPLE + len(exclude_driver_ids)
+        found = driver_geo_index.nearby(self.db, latitude, longitude, radius_km, statuses, count=count)
+        if found is not None:
+            drivers = self._load_indexed([hit for hit in found if hit[0] not in exclude_driver_ids], *filters)
+            if len(drivers) < limit and len(found) == count:
+                wider = driver_geo_index.nearby(self.db, latitude, longitude, radius_km, statuses)
+                if wider is not None:
+                    drivers = self._load_indexed([hit for hit in wider if hit[0] not in exclude_driver_ids], *filters)
+            return drivers[:limit]
+
+        point_wkt = WKTElement(f'POINT({longitude} {latitude})', srid=4326)
+        distance = ST_Distance(Driver.location, point_wkt, True)
 
-        return nearby_drivers
+        query = self.db.query(
+            Driver,
+            distance.label('distance'),
+            ST_Y(Driver.location).label('latitude'),
+            ST_X(Driver.location).label('longitude')
+        ).filter(distance <= radius_km * 1000, *filters)
+        if exclude_driver_ids:
+            query = query.filter(Driver.driver_id.notin_(exclude_driver_ids))
+
+        results = query.order_by('distance').limit(limit).all()
+        return [self._nearby_response(driver, distance, lat, lon) for driver, distance, lat, lon in results]
+    
+    def reconcile_order_counts(self, driver_ids: Optional[List[str]] = None) -> int:
+        return reconcile_order_counts(self.db, driver_ids)
     
     def update_status(self, driver_id: str, new_status: DriverStatus) -> Driver:
         driver = self.get_driver_by_id(driver_id)
@@ -287,7 +320,7 @@ class DriverService:
         # Trigger allocation if becoming available
         if new_status == DriverStatus.AVAILABLE:
             allocation_service = AllocationService(self.db)
-            allocation_service.allocate_driver(driver_id)
+            allocation_service.allocate_driver(driver_id, driver)
 
         return driver
     
@@ -336,7 +369,7 @@ class DriverService:
         # Trigger initial allocation
         try:
             allocation_service = AllocationService(self.db)
-            allocation_service.allocate_driver(driver.driver_id)
+            allocation_service.allocate_driver(driver.driver_id, driver)
         except Exception as e:
             logger.error(f"Initial allocation failed: {e}")
 
@@ -0,0 +1,246 @@
+import time
+import logging
+import threading
+import numpy as np
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from sqlalchemy.orm import Session
+
+from app.models.assignment import Assignment
+from app.models.order import Order
+from app.schemas.order import OrderStatus
+from app.core.socket_manager import socket_manager, emit_sync
+from app.optimization.cost_matrix import EARTH_RADIUS_KM
+from app.optimization.polyline import decode_polyline
+
+logger = logging.getLogger(__name__)
+
+# Push an order's ETA again only once it has drifted this far from the last pushed value
+ETA_PUSH_THRESHOLD_SECONDS = 60
+# Farther than this from the polyline counts as off-route: search the whole route and
+# add the straight-line rejoin leg
+OFF_ROUTE_METERS = 150.0
+REJOIN_SPEED_KMH = 20.0
+# Segments examined behind/ahead of the last match before falling back to a full scan
+SEARCH_BEHIND_SEGMENTS = 2
+SEARCH_AHEAD_SEGMENTS = 40
+# How often a tracked (or known-idle) driver's active assignment is re-read from the DB
+ASSIGNMENT_RECHECK_SECONDS = 60
+
+Stop = Tuple[str, str, float, float]  # (order_id, "pickup" | "dropoff", lat, lng)
+
+class RouteProgress:
+    """A dispatched route as cumulative meters/seconds per polyline vertex.
+
+    The route's total duration is spread over segments in proportion to their
+    length, so remaining time at any point is an interpolation; each GPS fix is
+    projected onto a small window of segments around the previous match.
+    """
+
+    def __init__(self, assignment_id: str, lat: np.ndarray, lon: np.ndarray, duration_s: float, stops: Sequence[Stop]):
+        self.assignment_id = assignment_id
+        self.lat0 = float(lat[0])
+        self.lon0 = float(lon[0])
+        self.xy = self._to_xy(lat, lon)
+
+        seg = np.diff(self.xy, axis=0)
+        self.seg_len = np.hypot(seg[:, 0], seg[:, 1])
+        self.cum_m = np.concatenate(([0.0], np.cumsum(self.seg_len)))
+        total_m = self.cum_m[-1]
+        self.cum_s = self.cum_m / total_m * duration_s if total_m > 0 else np.zeros_like(self.cum_m)
+        self.segment = 0
+
+        # Stops are projected in visiting order so a route that doubles back keeps them monotonic
+        self.stops: List[Tuple[str, str, float]] = []
+        floor_m, floor_segment = 0.0, 0
+        for order_id, kind, stop_lat, stop_lng in stops:
+            offset, _, floor_segment = self._project(self._to_xy(stop_lat, stop_lng)[0], floor_segment, self.seg_len.size)
+            floor_m = max(floor_m, offset)
+            self.stops.append((order_id, kind, floor_m))
+
+    @classmethod
+    def build(
+        cls, assignment_id: str, polyline: Optional[str], duration_min: float,
+        stops: Sequence[Stop], origin: Optional[Tuple[float, float]] = None
+    ) -> "RouteProgress":
+        if polyline:
+            lat, lon = decode_polyline(polyline)
+        else:
+            # No geometry (nearest-neighbour fallback): straight legs between the stops
+            points = ([origin] if origin else []) + [(s[2], s[3]) for s in stops]
+            lat = np.array([p[0] for p in points], dtype=np.float64)
+            lon = np.array([p[1] for p in points], dtype=np.float64)
+        if lat.size == 1:
+            lat, lon = np.repeat(lat, 2), np.repeat(lon, 2)
+        return cls(assignment_id, lat, lon, (duration_min or 0.0) * 60.0, stops)
+
+    def _to_xy(self, lat, lon) -> np.ndarray:
+        lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+        lon = np.atleast_1d(np.asarray(lon, dtype=np.float64))
+        scale = EARTH_RADIUS_KM * 1000.0 * np.pi / 180.0
+        return np.column_stack([(lon - self.lon0) * scale * np.cos(np.radians(self.lat0)), (lat - self.lat0) * scale])
+
+    def _project(self, point: np.ndarray, lo: int, hi: int) -> Tuple[float, float, int]:
+        """(offset along route, distance from route, segment) of the closest point on segments [lo, hi)"""
+        a = self.xy[lo:hi]
+        ab = self.xy[lo + 1:hi + 1] - a
+        length_sq = (ab ** 2).sum(axis=1)
+        t = np.divide(((point - a) * ab).sum(axis=1), length_sq, out=np.zeros_like(length_sq), where=length_sq > 0)
+        t = np.clip(t, 0.0, 1.0)
+        closest = a + t[:, None] * ab
+        i = int(np.argmin(np.hypot(*(point - closest).T)))
+        return (
+            float(self.cum_m[lo + i] + t[i] * self.seg_len[lo + i]),
+            float(np.hypot(*(point - closest[i]))),
+            lo + i
+        )
+
+    def advance(self, lat: float, lng: float) -> Tuple[float, float]:
+        """Project a GPS fix, preferring segments near the last match; returns (offset_m, off_route_m)"""
+        point = self._to_xy(lat, lng)[0]
+        n_segments = self.seg_len.size
+        lo = max(0, self.segment - SEARCH_BEHIND_SEGMENTS)
+        hi = min(n_segments, self.segment + SEARCH_AHEAD_SEGMENTS)
+        offset, off_route, segment = self._project(point, lo, hi)
+        if off_route > OFF_ROUTE_METERS and (lo > 0 or hi < n_segments):
+            offset, off_route, segment = self._project(point, 0, n_segments)
+        self.segment = segment
+        return offset, off_route
+
+    def seconds_between(self, start_m: float, end_m: float) -> float:
+        return float(np.interp(end_m, self.cum_m, self.cum_s) - np.interp(start_m, self.cum_m, self.cum_s))
+
+class _Tracked:
+    def __init__(self, route: Optional[RouteProgress], checked_at: float):
+        self.route = route
+        self.checked_at = checked_at
+        self.last_pushed: Dict[str, datetime] = {}
+
+class EtaTracker:
+    """Per-driver live ETAs from GPS fixes against the stored route; no external calls"""
+
+    def __init__(self, push_threshold_seconds: float = ETA_PUSH_THRESHOLD_SECONDS, recheck_seconds: float = ASSIGNMENT_RECHECK_SECONDS):
+        self.push_threshold_seconds = push_threshold_seconds
+        self.recheck_seconds = recheck_seconds
+        self._drivers: Dict[str, _Tracked] = {}
+        self._lock = threading.Lock()
+
+    def track(self, driver_id: str, route: RouteProgress):
+        with self._lock:
+            self._drivers[driver_id] = _Tracked(route, time.monotonic())
+
+    def forget(self, driver_id: str):
+        with self._lock:
+            self._drivers.pop(driver_id, None)
+
+    def route_for(self, driver_id: str) -> Optional[RouteProgress]:
+        tracked = self._drivers.get(driver_id)
+        return tracked.route if tracked else None
+
+    def observe(
+        self, driver_id: str, lat: float, lng: float, now: Optional[datetime] = None,
+        loader: Optional[Callable[[str], Optional[RouteProgress]]] = None
+    ) -> Tuple[Optional[RouteProgress], Optional[datetime], List[Dict[str, Any]]]:
+        """Advance the driver's route; returns (route, ETA at the route's end, order ETA updates worth pushing)"""
+        now = now or datetime.utcnow()
+        tracked = self._drivers.get(driver_id)
+        if loader is not None and (tracked is None or time.monotonic() - tracked.checked_at >= self.recheck_seconds):
+            # The DB read happens outside the lock; only a new assignment resets progress
+            loaded = loader(driver_id)
+            with self._lock:
+                tracked = self._drivers.get(driver_id)
+                if tracked is None or loaded is None or tracked.route is None or loaded.assignment_id != tracked.route.assignment_id:
+                    tracked = _Tracked(loaded, time.monotonic())
+                    self._drivers[driver_id] = tracked
+                else:
+                    tracked.checked_at = time.monotonic()
+
+        with self._lock:
+            if tracked is None or tracked.route is None:
+                return None, None, []
+
+            route = tracked.route
+            offset, off_route = route.advance(lat, lng)
+            rejoin_s = off_route / (REJOIN_SPEED_KMH / 3.6) if off_route > OFF_ROUTE_METERS else 0.0
+
+            updates = []
+            for order_id, kind, stop_offset in route.stops:
+                if kind != "dropoff" or stop_offset < offset:
+                    continue
+                remaining_s = rejoin_s + route.seconds_between(offset, stop_offset)
+                eta = now + timedelta(seconds=remaining_s)
+                last = tracked.last_pushed.get(order_id)
+                if last is None or abs((eta - last).total_seconds()) > self.push_threshold_seconds:
+                    tracked.last_pushed[order_id] = eta
+                    updates.append({
+                        "order_id": order_id,
+                        "eta": eta,
+                        "remaining_min": round(remaining_s / 60.0, 1),
+                        "remaining_km": round((stop_offset - offset + off_route) / 1000.0, 2)
+                    })
+            route_eta = now + timedelta(seconds=rejoin_s + route.seconds_between(offset, route.cum_m[-1]))
+            return route, route_eta, updates
+
+eta_tracker = EtaTracker()
+
+def load_active_route(db: Session, driver_id: str) -> Optional[RouteProgress]:
+    """RouteProgress for the driver's latest in-progress assignment with undelivered orders"""
+    assignment = db.query(Assignment).filter(
+        Assignment.driver_id == driver_id,
+        Assignment.status.in_(["assigned", "in_progress"])
+    ).order_by(Assignment.assigned_at.desc()).first()
+    if not assignment:
+        return None
+
+    orders = db.query(Order).filter(
+        Order.assignment_id == assignment.assignment_id,
+        Order.status.in_([OrderStatus.assigned.value, OrderStatus.picked_up.value])
+    ).all()
+    if not orders:
+        return None
+
+    by_id = {o.order_id: o for o in orders}
+    stops = []
+    for entry in assignment.optimized_sequence or []:
+        kind, _, order_id = entry.partition("_")
+        order = by_id.get(order_id)
+        if order is None:
+            continue
+        if kind == "pickup":
+            stops.append((order_id, kind, order.pickup_latitude, order.pickup_longitude))
+        else:
+            stops.append((order_id, kind, order.dropoff_latitude, order.dropoff_longitude))
+    if not stops:
+        return None
+    return RouteProgress.build(assignment.assignment_id, assignment.route_polyline, assignment.estimated_time_min, stops)
+
+def track_dispatched_route(driver_id: str, assignment_id: str, route: Dict[str, Any], origin: Tuple[float, float], ordered_nodes: List[Dict[str, Any]]):
+    stops = [(n["id"], n["type"], n["lat"], n["lng"]) for n in ordered_nodes]
+    eta_tracker.track(driver_id, RouteProgress.build(
+        assignment_id, route.get("polyline"), route.get("duration_mins", 0.0), stops, origin=origin
+    ))
+
+def refresh_driver_eta(db: Session, driver_id: str, lat: float, lng: float, now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """Feed one GPS fix to the tracker; persist and push ETAs that moved past the threshold"""
+    try:
+        route, route_eta, updates = eta_tracker.observe(driver_id, lat, lng, now=now, loader=lambda d: load_active_route(db, d))
+    except Exception as e:
+        logger.warning(f"ETA refresh failed for driver {driver_id}: {e}")
+        return []
+    if not updates:
+        return []
+
+    db.query(Assignment).filter(Assignment.assignment_id == route.assignment_id).update(
+        {"eta": route_eta}, synchronize_session=False
+    )
+    db.commit()
+
+    emit_sync(socket_manager.notify_order_updates([
+        (u["order_id"], {
+            "eta": u["eta"].isoformat(),
+            "remaining_min": u["remaining_min"],
+            "remaining_km": u["remaining_km"]
+        })
+        for u in updates
+    ]))
+    return updates
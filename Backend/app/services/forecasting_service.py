@@ -14,6 +14,7 @@ from app.schemas.driver import DriverStatus
 from app.schemas.order import OrderStatus
 from app.schemas.analytics import DemandForecastResponse, DemandForecastPoint
 from app.services.genai_service import GenAIService
+from app.services.hot_zone_service import hot_zone_cache
 from ml.feature_engineering import FeatureEngineer
 from ml.demand_models import DemandForecaster
 
@@ -172,8 +173,42 @@ class ForecastingService:
                 forecasts.append(forecast)
         
         self.db.commit()
+        try:
+            hot_zone_cache.refresh(self.db)
+        except Exception as e:
+            print(f"Warning: Hot zone refresh after forecast failed: {e}")
         return forecasts
     
+    def get_zone_forecasts(
+        self,
+        zone_ids: Optional[List[str]] = None,
+        horizon_minutes: int = 60,
+        max_age_minutes: int = 30
+    ) -> Dict[str, float]:
+        """Latest precomputed prediction per zone for one horizon, in a single query.
+
+        Only rows generated within max_age_minutes count; zones without a fresh
+        row are left out so the caller can choose its own fallback.
+        """
+        cutoff = datetime.utcnow() - timedelta(minutes=max_age_minutes)
+        query = self.db.query(
+            DemandForecast.zone_id,
+            DemandForecast.predicted_demand
+        ).filter(
+            DemandForecast.forecast_horizon == horizon_minutes,
+            DemandForecast.created_at >= cutoff
+        )
+        if zone_ids is not None:
+            if not zone_ids:
+                return {}
+            query = query.filter(DemandForecast.zone_id.in_(zone_ids))
+
+        rows = query.distinct(DemandForecast.zone_id).order_by(
+            DemandForecast.zone_id,
+            DemandForecast.created_at.desc()
+        ).all()
+        return {zone_id: float(predicted) for zone_id, predicted in rows}
+    
     def update_live_demand(self, zone_id: str) -> Dict[str, Any]:
         zone = self.db.query(Zone).filter(Zone.zone_id == zone_id).first()
         if not zone:
@@ -0,0 +1,320 @@
+import time
+import logging
+import threading
+import numpy as np
+from datetime import date, datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+from sqlalchemy import select, text, update, delete
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.db.database import SessionLocal
+from app.models.gps_track import GPSTrack, GPSTrackPartition
+from app.optimization.polyline import simplify_polyline
+
+logger = logging.getLogger(__name__)
+
+PARTITION_AHEAD_DAYS = 3
+COMPACT_AFTER_DAYS = 2         # raw points are kept untouched this long
+RETENTION_DAYS = 90            # compacted partitions are dropped after this
+COMPACT_TOLERANCE_M = 10.0
+COMPACT_TIME_FLOOR_SECONDS = 60
+MAINTENANCE_INTERVAL_SECONDS = 3600
+MAINTENANCE_LOCK_KEY = 0x67707374  # pg advisory lock shared by all workers
+COMPACT_CHUNK_ROWS = 50000
+
+PARENT = GPSTrack.__tablename__
+DEFAULT_PARTITION = f"{PARENT}_default"
+
+def partition_name(day: date) -> str:
+    return f"{PARENT}_p{day:%Y%m%d}"
+
+def _bounds(day: date) -> Tuple[str, str]:
+    return day.isoformat(), (day + timedelta(days=1)).isoformat()
+
+def downsample_track(
+    lat: np.ndarray,
+    lon: np.ndarray,
+    recorded_at: np.ndarray,
+    speed: np.ndarray,
+    tolerance_m: float = COMPACT_TOLERANCE_M,
+    time_floor_s: float = COMPACT_TIME_FLOOR_SECONDS
+) -> np.ndarray:
+    """Boolean mask of the points of one time-ordered session track to keep.
+
+    Douglas-Peucker keeps the shape; the time floor keeps the first point of every
+    time_floor_s window so position-at-time lookups stay answerable. Endpoints and
+    the fastest point survive, so distance totals and max speed are unchanged.
+    """
+    n = len(lat)
+    keep = np.zeros(n, dtype=bool)
+    if n == 0:
+        return keep
+    keep[simplify_polyline(lat, lon, tolerance_m)] = True
+
+    buckets = np.floor(np.asarray(recorded_at, dtype=np.float64) / time_floor_s)
+    keep[np.r_[True, buckets[1:] != buckets[:-1]]] = True
+
+    speed = np.asarray(speed, dtype=np.float64)
+    if np.isfinite(speed).any():
+        keep[int(np.nanargmax(speed))] = True
+    return keep
+
+def _table_exists(db: Session, name: str) -> bool:
+    return db.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar() is not None
+
+def create_day_partition(db: Session, day: date) -> int:
+    """Create one day partition, moving that day's rows out of the default partition; returns rows moved.
+
+    CREATE ... PARTITION OF fails while the default partition holds rows in the
+    new range (points recorded ahead of the partition window), so the day is built
+    as a plain table, filled from the default partition and attached.
+    """
+    name = partition_name(day)
+    lower, upper = _bounds(day)
+    columns = ", ".join(c.name for c in GPSTrack.__table__.columns)
+    db.execute(text(f"CREATE TABLE {name} (LIKE {PARENT} INCLUDING DEFAULTS)"))
+    moved = db.execute(text(
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE recorded_at >= '{lower}' AND recorded_at < '{upper}' "
+        f"RETURNING {columns}) INSERT INTO {name} ({columns}) SELECT {columns} FROM moved"
+    )).rowcount
+    # A matching CHECK lets ATTACH skip its validation scan
+    db.execute(text(
+        f"ALTER TABLE {name} ADD CONSTRAINT {name}_bounds "
+        f"CHECK (recorded_at >= '{lower}' AND recorded_at < '{upper}')"
+    ))
+    db.execute(text(f"ALTER TABLE {PARENT} ATTACH PARTITION {name} FOR VALUES FROM ('{lower}') TO ('{upper}')"))
+    if moved:
+        logger.info(f"Moved {moved} points from {DEFAULT_PARTITION} into {name}")
+    return moved
+
+def ensure_partitions(db: Session, start: date, days: int = PARTITION_AHEAD_DAYS + 1):
+    """Create the default partition and one partition per day from start, registering each"""
+    db.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {PARENT} DEFAULT"))
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        if not _table_exists(db, partition_name(day)):
+            create_day_partition(db, day)
+        db.execute(pg_insert(GPSTrackPartition).values(day=day).on_conflict_do_nothing())
+
+def prepare_partitions(db: Session, today: Optional[date] = None) -> bool:
+    """Make sure today's points have somewhere to go before the first insert; returns True if it created any.
+
+    Cheap when the partitions already exist. Otherwise it waits for the
+    maintenance lock, so it never races a maintenance pass creating the same tables.
+    """
+    today = today or datetime.utcnow().date()
+    if _table_exists(db, DEFAULT_PARTITION) and _table_exists(db, partition_name(today)):
+        return False
+    db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MAINTENANCE_LOCK_KEY})
+    ensure_partitions(db, today - timedelta(days=1))
+    return True
+
+def _session_breaks(driver_ids: np.ndarray, session_ids: np.ndarray) -> np.ndarray:
+    """Start offsets of each (driver, session) run in rows sorted by driver, session, time"""
+    changed = np.r_[True, (driver_ids[1:] != driver_ids[:-1]) | (session_ids[1:] != session_ids[:-1])]
+    return np.flatnonzero(changed)
+
+def _kept_track_ids(rows: List[tuple], tolerance_m: float, time_floor_s: float) -> List[List[str]]:
+    """Ids to keep from rows sorted by driver, session, time, one list per session"""
+    track_ids = np.array([r.track_id for r in rows], dtype=object)
+    driver_ids = np.array([r.driver_id for r in rows], dtype=object)
+    session_ids = np.array([r.session_id or "" for r in rows], dtype=object)
+    lat = np.fromiter((r.latitude for r in rows), dtype=np.float64, count=len(rows))
+    lon = np.fromiter((r.longitude for r in rows), dtype=np.float64, count=len(rows))
+    speed = np.array([np.nan if r.speed is None else r.speed for r in rows], dtype=np.float64)
+    epoch = np.fromiter(
+        ((r.recorded_at - datetime(1970, 1, 1)).total_seconds() for r in rows), dtype=np.float64, count=len(rows)
+    )
+
+    kept = []
+    starts = _session_breaks(driver_ids, session_ids)
+    for start, end in zip(starts, np.r_[starts[1:], len(rows)]):
+        keep = downsample_track(
+            lat[start:end], lon[start:end], epoch[start:end], speed[start:end], tolerance_m, time_floor_s
+        )
+        kept.append(track_ids[start:end][keep].tolist())
+    return kept
+
+def _last_session_start(rows: List[tuple]) -> int:
+    last = (rows[-1].driver_id, rows[-1].session_id)
+    i = len(rows) - 1
+    while i > 0 and (rows[i - 1].driver_id, rows[i - 1].session_id) == last:
+        i -= 1
+    return i
+
+def compact_partition(
+    db: Session,
+    day: date,
+    tolerance_m: float = COMPACT_TOLERANCE_M,
+    time_floor_s: float = COMPACT_TIME_FLOOR_SECONDS
+) -> Tuple[int, int]:
+    """Rewrite one day partition with only the downsampled points; returns (raw, kept).
+
+    The kept rows are copied server-side into a fresh table which is swapped in for
+    the raw partition in the same transaction, so there is no delete bloat and
+    readers see either the raw or the compacted day, never a mix.
+    """
+    name = partition_name(day)
+    compacted = f"{name}_c"
+    lower, upper = _bounds(day)
+    columns = GPSTrack.__table__.c
+    result = db.execute(
+        select(columns.track_id, columns.driver_id, columns.session_id, columns.latitude,
+               columns.longitude, columns.speed, columns.recorded_at)
+        .where(columns.recorded_at >= datetime.fromisoformat(lower), columns.recorded_at < datetime.fromisoformat(upper))
+        .order_by(columns.driver_id, columns.session_id, columns.recorded_at)
+        .execution_options(yield_per=COMPACT_CHUNK_ROWS)
+    )
+
+    raw = 0
+    sessions: List[List[str]] = []
+    carry: List[tuple] = []
+    for chunk in result.partitions():
+        raw += len(chunk)
+        rows = carry + list(chunk)
+        # The last session may continue in the next chunk
+        tail = _last_session_start(rows)
+        if tail:
+            sessions.extend(_kept_track_ids(rows[:tail], tolerance_m, time_floor_s))
+        carry = rows[tail:]
+    if carry:
+        sessions.extend(_kept_track_ids(carry, tolerance_m, time_floor_s))
+
+    db.execute(text(f"DROP TABLE IF EXISTS {compacted}"))
+    db.execute(text(f"CREATE TABLE {compacted} (LIKE {PARENT} INCLUDING DEFAULTS)"))
+    # distance_from_last is re-chained between kept points so sums over a day still add up
+    names = [c.name for c in GPSTrack.__table__.columns]
+    selected = ", ".join(
+        "COALESCE(cumulative_distance - LAG(cumulative_distance) OVER "
+        "(PARTITION BY driver_id, session_id ORDER BY recorded_at), distance_from_last)"
+        if c == "distance_from_last" else c
+        for c in names
+    )
+    insert_kept = text(f"INSERT INTO {compacted} ({', '.join(names)}) SELECT {selected} FROM {name} WHERE track_id = ANY(:ids)")
+    # Whole sessions per statement, otherwise LAG would restart mid-session
+    batch: List[str] = []
+    for ids in sessions:
+        batch.extend(ids)
+        if len(batch) >= COMPACT_CHUNK_ROWS:
+            db.execute(insert_kept, {"ids": batch})
+            batch = []
+    if batch:
+        db.execute(insert_kept, {"ids": batch})
+    kept = sum(len(ids) for ids in sessions)
+
+    # A matching CHECK lets ATTACH skip its validation scan
+    db.execute(text(
+        f"ALTER TABLE {compacted} ADD CONSTRAINT {compacted}_bounds "
+        f"CHECK (recorded_at >= '{lower}' AND recorded_at < '{upper}')"
+    ))
+    db.execute(text(f"ALTER TABLE {PARENT} DETACH PARTITION {name}"))
+    db.execute(text(f"DROP TABLE {name}"))
+    db.execute(text(f"ALTER TABLE {compacted} RENAME TO {name}"))
+    db.execute(text(f"ALTER TABLE {PARENT} ATTACH PARTITION {name} FOR VALUES FROM ('{lower}') TO ('{upper}')"))
+
+    db.execute(
+        update(GPSTrackPartition).where(GPSTrackPartition.day == day)
+        .values(raw_points=raw, kept_points=kept, compacted_at=datetime.utcnow())
+    )
+    return raw, kept
+
+def drop_partition(db: Session, day: date):
+    db.execute(text(f"DROP TABLE IF EXISTS {partition_name(day)}"))
+    db.execute(delete(GPSTrackPartition).where(GPSTrackPartition.day == day))
+
+def run_maintenance(db: Session, today: Optional[date] = None) -> Dict[str, Any]:
+    """Create upcoming partitions, compact aged ones and apply retention, committing per step.
+
+    Only one worker at a time does the work; the others return immediately.
+    """
+    today = today or datetime.utcnow().date()
+    summary: Dict[str, Any] = {"created_through": None, "compacted": [], "dropped": [], "skipped": False}
+
+    # Session-level lock on its own connection; db releases its connection on every commit
+    lock = db.get_bind().connect()
+    if not lock.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": MAINTENANCE_LOCK_KEY}).scalar():
+        lock.close()
+        summary["skipped"] = True
+        return summary
+    try:
+        ensure_partitions(db, today - timedelta(days=1))
+        db.commit()
+        summary["created_through"] = (today + timedelta(days=PARTITION_AHEAD_DAYS)).isoformat()
+
+        expired = [day for (day,) in db.query(GPSTrackPartition.day).filter(
+            GPSTrackPartition.day < today - timedelta(days=RETENTION_DAYS)
+        ).all()]
+        for day in expired:
+            drop_partition(db, day)
+            db.commit()
+            summary["dropped"].append(day.isoformat())
+
+        due = [day for (day,) in db.query(GPSTrackPartition.day).filter(
+            GPSTrackPartition.compacted_at.is_(None),
+            GPSTrackPartition.day < today - timedelta(days=COMPACT_AFTER_DAYS)
+        ).order_by(GPSTrackPartition.day).all()]
+        for day in due:
+            try:
+                raw, kept = compact_partition(db, day)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"Compacting {partition_name(day)} failed: {e}")
+                continue
+            summary["compacted"].append({"day": day.isoformat(), "raw_points": raw, "kept_points": kept})
+            logger.info(f"Compacted {partition_name(day)}: {raw} -> {kept} points")
+    finally:
+        lock.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MAINTENANCE_LOCK_KEY})
+        lock.close()
+    return summary
+
+
+class GPSTrackMaintenance:
+    """Background thread running run_maintenance() every interval_seconds.
+
+    Started lazily by GPS ingestion. The first call also prepares today's partitions
+    synchronously, since the thread's first pass could otherwise lose the race with
+    the insert that started it; later points that slip past the window land in the
+    default partition until their day is created.
+    """
+
+    def __init__(self, interval_seconds: float = MAINTENANCE_INTERVAL_SECONDS):
+        self.interval_seconds = interval_seconds
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def ensure_running(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._prepare()
+            self._thread = threading.Thread(target=self._run, name="gps-track-maintenance", daemon=True)
+            self._thread.start()
+
+    def _prepare(self):
+        db = SessionLocal()
+        try:
+            prepare_partitions(db)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Preparing GPS track partitions failed: {e}")
+        finally:
+            db.close()
+
+    def _run(self):
+        while True:
+            db = SessionLocal()
+            try:
+                run_maintenance(db)
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"GPS track maintenance failed: {e}")
+            finally:
+                db.close()
+            time.sleep(self.interval_seconds)
+
+gps_track_maintenance = GPSTrackMaintenance()
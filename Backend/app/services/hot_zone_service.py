@@ -0,0 +1,155 @@
+import time
+import logging
+import threading
+import numpy as np
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+
+from app.db.database import SessionLocal
+from app.models.zone import Zone, DemandForecast
+from app.optimization.cost_matrix import decode_points, haversine_km
+
+logger = logging.getLogger(__name__)
+
+HOT_ZONE_LIMIT = 5
+# Forecasts are regenerated every few minutes; older snapshots are rebuilt in the background
+HOT_ZONE_REFRESH_SECONDS = 180
+# A surge zone is worth visiting only if the detour through it stays within this ratio of the direct leg
+MAX_DETOUR_RATIO = 1.3
+
+class HotZones:
+    """Top surge zones as parallel arrays, ordered by demand (highest first)"""
+
+    def __init__(self, zone_ids: List[str], names: List[str], lat: np.ndarray, lng: np.ndarray, demand: np.ndarray):
+        self.zone_ids = zone_ids
+        self.names = names
+        self.lat = lat
+        self.lng = lng
+        self.demand = demand
+        self.built_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.zone_ids)
+
+    @property
+    def age_seconds(self) -> float:
+        return time.monotonic() - self.built_at
+
+    def best_detour(
+        self, origin: Tuple[float, float], destination: Tuple[float, float],
+        max_ratio: float = MAX_DETOUR_RATIO
+    ) -> Optional[Dict[str, Any]]:
+        """Highest-demand zone whose origin -> zone -> destination detour is within max_ratio"""
+        if not self.zone_ids:
+            return None
+        direct = haversine_km(origin[0], origin[1], destination[0], destination[1])
+        via = (
+            haversine_km(origin[0], origin[1], self.lat, self.lng)
+            + haversine_km(self.lat, self.lng, destination[0], destination[1])
+        )
+        within = np.flatnonzero(via <= direct * max_ratio)
+        if within.size == 0:
+            return None
+        i = int(within[0])
+        return {
+            "zone_id": self.zone_ids[i],
+            "name": self.names[i],
+            "demand": float(self.demand[i]),
+            "lat": float(self.lat[i]),
+            "lng": float(self.lng[i]),
+            "detour_km": round(float(via[i] - direct), 2)
+        }
+
+def build_hot_zones(db: Session, limit: int = HOT_ZONE_LIMIT) -> HotZones:
+    """Zones with the highest forecast demand over the next hour, or the highest demand score without forecasts"""
+    now = datetime.utcnow()
+    forecasts = db.query(
+        DemandForecast.zone_id,
+        func.max(DemandForecast.predicted_demand).label('max_demand')
+    ).filter(
+        DemandForecast.forecast_time >= now,
+        DemandForecast.forecast_time <= now + timedelta(hours=1)
+    ).group_by(DemandForecast.zone_id).order_by(
+        func.max(DemandForecast.predicted_demand).desc()
+    ).limit(limit).all()
+
+    if forecasts:
+        rows = db.query(Zone.zone_id, Zone.name, Zone.centroid).filter(
+            Zone.zone_id.in_([f.zone_id for f in forecasts]),
+            Zone.centroid.isnot(None)
+        ).all()
+        by_id = {r.zone_id: r for r in rows}
+        ranked = [(by_id[f.zone_id], f.max_demand) for f in forecasts if f.zone_id in by_id]
+    else:
+        rows = db.query(Zone.zone_id, Zone.name, Zone.centroid, Zone.demand_score).filter(
+            Zone.centroid.isnot(None),
+            Zone.demand_score.isnot(None)
+        ).order_by(Zone.demand_score.desc()).limit(limit).all()
+        ranked = [(r, r.demand_score) for r in rows]
+
+    lat, lng = decode_points(r.centroid for r, _ in ranked)
+    keep = np.isfinite(lat) & np.isfinite(lng)
+    return HotZones(
+        [r.zone_id for (r, _), k in zip(ranked, keep) if k],
+        [r.name for (r, _), k in zip(ranked, keep) if k],
+        lat[keep],
+        lng[keep],
+        np.array([float(d or 0.0) for _, d in ranked], dtype=np.float64)[keep]
+    )
+
+class HotZoneCache:
+    """Process-wide hot-zone snapshot kept off the dispatch path.
+
+    Only the very first read builds synchronously; afterwards a stale snapshot
+    keeps being served while one background thread rebuilds it on its own
+    session. Forecast writers call refresh() to publish new zones immediately.
+    """
+
+    def __init__(self, refresh_seconds: float = HOT_ZONE_REFRESH_SECONDS, limit: int = HOT_ZONE_LIMIT):
+        self.refresh_seconds = refresh_seconds
+        self.limit = limit
+        self._snapshot: Optional[HotZones] = None
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def get(self, db: Session) -> HotZones:
+        snapshot = self._snapshot
+        if snapshot is None:
+            return self.refresh(db)
+        if snapshot.age_seconds > self.refresh_seconds:
+            self._refresh_in_background()
+        return snapshot
+
+    def refresh(self, db: Session) -> HotZones:
+        snapshot = build_hot_zones(db, self.limit)
+        self._snapshot = snapshot
+        logger.debug(f"Hot zones refreshed: {snapshot.zone_ids}")
+        return snapshot
+
+    def invalidate(self):
+        self._snapshot = None
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._background_refresh, name="hot-zones", daemon=True).start()
+
+    def _background_refresh(self):
+        db = SessionLocal()
+        try:
+            self.refresh(db)
+        except Exception as e:
+            logger.warning(f"Hot zone refresh failed: {e}")
+            # Keep serving the old zones and retry after another refresh interval
+            if self._snapshot is not None:
+                self._snapshot.built_at = time.monotonic()
+        finally:
+            db.close()
+            with self._lock:
+                self._refreshing = False
+
+hot_zone_cache = HotZoneCache()
@@ -0,0 +1,151 @@
+import time
+import atexit
+import logging
+import threading
+import redis as redis_lib
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from sqlalchemy import update, bindparam, func, or_, event
+
+from app.models.driver import Driver
+from app.db.database import SessionLocal
+from app.core.redis_client import redis_client
+from app.services.driver_geo_service import driver_geo_index
+
+logger = logging.getLogger(__name__)
+
+LOCATION_FLUSH_SECONDS = 2.0
+
+# (latitude, longitude, speed, heading, received_at)
+BufferedFix = Tuple[float, float, Optional[float], Optional[float], datetime]
+
+class LocationWriteBehind:
+    """Driver location pings: hot state to Redis now, drivers rows to PostgreSQL later.
+
+    ingest() does a single pipelined Redis round trip (speed, heading, geo index)
+    and keeps only the newest fix per driver in memory. A background thread writes
+    the buffered fixes to drivers.location / current_speed / heading every
+    flush_seconds with one executemany UPDATE, so the request path never waits on
+    PostgreSQL. A fix older than the row's location_updated_at is skipped rather
+    than overwriting a newer position from another worker; edits to other driver
+    columns do not hold it back.
+    """
+
+    def __init__(self, redis=redis_client, flush_seconds: float = LOCATION_FLUSH_SECONDS, session_factory=SessionLocal):
+        self.redis = redis
+        self.flush_seconds = flush_seconds
+        self.session_factory = session_factory
+        self._pending: Dict[str, BufferedFix] = {}
+        self._lock = threading.Lock()
+        self._flusher: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _speed_key(driver_id: str) -> str:
+        return f"driver:{driver_id}:speed"
+
+    @staticmethod
+    def _heading_key(driver_id: str) -> str:
+        return f"driver:{driver_id}:heading"
+
+    def ingest(
+        self,
+        driver_id: str,
+        driver_status: Optional[str],
+        lat: float,
+        lng: float,
+        speed: Optional[float] = None,
+        heading: Optional[float] = None
+    ) -> Tuple[Optional[float], Optional[float]]:
+        """Record one fix; returns the latest known (speed, heading) for the driver"""
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            if speed is not None:
+                pipe.set(self._speed_key(driver_id), str(speed))
+            if heading is not None:
+                pipe.set(self._heading_key(driver_id), str(heading))
+            pipe.get(self._speed_key(driver_id))
+            pipe.get(self._heading_key(driver_id))
+            driver_geo_index.queue_upsert(pipe, driver_id, driver_status, lat, lng)
+            results = pipe.execute()
+            queued_sets = (speed is not None) + (heading is not None)
+            cached_speed, cached_heading = results[queued_sets:queued_sets + 2]
+            speed = float(cached_speed) if cached_speed is not None else speed
+            heading = float(cached_heading) if cached_heading is not None else heading
+        except redis_lib.exceptions.RedisError as e:
+            logger.warning(f"Failed to cache location for driver {driver_id}: {e}")
+
+        with self._lock:
+            previous = self._pending.get(driver_id)
+            if previous is not None:
+                speed = speed if speed is not None else previous[2]
+                heading = heading if heading is not None else previous[3]
+            self._pending[driver_id] = (lat, lng, speed, heading, datetime.utcnow())
+        self._ensure_flusher()
+        return speed, heading
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def flush(self) -> int:
+        """Write buffered fixes in one statement; returns the number of drivers sent"""
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        if not batch:
+            return 0
+
+        drivers = Driver.__table__
+        statement = update(drivers).where(
+            drivers.c.driver_id == bindparam("b_driver_id"),
+            or_(drivers.c.location_updated_at.is_(None), drivers.c.location_updated_at <= bindparam("b_received_at"))
+        ).values(
+            location=func.ST_SetSRID(func.ST_MakePoint(bindparam("b_lng"), bindparam("b_lat")), 4326),
+            location_updated_at=bindparam("b_received_at"),
+            current_speed=func.coalesce(bindparam("b_speed"), drivers.c.current_speed),
+            heading=func.coalesce(bindparam("b_heading"), drivers.c.heading)
+        )
+        rows = [
+            {"b_driver_id": driver_id, "b_lat": lat, "b_lng": lng, "b_speed": speed, "b_heading": heading, "b_received_at": received_at}
+            for driver_id, (lat, lng, speed, heading, received_at) in batch.items()
+        ]
+
+        db = self.session_factory()
+        try:
+            db.execute(statement, rows)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Location flush of {len(rows)} drivers failed, retrying next cycle: {e}")
+            with self._lock:
+                for driver_id, fix in batch.items():
+                    self._pending.setdefault(driver_id, fix)
+            return 0
+        finally:
+            db.close()
+        return len(rows)
+
+    def _ensure_flusher(self):
+        if self._flusher is not None:
+            return
+        with self._lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(target=self._run, name="location-flush", daemon=True)
+        self._flusher.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_seconds)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning(f"Location flush failed: {e}")
+
+
+location_write_behind = LocationWriteBehind()
+atexit.register(location_write_behind.flush)
+
+
+@event.listens_for(Driver.location, "set")
+def _stamp_location(target, value, oldvalue, initiator):
+    # Positions written through the ORM (shift start/end, breaks, GPS sessions) win over older buffered fixes
+    target.location_updated_at = datetime.utcnow()
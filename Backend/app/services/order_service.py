@@ -1,21 +1,30 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, update
 from fastapi import HTTPException, status
 from typing import Optional, List, Tuple, Dict, Any
 from datetime import datetime, timedelta
 from geoalchemy2.functions import ST_Distance, ST_MakePoint, ST_X, ST_Y
 from geoalchemy2.elements import WKTElement
 import googlemaps
-import requests as req
 import logging
-from app.core.config import settings
+import uuid
+import io
+import csv
+import numpy as np
 from app.core.kafka import kafka_producer
+from app.core.routes_client import routes_client
+from app.db.database import SessionLocal
 from app.models.order import Order
 from app.models.driver import Driver
 from app.services.driver_service import DriverService
 from app.services.routing_service import RoutingEngine
 from app.schemas.driver import DriverStatus
-from app.models.zone import Zone
+from app.services.zone_index_service import zone_index_cache
+from app.services.driver_capacity_service import apply_order_count_deltas
+from app.services.zone_pressure_service import record_changes as record_zone_pressure_changes
+from app.optimization.cost_matrix import haversine_km, DEFAULT_SPEED_KMH
+from app.optimization.candidates import nearest_zone_candidates
+from app.optimization.zone_index import ZoneIndex
 from app.schemas.order import (
     OrderCreate, OrderUpdate, OrderAssign, OrderPickup, OrderDeliver,
     OrderStats, OrderStatus, OrderResponse)
@@ -24,10 +33,51 @@ from app.core.socket_manager import socket_manager, emit_sync
 
 logger = logging.getLogger(__name__)
 
+ORDER_ROUTE_FIELD_MASK = "routes.duration,routes.distanceMeters,routes.polyline.encodedPolyline"
+BASE_DELIVERY_FEE = 7.0
+DELIVERY_FEE_PER_KM = 1.2
+# Without a road route, distance is the straight line times this factor at FALLBACK_SPEED_KMH
+FALLBACK_DETOUR_FACTOR = 1.3
+FALLBACK_SPEED_KMH = 45.0
+
+def order_route_payload(pickup_lat: float, pickup_lng: float, dropoff_lat: float, dropoff_lng: float) -> Dict[str, Any]:
+    return {
+        "origin": {
+            "location": {
+                "latLng": {
+                    "latitude": pickup_lat,
+                    "longitude": pickup_lng
+                }
+            }
+        },
+        "destination": {
+            "location": {
+                "latLng": {
+                    "latitude": dropoff_lat,
+                    "longitude": dropoff_lng
+                }
+            }
+        },
+        "travelMode": "DRIVE",
+        "routingPreference": "TRAFFIC_AWARE"
+    }
+
+def route_info(route: Dict[str, Any]) -> Dict[str, Any]:
+    """distance_km / duration_min / route_polyline from one computeRoutes route"""
+    return {
+        "distance_km": round(route.get("distanceMeters", 0) / 1000.0, 2),
+        "duration_min": round(float(route.get("duration", "0s").replace("s", "")) / 60.0, 1),
+        "route_polyline": route.get("polyline", {}).get("encodedPolyline", "")
+    }
+
+def delivery_fee(distance_km: float) -> float:
+    return round(BASE_DELIVERY_FEE + (distance_km * DELIVERY_FEE_PER_KM), 2)
+
 class OrderService:
     def __init__(self, db: Session):
         self.db = db
         self.MAX_CONCURRENT_ORDERS = 3
+        self.OFFER_CANDIDATES_K = 5
     
     def create_order(self, order_data: OrderCreate) -> Order:
         order = Order(
@@ -75,6 +125,135 @@ class OrderService:
 
         return order
     
+    def create_orders_bulk(self, orders_data: List[OrderCreate], auto_offer: bool = True) -> Dict[str, Any]:
+        """Insert a batch of validated orders with one COPY.
+
+        Zones come from one vectorized index lookup and distance/fee from the
+        straight-line fallback; road routes are filled in later by
+        enrich_order_routes. With auto_offer, one nearest-first matching pass
+        over drivers with spare capacity turns orders into exclusive offers;
+        the rest stay pending for dispatch.
+        """
+        now = datetime.utcnow()
+        coords = np.array([
+            [o.pickup_latitude, o.pickup_longitude, o.dropoff_latitude, o.dropoff_longitude] for o in orders_data
+        ], dtype=np.float64)
+
+        index = zone_index_cache.get(self.db)
+        pickup_zones = index.lookup(coords[:, 0], coords[:, 1])
+        dropoff_zones = index.lookup(coords[:, 2], coords[:, 3])
+
+        distance_km = np.round(haversine_km(coords[:, 0], coords[:, 1], coords[:, 2], coords[:, 3]) * FALLBACK_DETOUR_FACTOR, 2)
+        duration_min = np.round(distance_km / FALLBACK_SPEED_KMH * 60, 1)
+        offers = self._match_offers(coords[:, 0], coords[:, 1]) if auto_offer else {}
+
+        rows = []
+        for i, data in enumerate(orders_data):
+            row = {
+                "order_id": str(uuid.uuid4()),
+                "pickup": WKTElement(f'POINT({data.pickup_longitude} {data.pickup_latitude})', srid=4326),
+                "dropoff": WKTElement(f'POINT({data.dropoff_longitude} {data.dropoff_latitude})', srid=4326),
+                **data.model_dump(),
+                "status": OrderStatus.pending.value,
+                "driver_id": None,
+                "distance_km": float(distance_km[i]),
+                "duration_min": float(duration_min[i]),
+                "delivery_fee": delivery_fee(float(distance_km[i])),
+                "pickup_zone": pickup_zones[i],
+                "dropoff_zone": dropoff_zones[i],
+                "pickup_time": None,
+                "dropoff_time": None,
+                "created_at": now
+            }
+            if i in offers:
+                row["status"] = OrderStatus.offered.value
+                row["driver_id"] = offers[i]
+                row["pickup_time"] = now + timedelta(minutes=15)
+                row["dropoff_time"] = row["pickup_time"] + timedelta(minutes=row["duration_min"] or 25)
+            rows.append(row)
+
+        copy_orders(self.db, rows)
+        # COPY bypasses the flush listener, so the offer counters are bumped here in the same transaction
+        offered_per_driver: Dict[str, int] = {}
+        for driver_id in offers.values():
+            offered_per_driver[driver_id] = offered_per_driver.get(driver_id, 0) + 1
+        apply_order_count_deltas(self.db.connection(), {
+            driver_id: {"active_orders": 0, "offered_orders": n} for driver_id, n in offered_per_driver.items()
+        })
+        self.db.commit()
+
+        record_zone_pressure_changes([
+            ("order", None, (row["pickup_zone"], row["status"]), now, True) for row in rows
+        ])
+        kafka_producer.publish_batch("order-created", [
+            {
+                "order_id": row["order_id"],
+                "driver_id": row["driver_id"],
+                "pickup_zone": row["pickup_zone"],
+                "dropoff_zone": row["dropoff_zone"],
+                "pickup_latitude": row["pickup_latitude"],
+                "pickup_longitude": row["pickup_longitude"],
+                "dropoff_latitude": row["dropoff_latitude"],
+                "dropoff_longitude": row["dropoff_longitude"],
+                "status": row["status"],
+                "created_at": str(now)
+            }
+            for row in rows
+        ])
+        if offers:
+            emit_sync(socket_manager.notify_order_offers([
+                (rows[i]["driver_id"], OrderResponse.model_validate(rows[i]).model_dump(mode="json"))
+                for i in offers
+            ]))
+
+        logger.info(f"Bulk ingested {len(rows)} orders, {len(offers)} offered")
+        return {
+            "created": len(rows),
+            "offered": len(offers),
+            "order_ids": [row["order_id"] for row in rows]
+        }
+
+    def _match_offers(self, lat: np.ndarray, lng: np.ndarray, radius_km: float = 10.0) -> Dict[int, str]:
+        """Order index -> driver_id for one nearest-first pass honouring each driver's spare capacity"""
+        lat_pad = radius_km / 111.0
+        lng_pad = lat_pad / max(np.cos(np.radians(np.abs(lat).max())), 0.1)
+        envelope = func.ST_MakeEnvelope(
+            float(lng.min() - lng_pad), float(lat.min() - lat_pad),
+            float(lng.max() + lng_pad), float(lat.max() + lat_pad), 4326
+        )
+        drivers = self.db.query(
+            Driver.driver_id,
+            ST_Y(Driver.location).label('latitude'),
+            ST_X(Driver.location).label('longitude'),
+            Driver.active_orders,
+            Driver.offered_orders
+        ).filter(
+            Driver.status.in_([DriverStatus.AVAILABLE.value, DriverStatus.BUSY.value]),
+            Driver.location.isnot(None),
+            Driver.active_orders + Driver.offered_orders < self.MAX_CONCURRENT_ORDERS,
+            func.ST_Intersects(Driver.location, envelope)
+        ).all()
+        if not drivers:
+            return {}
+
+        driver_lat = np.array([d.latitude for d in drivers], dtype=np.float64)
+        driver_lng = np.array([d.longitude for d in drivers], dtype=np.float64)
+        spare = np.array([self.MAX_CONCURRENT_ORDERS - d.active_orders - d.offered_orders for d in drivers])
+
+        # Candidate pairs are each order's nearest drivers within the radius, cheapest first
+        candidates = nearest_zone_candidates(lat, lng, driver_lat, driver_lng, k=self.OFFER_CANDIDATES_K).tocoo()
+        within = candidates.data <= radius_km / DEFAULT_SPEED_KMH * 60.0
+        order_idx, driver_idx, minutes = candidates.row[within], candidates.col[within], candidates.data[within]
+
+        offers: Dict[int, str] = {}
+        for k in np.argsort(minutes, kind="stable"):
+            i, j = int(order_idx[k]), int(driver_idx[k])
+            if i in offers or spare[j] <= 0:
+                continue
+            offers[i] = drivers[j].driver_id
+            spare[j] -= 1
+        return offers
+
     def get_order(self, order_id: str) -> Optional[Order]:
         return self.db.query(Order).filter(Order.order_id == order_id).first()
     
@@ -111,16 +290,11 @@ class OrderService:
         if driver.status not in [DriverStatus.AVAILABLE.value, DriverStatus.BUSY.value]:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Driver is not available for assignment")
         
-        MAX_CONCURRENT_ORDERS = 3
-        active_orders_count = self.db.query(Order).filter(
-            Order.driver_id == assign_data.driver_id,
-            Order.status.in_([OrderStatus.assigned.value, OrderStatus.picked_up.value])
-        ).count()
-        
-        if active_orders_count >= MAX_CONCURRENT_ORDERS:
+        active_orders_count = driver.active_orders or 0
+        if active_orders_count >= self.MAX_CONCURRENT_ORDERS:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST, 
-                detail=f"Driver already has {active_orders_count} active orders. Maximum is {MAX_CONCURRENT_ORDERS}."
+                detail=f"Driver already has {active_orders_count} active orders. Maximum is {self.MAX_CONCURRENT_ORDERS}."
             )
         
         order = self.offer_to_driver(order_id, assign_data.driver_id)
@@ -226,11 +400,7 @@ class OrderService:
         if not driver:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Driver not found")
         
-        active_orders_count = self.db.query(Order).filter(
-            Order.driver_id == driver_id,
-            Order.status.in_([OrderStatus.assigned.value, OrderStatus.picked_up.value])
-        ).count()
-        
+        active_orders_count = driver.active_orders or 0
         if active_orders_count >= self.MAX_CONCURRENT_ORDERS:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST, 
@@ -300,33 +470,9 @@ class OrderService:
         return order
     
     def _get_drivers_with_capacity(self, latitude: float, longitude: float, radius_km: float = 10.0, limit: int = 5, exclude_driver_ids: list = None):
-        driver_service = DriverService(self.db)
-        
-        available = driver_service.get_nearby_drivers(
-            latitude=latitude, longitude=longitude,
-            radius_km=radius_km, status=DriverStatus.AVAILABLE, limit=limit)
-        busy = driver_service.get_nearby_drivers(
-            latitude=latitude, longitude=longitude,
-            radius_km=radius_km, status=DriverStatus.BUSY, limit=limit)
-        
-        all_nearby = available + busy
-        all_nearby.sort(key=lambda d: d.distance_meters)
-        
-        if exclude_driver_ids:
-            all_nearby = [d for d in all_nearby if d.driver_id not in exclude_driver_ids]
-        
-        drivers_with_capacity = []
-        for d in all_nearby:
-            active_count = self.db.query(Order).filter(
-                Order.driver_id == d.driver_id,
-                Order.status.in_([OrderStatus.assigned.value, OrderStatus.picked_up.value, OrderStatus.offered.value])
-            ).count()
-            if active_count < self.MAX_CONCURRENT_ORDERS:
-                drivers_with_capacity.append(d)
-            if len(drivers_with_capacity) >= limit:
-                break
-        
-        return drivers_with_capacity
+        return DriverService(self.db).get_nearby_drivers_with_capacity(
+            latitude=latitude, longitude=longitude, radius_km=radius_km,
+            max_orders=self.MAX_CONCURRENT_ORDERS, limit=limit, exclude_driver_ids=exclude_driver_ids)
     
     def picked_up(self, order_id: str, pickup_data: OrderPickup) -> Order:
         order = self.get_order(order_id)
@@ -548,55 +694,16 @@ class OrderService:
 
     def calculate_order_info(self, order: Order):
         try:
-            headers = {
-                "Content-Type": "application/json",
-                "X-Goog-Api-Key": settings.GOOGLE_MAPS_API_KEY,
-                "X-Goog-FieldMask": "routes.duration,routes.distanceMeters,routes.polyline.encodedPolyline"
-            }
-
-            payload = {
-                "origin": {
-                    "location": {
-                        "latLng": {
-                            "latitude": order.pickup_latitude,
-                            "longitude": order.pickup_longitude
-                        }
-                    }
-                },
-                "destination": {
-                    "location": {
-                        "latLng": {
-                            "latitude": order.dropoff_latitude,
-                            "longitude": order.dropoff_longitude
-                        }
-                    }
-                },
-                "travelMode": "DRIVE",
-                "routingPreference": "TRAFFIC_AWARE"
-            }
-
-            response = req.post(
-                "https://routes.googleapis.com/directions/v2:computeRoutes",
-                headers=headers,
-                json=payload
+            payload = order_route_payload(
+                order.pickup_latitude, order.pickup_longitude,
+                order.dropoff_latitude, order.dropoff_longitude
             )
-
-            if response.status_code == 200:
-                data = response.json()
-                if "routes" in data and data["routes"]:
-                    route = data["routes"][0]
-                    distance_km = route.get("distanceMeters", 0) / 1000.0
-                    duration_str = route.get("duration", "0s").replace("s", "")
-                    duration_min = float(duration_str) / 60.0
-
-                    order.distance_km = round(distance_km, 2)
-                    order.duration_min = round(duration_min, 1)
-                    order.route_polyline = route.get("polyline", {}).get("encodedPolyline", "")
-                    logger.info(f"Routes API Response: {order.distance_km} km, {order.duration_min} min")
-                else:
-                    raise Exception(f"No routes in response: {data}")
-            else:
-                raise Exception(f"Routes API error: {response.status_code} - {response.text}")
+            route = routes_client.compute_route(payload, ORDER_ROUTE_FIELD_MASK)
+            info = route_info(route)
+            order.distance_km = info["distance_km"]
+            order.duration_min = info["duration_min"]
+            order.route_polyline = info["route_polyline"]
+            logger.info(f"Routes API Response: {order.distance_km} km, {order.duration_min} min")
 
         except Exception as e:
             logger.warning(f"Routes API Error: {e}. Using fallback distance calculation")
@@ -611,40 +718,37 @@ class OrderService:
 
             if distance_meters:
                 distance_km = distance_meters / 1000.0
-                order.distance_km = round(distance_km * 1.3, 2)
+                order.distance_km = round(distance_km * FALLBACK_DETOUR_FACTOR, 2)
             else:
                 order.distance_km = 5.0
 
-            avg_speed_kmh = 45.0
-            order.duration_min = round((order.distance_km / avg_speed_kmh) * 60, 1)
+            order.duration_min = round((order.distance_km / FALLBACK_SPEED_KMH) * 60, 1)
 
-        base_fee = 7.0
-        per_km_rate = 1.2
-        order.delivery_fee = round(base_fee + (order.distance_km * per_km_rate), 2)
+        order.delivery_fee = delivery_fee(order.distance_km)
 
     def assign_zones(self, order: Order):
-        def find_zone(longitude: float, latitude: float) -> Optional[str]:
-            point = WKTElement(f'POINT({longitude} {latitude})', srid=4326)
+        index = zone_index_cache.get(self.db)
+        order.pickup_zone = index.lookup_one(order.pickup_latitude, order.pickup_longitude)
+        order.dropoff_zone = index.lookup_one(order.dropoff_latitude, order.dropoff_longitude)
 
-            zone = self.db.query(Zone).filter(
-                Zone.boundary.isnot(None),
-                func.ST_Contains(Zone.boundary, point)
-            ).first()
+    def assign_zones_bulk(self, orders: List[Order], index: Optional[ZoneIndex] = None):
+        """assign_zones for many orders with one vectorized index lookup per endpoint.
 
-            if zone:
-                return zone.zone_id
-
-            nearest = self.db.query(
-                Zone.zone_id,
-                func.ST_Distance(Zone.centroid, point).label('dist')
-            ).filter(
-                Zone.centroid.isnot(None)
-            ).order_by('dist').first()
-
-            return nearest.zone_id if nearest else None
-
-        order.pickup_zone = find_zone(order.pickup_longitude, order.pickup_latitude)
-        order.dropoff_zone = find_zone(order.dropoff_longitude, order.dropoff_latitude)
+        Pass index when the zones are not committed yet; the shared cache only
+        sees committed ones.
+        """
+        if not orders:
+            return
+        if index is None:
+            index = zone_index_cache.get(self.db)
+        coords = np.array([
+            [o.pickup_latitude, o.pickup_longitude, o.dropoff_latitude, o.dropoff_longitude] for o in orders
+        ], dtype=np.float64)
+        pickup_zones = index.lookup(coords[:, 0], coords[:, 1])
+        dropoff_zones = index.lookup(coords[:, 2], coords[:, 3])
+        for order, pickup_zone, dropoff_zone in zip(orders, pickup_zones, dropoff_zones):
+            order.pickup_zone = pickup_zone
+            order.dropoff_zone = dropoff_zone
 
     def dispatch_orders(self, driver_id : str, zone_id : str) -> Dict[str, Any]:
         driver = self.db.query(Driver).filter(Driver.driver_id == driver_id).first()
@@ -653,8 +757,7 @@ class OrderService:
         if driver.status not in [DriverStatus.AVAILABLE.value, DriverStatus.BUSY.value]:
             return {"status": "skipped","message" :"Driver is not available"}
         
-        active_orders = self.get_active_orders_for_driver(driver_id)
-        available_slots = 3 - len(active_orders)
+        available_slots = self.MAX_CONCURRENT_ORDERS - (driver.active_orders or 0)
         if available_slots <= 0:
             return {"status": "skipped","message" :"Driver is full" }
         
@@ -699,6 +802,32 @@ class OrderService:
 
         return result
 
+    def dispatch_zone_batch(self, zone_ids: List[str]) -> Dict[str, Any]:
+        """Dispatch every pending order picked up in zone_ids to the drivers in those zones with one solve"""
+        pending_orders = self.db.query(Order).filter(
+            Order.status == OrderStatus.pending.value,
+            Order.pickup_zone.in_(zone_ids)
+        ).order_by(Order.created_at).all()
+        if not pending_orders:
+            return {"status": "skipped", "message": "No pending orders in these zones"}
+
+        drivers = self.db.query(Driver).filter(
+            Driver.current_zone.in_(zone_ids),
+            Driver.status.in_([DriverStatus.AVAILABLE.value, DriverStatus.BUSY.value]),
+            Driver.location.isnot(None)
+        ).all()
+        if not drivers:
+            return {"status": "skipped", "message": "No drivers in these zones"}
+
+        # Outstanding offers hold a slot until they are accepted or expire
+        capacities = {
+            d.driver_id: self.MAX_CONCURRENT_ORDERS - (d.active_orders or 0) - (d.offered_orders or 0)
+            for d in drivers
+        }
+
+        routing_engine = RoutingEngine(self.db)
+        return routing_engine.dispatch_batch(drivers, pending_orders, capacities)
+
     def handle_driver_emergency(self, driver_id: str, lat: float, lng: float):
         driver = self.db.query(Driver).filter(Driver.driver_id == driver_id).first()
         if not driver:
@@ -742,4 +871,74 @@ class OrderService:
                     "EMERGENCY_DISPATCH"
                 ))
             else:
-                logger.error(f"No available drivers found for Order {order.order_id}")
\ No newline at end of file
+                logger.error(f"No available drivers found for Order {order.order_id}")
+
+# Columns create_orders_bulk fills; everything else on orders is nullable without a default
+ORDER_COPY_COLUMNS = [
+    "order_id", "pickup", "dropoff", *OrderCreate.model_fields, "status", "driver_id", "distance_km",
+    "duration_min", "delivery_fee", "pickup_zone", "dropoff_zone", "pickup_time", "dropoff_time", "created_at"
+]
+COPY_NULL = "\\N"
+
+def _copy_value(value) -> Any:
+    if value is None:
+        return COPY_NULL
+    if isinstance(value, WKTElement):
+        return f"SRID={value.srid};{value.data}"
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+def copy_orders(db: Session, rows: List[Dict[str, Any]]):
+    """COPY rows into orders on the session's own connection, so they commit with it.
+
+    Like a Core insert this skips the ORM flush listeners; callers apply
+    counter and zone pressure changes themselves.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([_copy_value(row[column]) for column in ORDER_COPY_COLUMNS])
+    buffer.seek(0)
+
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {Order.__tablename__} ({', '.join(ORDER_COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')",
+            buffer
+        )
+    finally:
+        cursor.close()
+
+def enrich_order_routes(order_ids: List[str], chunk_size: int = 200) -> int:
+    """Background stage of bulk ingestion: replace fallback distances with road routes"""
+    db = SessionLocal()
+    enriched = 0
+    try:
+        for start in range(0, len(order_ids), chunk_size):
+            rows = db.query(
+                Order.order_id, Order.pickup_latitude, Order.pickup_longitude,
+                Order.dropoff_latitude, Order.dropoff_longitude
+            ).filter(Order.order_id.in_(order_ids[start:start + chunk_size])).all()
+            responses = routes_client.compute_routes([
+                (order_route_payload(r.pickup_latitude, r.pickup_longitude, r.dropoff_latitude, r.dropoff_longitude), ORDER_ROUTE_FIELD_MASK)
+                for r in rows
+            ])
+
+            updates = []
+            for row, response in zip(rows, responses):
+                if isinstance(response, Exception):
+                    continue
+                info = route_info(response)
+                updates.append({"order_id": row.order_id, **info, "delivery_fee": delivery_fee(info["distance_km"])})
+            if updates:
+                db.execute(update(Order), updates)
+                db.commit()
+                enriched += len(updates)
+        logger.info(f"Enriched routes for {enriched}/{len(order_ids)} bulk-ingested orders")
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Route enrichment failed after {enriched} orders: {e}")
+    finally:
+        db.close()
+    return enriched
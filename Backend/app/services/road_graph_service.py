@@ -0,0 +1,111 @@
+import os
+import logging
+import threading
+import numpy as np
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.core.routes_client import RoutesProviderError
+from app.optimization.polyline import encode_polyline
+from app.optimization.road_graph import RoadGraph
+
+logger = logging.getLogger(__name__)
+
+LatLng = Tuple[float, float]
+
+ROAD_GRAPH_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'ml', 'road_graph.json')
+
+class LocalRoutesProvider:
+    """Answers Routes API shaped requests from an offline RoadGraph.
+
+    Mirrors RoutesClient.compute_route / compute_route_matrix (same payloads, same
+    response shape) and the matrix-provider fetch() used by TravelTimeCache, so it
+    can stand in wherever Google is unavailable. Points are snapped to their
+    nearest graph node; the off-graph leg is costed at ACCESS_SPEED_KMH.
+    """
+    MAX_ORIGINS = 25
+    MAX_DESTINATIONS = 25
+    MAX_ELEMENTS = 625
+    ACCESS_SPEED_KMH = 15.0
+
+    def __init__(self, graph: RoadGraph):
+        self.graph = graph
+
+    def _snap(self, points: Sequence[LatLng]) -> Tuple[np.ndarray, np.ndarray]:
+        lat = np.array([p[0] for p in points], dtype=np.float64)
+        lon = np.array([p[1] for p in points], dtype=np.float64)
+        nodes, snap_m = self.graph.nearest_nodes(lat, lon)
+        return nodes, snap_m
+
+    def fetch(self, origins: Sequence[LatLng], destinations: Sequence[LatLng]) -> np.ndarray:
+        origin_nodes, origin_snap = self._snap(origins)
+        dest_nodes, dest_snap = self._snap(destinations)
+        access = (origin_snap[:, None] + dest_snap[None, :]) / (self.ACCESS_SPEED_KMH / 3.6)
+        seconds = self.graph.matrix(origin_nodes, dest_nodes) + access
+        return np.where(np.isfinite(seconds), seconds, np.nan)
+
+    def compute_route_matrix(self, payload: Dict[str, Any], field_mask: str = "") -> List[Dict[str, Any]]:
+        origins = [_lat_lng(o["waypoint"]) for o in payload.get("origins", [])]
+        destinations = [_lat_lng(d["waypoint"]) for d in payload.get("destinations", [])]
+        seconds = self.fetch(origins, destinations)
+        elements = []
+        for (o_idx, d_idx), value in np.ndenumerate(seconds):
+            element = {"originIndex": o_idx, "destinationIndex": d_idx}
+            if np.isnan(value):
+                element["condition"] = "ROUTE_NOT_FOUND"
+            else:
+                element.update(condition="ROUTE_EXISTS", duration=f"{int(round(value))}s")
+            elements.append(element)
+        return elements
+
+    def compute_route(self, payload: Dict[str, Any], field_mask: str = "") -> Dict[str, Any]:
+        waypoints = [_lat_lng(payload["origin"])]
+        waypoints += [_lat_lng(w) for w in payload.get("intermediates", [])]
+        waypoints.append(_lat_lng(payload["destination"]))
+        nodes, snap_m = self._snap(waypoints)
+
+        total_s, total_m = 0.0, 0.0
+        path = [int(nodes[0])]
+        for a, b in zip(nodes[:-1], nodes[1:]):
+            seconds, meters, leg = self.graph.shortest_path(a, b)
+            if not np.isfinite(seconds):
+                raise RoutesProviderError("No route between waypoints in the offline road graph")
+            total_s += seconds
+            total_m += meters
+            path += leg[1:]
+
+        # Each intermediate is left and re-entered through its snap leg
+        access_m = snap_m[0] + snap_m[-1] + 2 * snap_m[1:-1].sum()
+        total_m += access_m
+        total_s += access_m / (self.ACCESS_SPEED_KMH / 3.6)
+
+        lat = np.concatenate(([waypoints[0][0]], self.graph.lat[path], [waypoints[-1][0]]))
+        lon = np.concatenate(([waypoints[0][1]], self.graph.lon[path], [waypoints[-1][1]]))
+        return {
+            "duration": f"{int(round(total_s))}s",
+            "distanceMeters": int(round(total_m)),
+            "polyline": {"encodedPolyline": encode_polyline(lat, lon)}
+        }
+
+def _lat_lng(waypoint: Dict[str, Any]) -> LatLng:
+    lat_lng = waypoint["location"]["latLng"]
+    return float(lat_lng["latitude"]), float(lat_lng["longitude"])
+
+_local_router: Optional[LocalRoutesProvider] = None
+_local_router_loaded = False
+_load_lock = threading.Lock()
+
+def get_local_router(path: str = ROAD_GRAPH_PATH) -> Optional[LocalRoutesProvider]:
+    """Offline router over the bundled road extract; None when no extract is deployed"""
+    global _local_router, _local_router_loaded
+    if not _local_router_loaded:
+        with _load_lock:
+            if not _local_router_loaded:
+                if os.path.exists(path):
+                    try:
+                        graph = RoadGraph.load(path)
+                        _local_router = LocalRoutesProvider(graph)
+                        logger.info(f"Loaded offline road graph: {graph.n_nodes} nodes, {graph.n_edges} edges")
+                    except Exception as e:
+                        logger.warning(f"Failed to load offline road graph {path}: {e}")
+                _local_router_loaded = True
+    return _local_router
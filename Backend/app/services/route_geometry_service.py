@@ -0,0 +1,97 @@
+import logging
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, Optional
+from sqlalchemy.orm import Session
+from geoalchemy2.elements import WKTElement
+
+from app.models.assignment import Assignment
+from app.optimization.polyline import encode_polyline, decode_polyline, simplify_polyline
+
+logger = logging.getLogger(__name__)
+
+FULL_DETAIL = "full"
+# Douglas-Peucker tolerance in meters per detail level, finest first
+DETAIL_TOLERANCES_M = {
+    "high": 3.0,
+    "medium": 15.0,
+    "low": 60.0,
+}
+# Level shipped with driver_assigned / route.assigned payloads
+ASSIGNMENT_DETAIL = "high"
+
+def detail_for_zoom(zoom: Optional[float]) -> str:
+    """Coarsest level that still looks exact at a web-map zoom level"""
+    if zoom is None or zoom >= 17:
+        return FULL_DETAIL
+    if zoom >= 15:
+        return "high"
+    if zoom >= 12:
+        return "medium"
+    return "low"
+
+class RouteGeometry:
+    """A route decoded once, with every simplification level encoded up front"""
+
+    def __init__(self, lat: np.ndarray, lon: np.ndarray, encoded: Optional[str] = None):
+        self.lat = lat
+        self.lon = lon
+        self.levels: Dict[str, str] = {FULL_DETAIL: encoded if encoded is not None else encode_polyline(lat, lon)}
+        self.point_counts: Dict[str, int] = {FULL_DETAIL: int(lat.size)}
+        for level, tolerance_m in DETAIL_TOLERANCES_M.items():
+            keep = simplify_polyline(lat, lon, tolerance_m)
+            self.levels[level] = encode_polyline(lat[keep], lon[keep])
+            self.point_counts[level] = int(keep.size)
+
+    @classmethod
+    def from_encoded(cls, encoded: Optional[str]) -> Optional["RouteGeometry"]:
+        if not encoded:
+            return None
+        lat, lon = decode_polyline(encoded)
+        if lat.size < 2:
+            return None
+        return cls(lat, lon, encoded)
+
+    def encoded(self, level: str = FULL_DETAIL) -> str:
+        if level not in self.levels:
+            raise ValueError(f"Unknown route detail level: {level}")
+        return self.levels[level]
+
+    def linestring(self) -> WKTElement:
+        coords = ", ".join(f"{lon} {lat}" for lat, lon in zip(self.lat.tolist(), self.lon.tolist()))
+        return WKTElement(f"LINESTRING({coords})", srid=4326)
+
+class RouteGeometryStore:
+    """In-process LRU of RouteGeometry per assignment; misses are decoded from Assignment.route_polyline"""
+
+    def __init__(self, max_entries: int = 5000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, RouteGeometry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, assignment_id: str, geometry: RouteGeometry):
+        with self._lock:
+            self._entries[assignment_id] = geometry
+            self._entries.move_to_end(assignment_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, db: Session, assignment_id: str) -> Optional[RouteGeometry]:
+        with self._lock:
+            geometry = self._entries.get(assignment_id)
+            if geometry is not None:
+                self._entries.move_to_end(assignment_id)
+                return geometry
+
+        row = db.query(Assignment.route_polyline).filter(Assignment.assignment_id == assignment_id).first()
+        geometry = RouteGeometry.from_encoded(row.route_polyline) if row else None
+        if geometry is not None:
+            self.put(assignment_id, geometry)
+        return geometry
+
+    def forget(self, assignment_id: str):
+        with self._lock:
+            self._entries.pop(assignment_id, None)
+
+route_geometry_store = RouteGeometryStore()
@@ -1,34 +1,43 @@
-import itertools
 import os
-import math
 import json
 import logging
-import requests
+import numpy as np
 from typing import List, Dict, Any, Tuple
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
-from sqlalchemy import func
 from geoalchemy2.shape import to_shape
 
 from app.models.driver import Driver
 from app.models.order import Order
 from app.models.assignment import Assignment
-from app.models.zone import Zone
 from app.schemas.order import OrderStatus
 from app.schemas.driver import DriverStatus
 from app.services.forecasting_service import ForecastingService
-from app.models.zone import DemandForecast
-from app.core.config import settings
 from app.core.kafka import kafka_producer
 from app.core.socket_manager import socket_manager, emit_sync
+from app.core.routes_client import routes_client
+from app.optimization.cost_matrix import haversine_km, haversine_matrix_km, travel_time_matrix
+from app.optimization.pdp_solver import solve_pdp, solve_multi_vehicle_pdp, NO_PREDECESSOR
+from app.services.travel_time_service import travel_time_cache
+from app.services.road_graph_service import get_local_router
+from app.services.eta_service import track_dispatched_route
+from app.services.hot_zone_service import hot_zone_cache
+from app.services.route_geometry_service import RouteGeometry, route_geometry_store, ASSIGNMENT_DETAIL
 
 logger = logging.getLogger(__name__)
 
+# Batch dispatch leaves an order unassigned rather than add more than this to any route
+BATCH_MAX_INSERTION_MINUTES = 45.0
+
+ROUTE_FIELD_MASK = "routes.duration,routes.distanceMeters,routes.polyline.encodedPolyline,routes.optimizedIntermediateWaypointIndex"
+
 class RoutingEngine:
     def __init__(self, db: Session):
         self.db = db
-        self.api_key = settings.GOOGLE_MAPS_API_KEY
-        self.routes_api_url = "https://routes.googleapis.com/directions/v2:computeRoutes"
+        self.routes_client = routes_client
+        self.local_router = get_local_router()
+        self.travel_time_cache = travel_time_cache
+        self.hot_zones = hot_zone_cache
 
 
     def dispatch(self, driver_id: str, order_ids: List[str], is_emergency: bool = False) -> Dict[str, Any]:
@@ -80,8 +89,10 @@ class RoutingEngine:
             logger.warning(f"Routes API failed: {e}. Using nearest neighbor fallback")
             route = self._compute_nearest_neighbor_route(origin_coords, ordered_nodes)
 
+        geometry = RouteGeometry.from_encoded(route.get("polyline"))
         new_assignment = Assignment(
             driver_id=driver_id,
+            route=geometry.linestring() if geometry else None,
             route_polyline=route.get("polyline", ""),
             total_distance_km=route.get("distance_km", 0.0),
             estimated_time_min=route.get("duration_mins", 0.0),
@@ -102,6 +113,9 @@ class RoutingEngine:
         
         driver.status = DriverStatus.BUSY.value
         self.db.commit()
+        track_dispatched_route(driver_id, new_assignment.assignment_id, route, origin_coords, ordered_nodes)
+        if geometry:
+            route_geometry_store.put(new_assignment.assignment_id, geometry)
 
         payload = {
             "assignment_id": new_assignment.assignment_id,
@@ -109,7 +123,7 @@ class RoutingEngine:
             "order_count": len(orders),
             "distance_km" : route.get("distance_km", 0.0),
             "sequence" : route.get("sequence", []),
-            "polyline" : route.get("polyline", ""),
+            "polyline" : geometry.encoded(ASSIGNMENT_DETAIL) if geometry else "",
             "timestamp" : datetime.utcnow().isoformat()
         }
 
@@ -121,6 +135,128 @@ class RoutingEngine:
             "data" : payload
         }
     
+    def dispatch_batch(self, drivers: List[Driver], orders: List[Order], capacities: Dict[str, int]) -> Dict[str, Any]:
+        """Route pending orders across drivers with one multi-vehicle PDP solve.
+
+        capacities maps driver_id to how many more orders that driver may take. All
+        Assignment rows and order/driver updates are committed in one transaction.
+        """
+        fleet = [
+            (driver, to_shape(driver.location)) for driver in drivers
+            if driver.location is not None and capacities.get(driver.driver_id, 0) > 0
+        ]
+        orders = [o for o in orders if o.pickup_latitude is not None and o.dropoff_latitude is not None]
+        if not fleet or not orders:
+            return {"status": "skipped", "message": "No drivers with capacity or no routable orders"}
+
+        # Points: one origin per driver, then each order's pickup and dropoff
+        n_drivers = len(fleet)
+        lats = [shape.y for _, shape in fleet]
+        lngs = [shape.x for _, shape in fleet]
+        for order in orders:
+            lats += [order.pickup_latitude, order.dropoff_latitude]
+            lngs += [order.pickup_longitude, order.dropoff_longitude]
+        lats = np.array(lats, dtype=np.float64)
+        lngs = np.array(lngs, dtype=np.float64)
+
+        routes, unassigned = solve_multi_vehicle_pdp(
+            travel_time_matrix(lats, lngs, lats, lngs),
+            origins=range(n_drivers),
+            pairs=[(n_drivers + 2 * i, n_drivers + 2 * i + 1) for i in range(len(orders))],
+            capacities=[capacities[driver.driver_id] for driver, _ in fleet],
+            max_insertion_cost=BATCH_MAX_INSERTION_MINUTES
+        )
+
+        planned = []
+        for (driver, shape), route in zip(fleet, routes):
+            if not route:
+                continue
+            ordered_nodes = []
+            for point in route:
+                order = orders[(point - n_drivers) // 2]
+                is_pickup = (point - n_drivers) % 2 == 0
+                ordered_nodes.append({
+                    "id": order.order_id,
+                    "type": "pickup" if is_pickup else "dropoff",
+                    "lat": lats[point],
+                    "lng": lngs[point]
+                })
+            batch = [orders[(point - n_drivers) // 2] for point in route if (point - n_drivers) % 2 == 0]
+            planned.append((driver, (shape.y, shape.x), ordered_nodes, batch))
+
+        # Route calls for every driver go out together over the shared pool
+        legs = [(origin, ordered_nodes) for _, origin, ordered_nodes, _ in planned]
+        payloads = [self._route_request(origin, ordered_nodes) for origin, ordered_nodes in legs]
+        responses = self.routes_client.compute_routes([(payload, ROUTE_FIELD_MASK) for payload in payloads])
+        for i, ((driver, origin, ordered_nodes, batch), response) in enumerate(zip(planned, responses)):
+            if isinstance(response, Exception) and self.local_router is not None:
+                try:
+                    response = self.local_router.compute_route(payloads[i], ROUTE_FIELD_MASK)
+                except Exception as e:
+                    response = e
+            if isinstance(response, Exception):
+                logger.warning(f"Routes API failed for driver {driver.driver_id}: {response}. Using nearest neighbor fallback")
+                computed = self._compute_nearest_neighbor_route(origin, ordered_nodes)
+            else:
+                computed = self._parse_route(response, ordered_nodes)
+            planned[i] = (driver, batch, computed)
+
+        now = datetime.utcnow()
+        geometries = [RouteGeometry.from_encoded(computed.get("polyline")) for _, _, computed in planned]
+        assignments = [
+            Assignment(
+                driver_id=driver.driver_id,
+                route=geometry.linestring() if geometry else None,
+                route_polyline=computed.get("polyline", ""),
+                total_distance_km=computed.get("distance_km", 0.0),
+                estimated_time_min=computed.get("duration_mins", 0.0),
+                optimized_sequence=computed.get("sequence", []),
+                eta=now + timedelta(minutes=computed.get("duration_mins", 0)),
+                status="in_progress",
+                assigned_at=now
+            )
+            for (driver, _, computed), geometry in zip(planned, geometries)
+        ]
+        self.db.add_all(assignments)
+        self.db.flush()
+
+        for assignment, (driver, batch, _) in zip(assignments, planned):
+            for order in batch:
+                order.status = OrderStatus.assigned.value
+                order.driver_id = driver.driver_id
+                order.assignment_id = assignment.assignment_id
+            driver.status = DriverStatus.BUSY.value
+        self.db.commit()
+        for assignment, (driver, _, computed), (origin, ordered_nodes) in zip(assignments, planned, legs):
+            track_dispatched_route(driver.driver_id, assignment.assignment_id, computed, origin, ordered_nodes)
+        for assignment, geometry in zip(assignments, geometries):
+            if geometry:
+                route_geometry_store.put(assignment.assignment_id, geometry)
+
+        payloads = [
+            {
+                "assignment_id": assignment.assignment_id,
+                "driver_id": driver.driver_id,
+                "order_count": len(batch),
+                "distance_km": computed.get("distance_km", 0.0),
+                "sequence": computed.get("sequence", []),
+                "polyline": geometry.encoded(ASSIGNMENT_DETAIL) if geometry else "",
+                "timestamp": now.isoformat()
+            }
+            for assignment, (driver, batch, computed), geometry in zip(assignments, planned, geometries)
+        ]
+        kafka_producer.publish_batch("route.assigned", payloads)
+        emit_sync(socket_manager.notify_driver_assignments(payloads))
+
+        logger.info(f"Batch dispatch routed {len(orders) - len(unassigned)} orders across {len(payloads)} drivers")
+        return {
+            "status": "ok",
+            "data": {
+                "assignments": payloads,
+                "unassigned_order_ids": [orders[r].order_id for r in unassigned]
+            }
+        }
+
     def _get_pdp_sequence(self, origin : Tuple[float, float], nodes : List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         if not nodes:
             return []
@@ -128,93 +264,44 @@ class RoutingEngine:
         points = [{"lat": origin[0], "lng": origin[1]}] + nodes
         
         # Build distance matrix (default to haversine if API fails)
-        dist_matrix = {}
-        for i in range(len(points)):
-            dist_matrix[i] = {}
-            for j in range(len(points)):
-                dist_matrix[i][j] = self._calculate_haversine_distance(
-                    points[i]['lat'], points[i]['lng'], 
-                    points[j]['lat'], points[j]['lng']
-                )
-
-        try:
-            if getattr(self, 'api_key', None):
-                matrix_api_url = "https://routes.googleapis.com/distanceMatrix/v2:computeRouteMatrix"
-                headers = {
-                    "Content-Type": "application/json",
-                    "X-Goog-Api-Key": self.api_key,
-                    "X-Goog-FieldMask": "originIndex,destinationIndex,duration,distanceMeters"
-                }
-                waypoints = [{"waypoint": {"location": {"latLng": {"latitude": p['lat'], "longitude": p['lng']}}}} for p in points]
-                
-                payload = {
-                    "origins": waypoints,
-                    "destinations": waypoints,
-                    "travelMode": "DRIVE"
-                }
-                
-                response = requests.post(matrix_api_url, headers=headers, json=payload, timeout=5)
-                if response.status_code == 200:
-                    logger.info("Successfully fetched Google Distance Matrix API for permutations.")
-                    for element in response.json():
-                        o_idx = element.get('originIndex', 0)
-                        d_idx = element.get('destinationIndex', 0)
-                        
-                        # Optimize for Time Duration instead of physical Distance
-                        duration_str = element.get('duration', '0s')
-                        duration_sec = float(duration_str.replace('s', ''))
-                        
-                        dist_matrix[o_idx][d_idx] = duration_sec
-                    logger.info(f"Distance Matrix: {dist_matrix}")
-                else:
-                    logger.warning(f"Matrix API failed: {response.status_code} - {response.text}")
-        except Exception as e:
-            logger.warning(f"Error fetching Route Matrix: {e}")
-
-        best_route = None
-        min_distance = float('inf')
-
-        node_indices = {n['id'] + n['type']: idx + 1 for idx, n in enumerate(nodes)}
-
-        for perm in itertools.permutations(nodes):
-            valid = True
-            seen_pickups = set()
-
-            for node in perm:
-                if node["type"] == "pickup":
-                    seen_pickups.add(node["id"])
-                elif node["type"] == "dropoff":
-                    requires_pickup = any(n['id'] == node['id'] and n['type'] == "pickup" for n in nodes)
-                    if requires_pickup and node['id'] not in seen_pickups:
-                        valid = False
-                        break
-            if not valid:
-                continue
+        lats = np.array([p['lat'] for p in points], dtype=np.float64)
+        lngs = np.array([p['lng'] for p in points], dtype=np.float64)
+        dist_matrix = haversine_matrix_km(lats, lngs, lats, lngs)
+
+        # Optimize for travel time instead of physical distance when the matrix resolves fully
+        if self.travel_time_cache.provider is not None:
+            coords = list(zip(lats, lngs))
+            durations = self.travel_time_cache.get_matrix(coords, coords)
+            np.fill_diagonal(durations, 0.0)
+            if np.isfinite(durations).all():
+                dist_matrix = durations
+            else:
+                logger.warning("Route matrix incomplete, using Haversine distances for PDP sequence")
 
-            distance = 0.0
-            current_idx = 0  
-            for node in perm:
-                next_idx = node_indices[node['id'] + node['type']]
-                distance += dist_matrix[current_idx][next_idx]
-                current_idx = next_idx
+        # A dropoff must follow its pickup only when that pickup is still part of this route
+        pickup_index = {n['id']: idx + 1 for idx, n in enumerate(nodes) if n['type'] == "pickup"}
+        predecessor = [
+            pickup_index.get(n['id'], NO_PREDECESSOR) if n['type'] == "dropoff" else NO_PREDECESSOR
+            for n in nodes
+        ]
+        order, min_distance = solve_pdp(dist_matrix, predecessor)
+        best_route = [nodes[idx - 1] for idx in order]
 
-            if distance < min_distance:
-                min_distance = distance
-                best_route = list(perm)
-        
         logger.info(f"PDP Algorithm Selected Sequence: {[n['type'] + '_' + n['id'][:4] for n in best_route]} with total distance {min_distance}")
         return best_route
 
     def _compute_route(self, origin: Tuple[float, float], ordered_nodes: List[Dict[str, Any]], is_emergency: bool = False) -> Dict[str, Any]:
-        if not self.api_key:
-            raise Exception("Google Maps API key is not configured")
-        
-        headers = {
-            "Content-Type": "application/json",
-            "X-Goog-Api-Key": self.api_key,
-            "X-Goog-FieldMask": "routes.duration,routes.distanceMeters,routes.polyline.encodedPolyline,routes.optimizedIntermediateWaypointIndex"
-        }
+        payload = self._route_request(origin, ordered_nodes, is_emergency)
+        try:
+            route = self.routes_client.compute_route(payload, ROUTE_FIELD_MASK)
+        except Exception as e:
+            if self.local_router is None:
+                raise
+            logger.warning(f"Routes API failed: {e}. Using offline road graph")
+            route = self.local_router.compute_route(payload, ROUTE_FIELD_MASK)
+        return self._parse_route(route, ordered_nodes)
 
+    def _route_request(self, origin: Tuple[float, float], ordered_nodes: List[Dict[str, Any]], is_emergency: bool = False) -> Dict[str, Any]:
         intermediates = []
         for i, n in enumerate(ordered_nodes[:-1]):
             intermediates.append({
@@ -266,16 +353,10 @@ class RoutingEngine:
             "optimizeWaypointOrder": False
         }
 
-        response = requests.post(self.routes_api_url, headers=headers, json=payload)
+        return payload
 
-        if response.status_code != 200:
-            raise Exception(f"Routes API error: {response.status_code} - {response.text}")
-        
-        data = response.json()
-        if "routes" not in data or not data["routes"]:
-            raise Exception("No routes found in response")
-        
-        route = data["routes"][0]
+    @staticmethod
+    def _parse_route(route: Dict[str, Any], ordered_nodes: List[Dict[str, Any]]) -> Dict[str, Any]:
         duration_str = route.get("duration", "0s").replace("s", "")
         duration_mins = round(float(duration_str) / 60, 2)
 
@@ -315,61 +396,14 @@ class RoutingEngine:
         destination : Tuple[float, float]
     ) -> Dict[str, float]:
         try:
-            now = datetime.utcnow()
-            forecasts = self.db.query(
-                DemandForecast.zone_id,
-                func.max(DemandForecast.predicted_demand).label('max_demand')
-            ).filter(
-                DemandForecast.forecast_time >= now,
-                DemandForecast.forecast_time <= now + timedelta(hours=1)
-            ).group_by(DemandForecast.zone_id).order_by(
-                func.max(DemandForecast.predicted_demand).desc()
-            ).limit(5).all()
-
-            if not forecasts:
-                zones = self.db.query(Zone).filter(
-                    Zone.centroid.isnot(None),
-                    Zone.demand_score.isnot(None)
-                ).order_by(Zone.demand_score.desc()).limit(5).all()
-            else:
-                zone_ids = [f.zone_id for f in forecasts]
-                zones = self.db.query(Zone).filter(
-                    Zone.zone_id.in_(zone_ids),
-                    Zone.centroid.isnot(None)
-                ).all()
-                zone_map = {z.zone_id: z for z in zones}
-                zones = [zone_map[f.zone_id] for f in forecasts if f.zone_id in zone_map]
-
-            if not zones:
-                return None
-            
-            direct_dist = self._calculate_haversine_distance(origin[0], origin[1], destination[0], destination[1])
-
-            for zone in zones:
-                shape = to_shape(zone.centroid)
-                surge_lat, surge_lng = shape.y, shape.x
-
-                detour_dist1 = self._calculate_haversine_distance(origin[0], origin[1], surge_lat, surge_lng)
-                detour_dist2 = self._calculate_haversine_distance(surge_lat, surge_lng, destination[0], destination[1])
-                
-                if (detour_dist1 + detour_dist2) <= (direct_dist * 1.3):
-                    logger.info(f"Injecting Predictive Waypoint for Zone {zone.name} (Demand Score: {zone.demand_score})")
-                    return {
-                        "lat": surge_lat,
-                        "lng": surge_lng,
-                        "detour_km": round((detour_dist1 + detour_dist2) - direct_dist, 2)
-                    }
-            
-            return None
+            waypoint = self.hot_zones.get(self.db).best_detour(origin, destination)
         except Exception as e:
             logger.warning(f"Error getting predictive waypoint: {e}")
             return None
+        if waypoint:
+            logger.info(f"Injecting Predictive Waypoint for Zone {waypoint['name']} (Demand: {waypoint['demand']})")
+        return waypoint
     
     @staticmethod
     def _calculate_haversine_distance(lat1, lon1, lat2, lon2):
-        R = 6371
-        dlat = math.radians(lat2 - lat1)
-        dlon = math.radians(lon2 - lon1)
-        a = math.sin(dlat / 2) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon/2)**2
-        distance_km = 2 * R * math.atan2(math.sqrt(a), math.sqrt(1-a))
-        return distance_km
\ No newline at end of file
+        return float(haversine_km(lat1, lon1, lat2, lon2))
\ No newline at end of file
@@ -0,0 +1,335 @@
+import math
+import time
+import asyncio
+import logging
+import threading
+import numpy as np
+import redis as redis_lib
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Optional, Tuple, Dict, Sequence
+
+from app.core.config import settings
+from app.core.redis_client import redis_client
+from app.core.routes_client import RoutesClient, routes_client
+from app.services.road_graph_service import get_local_router
+from app.optimization.cost_matrix import haversine_matrix_km
+
+logger = logging.getLogger(__name__)
+
+LatLng = Tuple[float, float]
+
+class RouteMatrixProvider:
+    """Google Routes computeRouteMatrix; returns durations in seconds (NaN where no route)"""
+    MAX_ORIGINS = 25
+    MAX_DESTINATIONS = 25
+    MAX_ELEMENTS = 625
+
+    def __init__(self, client: RoutesClient = routes_client, fallback=None):
+        self.client = client
+        self.fallback = fallback
+
+    FIELD_MASK = "originIndex,destinationIndex,duration,condition"
+
+    def fetch(self, origins: Sequence[LatLng], destinations: Sequence[LatLng]) -> np.ndarray:
+        try:
+            elements = self.client.compute_route_matrix(self._payload(origins, destinations), self.FIELD_MASK)
+        except Exception:
+            if self.fallback is None:
+                raise
+            return self.fallback.fetch(origins, destinations)
+        return self._to_seconds(elements, origins, destinations)
+
+    async def afetch(self, origins: Sequence[LatLng], destinations: Sequence[LatLng]) -> np.ndarray:
+        try:
+            elements = await self.client.acompute_route_matrix(self._payload(origins, destinations), self.FIELD_MASK)
+        except Exception:
+            if self.fallback is None:
+                raise
+            # The local router is CPU-bound; keep it off the event loop
+            return await asyncio.to_thread(self.fallback.fetch, origins, destinations)
+        return self._to_seconds(elements, origins, destinations)
+
+    @staticmethod
+    def _payload(origins: Sequence[LatLng], destinations: Sequence[LatLng]) -> Dict:
+        def waypoint(p):
+            return {"waypoint": {"location": {"latLng": {"latitude": p[0], "longitude": p[1]}}}}
+
+        return {
+            "origins": [waypoint(p) for p in origins],
+            "destinations": [waypoint(p) for p in destinations],
+            "travelMode": "DRIVE"
+        }
+
+    @staticmethod
+    def _to_seconds(elements, origins: Sequence[LatLng], destinations: Sequence[LatLng]) -> np.ndarray:
+        seconds = np.full((len(origins), len(destinations)), np.nan)
+        for element in elements:
+            if element.get("condition", "ROUTE_EXISTS") != "ROUTE_EXISTS":
+                continue
+            o_idx = element.get("originIndex", 0)
+            d_idx = element.get("destinationIndex", 0)
+            seconds[o_idx, d_idx] = float(element.get("duration", "0s").replace("s", ""))
+        return seconds
+
+
+class FakeMatrixProvider:
+    """Offline provider: haversine distance times a detour factor at a fixed speed"""
+    MAX_ORIGINS = 25
+    MAX_DESTINATIONS = 25
+    MAX_ELEMENTS = 100
+
+    def __init__(self, speed_kmh: float = 30.0, detour_factor: float = 1.3):
+        self.speed_kmh = speed_kmh
+        self.detour_factor = detour_factor
+        self.calls = 0
+        self.elements = 0
+
+    def fetch(self, origins: Sequence[LatLng], destinations: Sequence[LatLng]) -> np.ndarray:
+        assert len(origins) <= self.MAX_ORIGINS and len(destinations) <= self.MAX_DESTINATIONS
+        assert len(origins) * len(destinations) <= self.MAX_ELEMENTS
+        self.calls += 1
+        self.elements += len(origins) * len(destinations)
+
+        o = np.asarray(origins, dtype=np.float64)
+        d = np.asarray(destinations, dtype=np.float64)
+        km = haversine_matrix_km(o[:, 0], o[:, 1], d[:, 0], d[:, 1]) * self.detour_factor
+        return km / self.speed_kmh * 3600.0
+
+
+class TravelTimeCache:
+    """Two-tier (in-process LRU, then Redis) cache of driving durations in seconds.
+
+    Keys are quantized origin/destination cells plus a time-of-day bucket, so
+    near-identical requests within the same window share one API element. Misses
+    are grouped into provider-sized blocks of origins that want (nearly) the same
+    destinations, so sparse pair lists are not billed as full cross products.
+    """
+    KEY_PREFIX = "tt"
+
+    def __init__(
+        self,
+        provider=None,
+        redis=redis_client,
+        cell_size_deg: float = 0.002, # ~200 m at Dubai's latitude
+        bucket_minutes: int = 15,
+        ttl_seconds: int = 900,
+        max_local_entries: int = 50000,
+        max_overfetch: float = 1.25 # requested / missing elements allowed when merging blocks
+    ):
+        self.provider = provider
+        self.redis = redis
+        self.cell_size_deg = cell_size_deg
+        self.bucket_minutes = bucket_minutes
+        self.ttl_seconds = ttl_seconds
+        self.max_local_entries = max_local_entries
+        self.max_overfetch = max_overfetch
+
+        self._local: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.api_requests = 0
+        self.api_errors = 0
+
+    def _cell(self, point: LatLng) -> str:
+        return f"{math.floor(point[0] / self.cell_size_deg)}:{math.floor(point[1] / self.cell_size_deg)}"
+
+    def _bucket(self, now: datetime) -> int:
+        return (now.hour * 60 + now.minute) // self.bucket_minutes
+
+    def _cell_key(self, bucket: int, origin_cell: str, destination_cell: str) -> str:
+        return f"{self.KEY_PREFIX}:{bucket}:{origin_cell}:{destination_cell}"
+
+    def key(self, origin: LatLng, destination: LatLng, now: Optional[datetime] = None) -> str:
+        bucket = self._bucket(now or datetime.utcnow())
+        return self._cell_key(bucket, self._cell(origin), self._cell(destination))
+
+    def _local_get(self, key: str) -> Optional[float]:
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+            return value
+
+    def _local_put(self, key: str, value: float):
+        with self._lock:
+            self._local[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_local_entries:
+                self._local.popitem(last=False)
+
+    def get_pairs(
+        self,
+        origins: Sequence[LatLng],
+        destinations: Sequence[LatLng],
+        now: Optional[datetime] = None
+    ) -> np.ndarray:
+        """Durations in seconds for origins[i] -> destinations[i]; NaN where unknown"""
+        now = now or datetime.utcnow()
+        result = np.full(len(origins), np.nan)
+        keys = [self.key(o, d, now) for o, d in zip(origins, destinations)]
+
+        pending: Dict[str, List[int]] = {}
+        for i, key in enumerate(keys):
+            if self._cell(origins[i]) == self._cell(destinations[i]):
+                result[i] = 0.0
+                continue
+            cached = self._local_get(key)
+            if cached is not None:
+                result[i] = cached
+                self.local_hits += 1
+            else:
+                pending.setdefault(key, []).append(i)
+
+        if pending and self.redis is not None:
+            pending_keys = list(pending.keys())
+            try:
+                values = self.redis.mget(pending_keys)
+                for key, value in zip(pending_keys, values):
+                    if value is None:
+                        continue
+                    seconds = float(value)
+                    result[pending[key]] = seconds
+                    self._local_put(key, seconds)
+                    self.redis_hits += 1
+                    del pending[key]
+            except redis_lib.exceptions.RedisError:
+                pass
+
+        self.misses += len(pending)
+        if pending and self.provider is not None:
+            fetched = self._fetch_missing(pending, origins, destinations, now)
+            for key, seconds in fetched.items():
+                if key in pending:
+                    result[pending[key]] = seconds
+        return result
+
+    def get_matrix(
+        self,
+        origins: Sequence[LatLng],
+        destinations: Sequence[LatLng],
+        now: Optional[datetime] = None
+    ) -> np.ndarray:
+        rows, cols = np.meshgrid(np.arange(len(origins)), np.arange(len(destinations)), indexing="ij")
+        flat = self.get_pairs(
+            [origins[i] for i in rows.ravel()],
+            [destinations[j] for j in cols.ravel()],
+            now
+        )
+        return flat.reshape(len(origins), len(destinations))
+
+    def _fetch_missing(
+        self,
+        pending: Dict[str, List[int]],
+        origins: Sequence[LatLng],
+        destinations: Sequence[LatLng],
+        now: datetime
+    ) -> Dict[str, float]:
+        """Fetch the pending keys; any extra elements a merged block brings back are cached too"""
+        bucket = self._bucket(now)
+        wanted: "OrderedDict[str, set]" = OrderedDict()
+        points: Dict[str, LatLng] = {}
+        for idx in pending.values():
+            i = idx[0]
+            origin_cell, dest_cell = self._cell(origins[i]), self._cell(destinations[i])
+            wanted.setdefault(origin_cell, set()).add(dest_cell)
+            points.setdefault(origin_cell, origins[i])
+            points.setdefault(dest_cell, destinations[i])
+
+        fetched: Dict[str, float] = {}
+        for origin_cells, dest_cells in self._plan_blocks(wanted):
+            self._fetch_block(origin_cells, dest_cells, points, bucket, fetched)
+
+        for key, seconds in fetched.items():
+            self._local_put(key, seconds)
+        if fetched and self.redis is not None:
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                for key, seconds in fetched.items():
+                    pipe.setex(key, self.ttl_seconds, round(seconds, 1))
+                pipe.execute()
+            except redis_lib.exceptions.RedisError:
+                pass
+        return fetched
+
+    def _plan_blocks(self, wanted: Dict[str, set]) -> List[Tuple[List[str], List[str]]]:
+        """(origin cells, destination cells) blocks covering every wanted pair.
+
+        Origins wanting the same destinations share a block outright. Other groups
+        are merged greedily only while the block stays within MAX_ORIGINS and asks
+        for at most max_overfetch times the elements actually missing.
+        """
+        by_dest_set: "OrderedDict[frozenset, List[str]]" = OrderedDict()
+        for origin_cell, dests in wanted.items():
+            by_dest_set.setdefault(frozenset(dests), []).append(origin_cell)
+
+        max_origins = self.provider.MAX_ORIGINS
+        blocks: List[Tuple[List[str], set, int]] = []  # origin cells, destination cells, missing elements
+        for dest_set, origin_cells in sorted(by_dest_set.items(), key=lambda item: -len(item[0])):
+            needed = len(dest_set) * len(origin_cells)
+            for b, (block_origins, block_dests, block_needed) in enumerate(blocks):
+                merged_dests = block_dests | dest_set
+                n_origins = len(block_origins) + len(origin_cells)
+                if n_origins <= max_origins and \
+                        n_origins * len(merged_dests) <= self.max_overfetch * (block_needed + needed):
+                    blocks[b] = (block_origins + origin_cells, merged_dests, block_needed + needed)
+                    break
+            else:
+                blocks.append((list(origin_cells), set(dest_set), needed))
+        return [(block_origins, sorted(block_dests)) for block_origins, block_dests, _ in blocks]
+
+    def _fetch_block(
+        self,
+        origin_cells: List[str],
+        dest_cells: List[str],
+        points: Dict[str, LatLng],
+        bucket: int,
+        fetched: Dict[str, float]
+    ):
+        max_origins = self.provider.MAX_ORIGINS
+        for o_start in range(0, len(origin_cells), max_origins):
+            group = origin_cells[o_start:o_start + max_origins]
+            dest_chunk = max(1, min(self.provider.MAX_DESTINATIONS, self.provider.MAX_ELEMENTS // len(group)))
+            for d_start in range(0, len(dest_cells), dest_chunk):
+                chunk = dest_cells[d_start:d_start + dest_chunk]
+                try:
+                    self.api_requests += 1
+                    seconds = self.provider.fetch([points[oc] for oc in group], [points[dc] for dc in chunk])
+                except Exception as e:
+                    self.api_errors += 1
+                    logger.warning(f"Travel time provider failed: {e}")
+                    continue
+
+                for oi, oc in enumerate(group):
+                    for di, dc in enumerate(chunk):
+                        if oc == dc or not np.isfinite(seconds[oi, di]):
+                            continue
+                        fetched[self._cell_key(bucket, oc, dc)] = float(seconds[oi, di])
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.local_hits + self.redis_hits + self.misses
+        return {
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "api_requests": self.api_requests,
+            "api_errors": self.api_errors,
+            "local_entries": len(self._local),
+            "hit_rate": round((self.local_hits + self.redis_hits) / lookups, 4) if lookups else 0.0
+        }
+
+    def clear_local(self):
+        with self._lock:
+            self._local.clear()
+
+
+travel_time_cache = TravelTimeCache(
+    provider=RouteMatrixProvider(fallback=get_local_router()) if settings.GOOGLE_MAPS_API_KEY else get_local_router()
+)
@@ -0,0 +1,102 @@
+import time
+import logging
+import threading
+import redis as redis_lib
+from typing import Optional
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from geoalchemy2.shape import to_shape
+
+from app.models.zone import Zone
+from app.core.redis_client import redis_client
+from app.optimization.zone_index import ZoneIndex
+
+logger = logging.getLogger(__name__)
+
+# Committed zone changes bump the shared version; the age limit only matters while Redis is down
+ZONE_INDEX_MAX_AGE_SECONDS = 600
+
+def build_zone_index(db: Session) -> ZoneIndex:
+    rows = db.query(Zone.zone_id, Zone.boundary, Zone.centroid).all()
+    return ZoneIndex(
+        [r.zone_id for r in rows],
+        [to_shape(r.boundary) if r.boundary is not None else None for r in rows],
+        [to_shape(r.centroid) if r.centroid is not None else None for r in rows]
+    )
+
+class ZoneIndexCache:
+    """Process-wide ZoneIndex, rebuilt from the zones table when its version moves or it gets too old.
+
+    The version lives in Redis and is bumped by publish() once zone changes are
+    committed, so every worker rebuilds on its next get() instead of waiting out
+    the age limit.
+    """
+    VERSION_KEY = "zones:version"
+
+    def __init__(self, redis=redis_client, max_age_seconds: float = ZONE_INDEX_MAX_AGE_SECONDS):
+        self.redis = redis
+        self.max_age_seconds = max_age_seconds
+        self._index: Optional[ZoneIndex] = None
+        self._version: Optional[str] = None
+        self._built_at = 0.0
+        self._lock = threading.Lock()
+
+    def _remote_version(self) -> Optional[str]:
+        try:
+            return self.redis.get(self.VERSION_KEY)
+        except redis_lib.exceptions.RedisError as e:
+            logger.warning(f"Zone index version unavailable: {e}")
+            return self._version
+
+    def get(self, db: Session) -> ZoneIndex:
+        version = self._remote_version()
+        index = self._index
+        if index is None or version != self._version or time.monotonic() - self._built_at > self.max_age_seconds:
+            index = self.refresh(db, version)
+        return index
+
+    def refresh(self, db: Session, version: Optional[str] = None) -> ZoneIndex:
+        # The version is read before building, so a publish() racing the build forces another one
+        version = self._remote_version() if version is None else version
+        with self._lock:
+            index = build_zone_index(db)
+            self._index = index
+            self._version = version
+            self._built_at = time.monotonic()
+        logger.debug(f"Zone index rebuilt with {len(index)} zones")
+        return index
+
+    def publish(self):
+        """Tell every worker, this one included, that committed zones changed"""
+        self.invalidate()
+        try:
+            self.redis.incr(self.VERSION_KEY)
+        except redis_lib.exceptions.RedisError as e:
+            logger.warning(f"Failed to publish zone index version: {e}")
+
+    def invalidate(self):
+        self._index = None
+
+zone_index_cache = ZoneIndexCache()
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_zone_changes(session, flush_context):
+    if any(isinstance(obj, Zone) for objs in (session.new, session.dirty, session.deleted) for obj in objs):
+        session.info["zones_changed"] = True
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk_zone_changes(orm_execute_state):
+    # query(Zone).delete() / update() never reach after_flush
+    if (orm_execute_state.is_delete or orm_execute_state.is_update) and orm_execute_state.bind_mapper is not None \
+            and orm_execute_state.bind_mapper.class_ is Zone:
+        orm_execute_state.session.info["zones_changed"] = True
+
+@event.listens_for(Session, "after_commit")
+def _publish_zone_changes(session):
+    if session.info.pop("zones_changed", False):
+        zone_index_cache.publish()
+
+@event.listens_for(Session, "after_rollback")
+def _discard_zone_changes(session):
+    session.info.pop("zones_changed", None)
@@ -0,0 +1,447 @@
+import time
+import logging
+import threading
+import numpy as np
+import redis as redis_lib
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, Optional, List, Set, Tuple, Iterable
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app.models.driver import Driver
+from app.models.order import Order
+from app.models.zone import Zone
+from app.core.redis_client import redis_client
+from app.schemas.driver import DriverStatus, DutyStatus
+from app.schemas.order import OrderStatus
+from app.services.zone_snapshot_service import ZoneSnapshot, ZoneSnapshotService
+from app.optimization.cost_matrix import decode_points
+from app.optimization.candidates import nearest_zone_candidates
+
+logger = logging.getLogger(__name__)
+
+SURGE = "surge"
+SURPLUS = "surplus"
+BALANCED = "balanced"
+
+# (zone_id, status) for an on-duty driver, None when the driver is not counted
+DriverState = Optional[Tuple[Optional[str], str]]
+
+class ZonePressureTracker:
+    """Per-zone supply/demand counters kept current from committed ORM changes.
+
+    Seeded from a ZoneSnapshot, then updated by the session hooks below. A zone is
+    marked dirty when it moves between surge / surplus / balanced, so reallocation
+    only needs to look at those zones and their neighbours. Commits made by other
+    processes are not seen; callers reseed periodically to bound that drift.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._live: Optional[ZoneSnapshot] = None
+        self._recent_events: Dict[Optional[str], List[datetime]] = {}
+        self._classes: Dict[str, str] = {}
+        self._dirty: Set[str] = set()
+        self.zone_ids: List[str] = []
+        self.zone_lat = np.empty(0)
+        self.zone_lon = np.empty(0)
+        self._neighbours: Dict[str, Set[str]] = {}
+
+        self.surge_ratio = 3.0
+        self.idle_threshold = 2
+        self.driver_capacity = 1.5
+        self.recent_window = timedelta(minutes=ZoneSnapshotService.RECENT_WINDOW_MINUTES)
+
+    @property
+    def seeded(self) -> bool:
+        return self._live is not None
+
+    def age_seconds(self) -> float:
+        return self._live.age_seconds if self._live else float("inf")
+
+    def seed(
+        self,
+        snapshot: ZoneSnapshot,
+        zones: List[Zone],
+        surge_ratio: float,
+        idle_threshold: int,
+        driver_capacity: float,
+        neighbour_k: int = 8,
+        neighbour_max_minutes: Optional[float] = None
+    ):
+        zone_lat, zone_lon = decode_points(z.centroid for z in zones)
+        zone_ids = [z.zone_id for z in zones]
+
+        neighbours = {}
+        if zones:
+            adjacency = nearest_zone_candidates(
+                zone_lat, zone_lon, zone_lat, zone_lon,
+                k=neighbour_k, max_minutes=neighbour_max_minutes
+            ).tocsr()
+            for i, zone_id in enumerate(zone_ids):
+                neighbours[zone_id] = {zone_ids[j] for j in adjacency.indices[adjacency.indptr[i]:adjacency.indptr[i + 1]]}
+                neighbours[zone_id].add(zone_id)
+
+        with self._lock:
+            self.surge_ratio = surge_ratio
+            self.idle_threshold = idle_threshold
+            self.driver_capacity = driver_capacity
+            self.zone_ids = zone_ids
+            self.zone_lat, self.zone_lon = zone_lat, zone_lon
+            self._neighbours = neighbours
+
+            # Recent orders from the snapshot cannot be expired individually; the
+            # periodic reseed replaces them
+            self._live = ZoneSnapshot(
+                {z: dict(c) for z, c in snapshot.drivers_by_zone.items()},
+                {z: dict(c) for z, c in snapshot.orders_by_zone.items()},
+                built_at=snapshot.built_at
+            )
+            self._recent_events = {}
+            self._classes = {z: c for z, c in self._classes.items() if z in neighbours}
+            for zone_id in zone_ids:
+                self._reclassify(zone_id)
+
+    def _reclassify(self, zone_id: Optional[str]):
+        if zone_id is None or self._live is None:
+            return
+        stats = self._live.zone_stats(zone_id, self.driver_capacity)
+        if stats["demand_pressure"] > self.surge_ratio:
+            new_class = SURGE
+        elif stats["available_drivers"] > self.idle_threshold and stats["demand_pressure"] < 0.5:
+            new_class = SURPLUS
+        else:
+            new_class = BALANCED
+
+        if self._classes.get(zone_id, BALANCED) != new_class:
+            self._dirty.add(zone_id)
+        self._classes[zone_id] = new_class
+
+    def _bump_drivers(self, state: DriverState, delta: int):
+        if state is None:
+            return
+        zone_id, status = state
+        counts = self._live.drivers_by_zone.setdefault(zone_id, {})
+        counts[status] = max(0, counts.get(status, 0) + delta)
+
+    def _bump_orders(self, zone_id: Optional[str], key: str, delta: int):
+        counts = self._live.orders_by_zone.setdefault(zone_id, {"pending": 0, "recent": 0})
+        counts[key] = max(0, counts.get(key, 0) + delta)
+
+    def driver_changed(self, before: DriverState, after: DriverState):
+        if before == after:
+            return
+        with self._lock:
+            if self._live is None:
+                return
+            self._bump_drivers(before, -1)
+            self._bump_drivers(after, +1)
+            for state in (before, after):
+                if state is not None:
+                    self._reclassify(state[0])
+
+            # An unzoned driver becoming available can serve any surge zone
+            if after == (None, DriverStatus.AVAILABLE.value):
+                self._dirty.update(z for z, c in self._classes.items() if c == SURGE)
+
+    def order_changed(
+        self,
+        before: Optional[Tuple[Optional[str], str]],
+        after: Optional[Tuple[Optional[str], str]],
+        created_at: Optional[datetime] = None,
+        is_new: bool = False
+    ):
+        pending = OrderStatus.pending.value
+        with self._lock:
+            if self._live is None:
+                return
+            touched = set()
+            if before is not None and before[1] == pending:
+                self._bump_orders(before[0], "pending", -1)
+                touched.add(before[0])
+            if after is not None and after[1] == pending:
+                self._bump_orders(after[0], "pending", +1)
+                touched.add(after[0])
+
+            created_at = created_at or datetime.utcnow()
+            if created_at >= datetime.utcnow() - self.recent_window:
+                if is_new and after is not None:
+                    insort(self._recent_events.setdefault(after[0], []), created_at)
+                    self._bump_orders(after[0], "recent", +1)
+                    touched.add(after[0])
+                elif before is not None and after is not None and before[0] != after[0]:
+                    events = self._recent_events.get(before[0])
+                    if events and created_at in events:
+                        events.remove(created_at)
+                        insort(self._recent_events.setdefault(after[0], []), created_at)
+                    self._bump_orders(before[0], "recent", -1)
+                    self._bump_orders(after[0], "recent", +1)
+                    touched.update((before[0], after[0]))
+
+            for zone_id in touched:
+                self._reclassify(zone_id)
+
+    def _expire_recent(self):
+        cutoff = datetime.utcnow() - self.recent_window
+        for zone_id, events in self._recent_events.items():
+            expired = bisect_left(events, cutoff)
+            if expired:
+                del events[:expired]
+                self._bump_orders(zone_id, "recent", -expired)
+                self._reclassify(zone_id)
+
+    def pop_dirty(self) -> Set[str]:
+        with self._lock:
+            if self._live is None:
+                return set()
+            self._expire_recent()
+            dirty, self._dirty = self._dirty, set()
+            return dirty
+
+    def neighbourhood(self, zone_ids: Iterable[str]) -> Set[str]:
+        result = set()
+        for zone_id in zone_ids:
+            result.update(self._neighbours.get(zone_id, {zone_id}))
+        return result
+
+    def zone_stats(self, zone_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            if self._live is None:
+                return {}
+            return {z: self._live.zone_stats(z, self.driver_capacity) for z in zone_ids}
+
+    def zone_class(self, zone_id: str) -> str:
+        return self._classes.get(zone_id, BALANCED)
+
+
+class ZoneIndexView:
+    """Arrays over all zones, as read from the index in one round trip"""
+
+    def __init__(self, zone_ids, names, lat, lon, available, pending, recent, driver_capacity, seeded_at=None):
+        self.zone_ids = zone_ids
+        self.names = names
+        self.lat = lat
+        self.lon = lon
+        self.available = available
+        self.pending = pending
+        self.recent = recent
+        self.seeded_at = seeded_at
+        effective_supply = available * driver_capacity
+        effective_supply[effective_supply == 0] = 1
+        self.pressure = (pending + recent * 0.5) / effective_supply
+
+    @classmethod
+    def from_snapshot(cls, snapshot: ZoneSnapshot, zones: List[Zone], driver_capacity: float) -> "ZoneIndexView":
+        lat, lon = decode_points(z.centroid for z in zones)
+        zone_ids = [z.zone_id for z in zones]
+        return cls(
+            zone_ids, [z.name for z in zones], lat, lon,
+            np.array([snapshot.driver_count(z, DriverStatus.AVAILABLE.value) for z in zone_ids], dtype=np.float64),
+            np.array([snapshot.pending_orders(z) for z in zone_ids], dtype=np.float64),
+            np.array([snapshot.recent_orders(z) for z in zone_ids], dtype=np.float64),
+            driver_capacity, seeded_at=time.time()
+        )
+
+
+class ZonePressureIndex:
+    """Redis-resident zone centroids and supply/demand counters shared by all workers.
+
+    Counters are adjusted with HINCRBY from committed changes; recent orders are
+    counted in per-minute buckets that expire on their own. A full seed rewrites
+    everything and moves seeded_at, which tells readers to reload centroids.
+    """
+    PREFIX = "zone_index"
+
+    def __init__(self, redis=redis_client, recent_window_minutes: int = ZoneSnapshotService.RECENT_WINDOW_MINUTES):
+        self.redis = redis
+        self.recent_window_minutes = recent_window_minutes
+        self._meta_version: Optional[str] = None
+        self._meta: Optional[Tuple[List[str], List[Optional[str]], np.ndarray, np.ndarray, Dict[str, int]]] = None
+
+    def _key(self, name: str) -> str:
+        return f"{self.PREFIX}:{name}"
+
+    def _recent_key(self, minute: int) -> str:
+        return self._key(f"recent:{minute}")
+
+    @staticmethod
+    def _minute(ts: datetime) -> int:
+        if ts.tzinfo is not None:
+            ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+        return int((ts - datetime(1970, 1, 1)).total_seconds() // 60)
+
+    def _recent_keys(self, now: datetime) -> List[str]:
+        current = self._minute(now)
+        return [self._recent_key(m) for m in range(current - self.recent_window_minutes + 1, current + 1)]
+
+    def seed(self, snapshot: ZoneSnapshot, zones: List[Zone]):
+        zone_lat, zone_lon = decode_points(z.centroid for z in zones)
+        now = datetime.utcnow()
+        seeded_at = time.time()
+        meta = {
+            z.zone_id: f"{lat},{lon},{z.name or ''}"
+            for z, lat, lon in zip(zones, zone_lat, zone_lon)
+        }
+        available = {
+            z: counts.get(DriverStatus.AVAILABLE.value, 0)
+            for z, counts in snapshot.drivers_by_zone.items() if z is not None
+        }
+        pending = {z: c["pending"] for z, c in snapshot.orders_by_zone.items() if z is not None}
+        recent = {z: c["recent"] for z, c in snapshot.orders_by_zone.items() if z is not None}
+
+        try:
+            pipe = self.redis.pipeline()
+            pipe.delete(self._key("meta"), self._key("available"), self._key("pending"), *self._recent_keys(now))
+            if meta:
+                pipe.hset(self._key("meta"), mapping=meta)
+            if available:
+                pipe.hset(self._key("available"), mapping=available)
+            if pending:
+                pipe.hset(self._key("pending"), mapping=pending)
+            if recent:
+                # Seeded recent totals sit in the current bucket until the next seed replaces them
+                pipe.hset(self._recent_key(self._minute(now)), mapping=recent)
+                pipe.expire(self._recent_key(self._minute(now)), (self.recent_window_minutes + 1) * 60)
+            pipe.set(self._key("seeded_at"), repr(seeded_at))
+            pipe.execute()
+        except redis_lib.exceptions.RedisError as e:
+            logger.warning(f"Failed to seed zone pressure index: {e}")
+
+    def apply(self, changes: List[tuple]):
+        """Apply (kind, before, after, created_at, is_new) change records"""
+        available = DriverStatus.AVAILABLE.value
+        pending = OrderStatus.pending.value
+        cutoff = datetime.utcnow() - timedelta(minutes=self.recent_window_minutes)
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            queued = False
+            for kind, before, after, created_at, is_new in changes:
+                key, tracked = ("available", available) if kind == "driver" else ("pending", pending)
+                for state, delta in ((before, -1), (after, +1)):
+                    if state is not None and state[0] is not None and state[1] == tracked:
+                        pipe.hincrby(self._key(key), state[0], delta)
+                        queued = True
+                if kind == "order" and is_new and after is not None and after[0] is not None:
+                    created_at = created_at or datetime.utcnow()
+                    if created_at >= cutoff:
+                        bucket = self._recent_key(self._minute(created_at))
+                        pipe.hincrby(bucket, after[0], 1)
+                        pipe.expire(bucket, (self.recent_window_minutes + 1) * 60)
+                        queued = True
+            if queued:
+                pipe.execute()
+        except redis_lib.exceptions.RedisError as e:
+            logger.warning(f"Failed to update zone pressure index: {e}")
+
+    def read(self, driver_capacity: float) -> Optional[ZoneIndexView]:
+        """All zones with current pressure, or None if the index is unavailable"""
+        now = datetime.utcnow()
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.get(self._key("seeded_at"))
+            pipe.hgetall(self._key("available"))
+            pipe.hgetall(self._key("pending"))
+            for key in self._recent_keys(now):
+                pipe.hgetall(key)
+            seeded_at, available, pending, *recent_buckets = pipe.execute()
+
+            if seeded_at is None:
+                return None
+            if seeded_at != self._meta_version:
+                raw_meta = self.redis.hgetall(self._key("meta"))
+                zone_ids = list(raw_meta.keys())
+                lat = np.empty(len(zone_ids))
+                lon = np.empty(len(zone_ids))
+                names = []
+                for i, zone_id in enumerate(zone_ids):
+                    lat_str, lon_str, name = raw_meta[zone_id].split(",", 2)
+                    lat[i], lon[i] = float(lat_str), float(lon_str)
+                    names.append(name or None)
+                self._meta = (zone_ids, names, lat, lon, {z: i for i, z in enumerate(zone_ids)})
+                self._meta_version = seeded_at
+        except redis_lib.exceptions.RedisError as e:
+            logger.warning(f"Zone pressure index unavailable: {e}")
+            return None
+
+        zone_ids, names, lat, lon, position = self._meta
+        if not zone_ids:
+            return None
+
+        def to_array(*hashes: Dict[str, str]) -> np.ndarray:
+            arr = np.zeros(len(zone_ids))
+            for counts in hashes:
+                if not counts:
+                    continue
+                idx = np.fromiter((position.get(z, -1) for z in counts), dtype=np.int64, count=len(counts))
+                values = np.array(list(counts.values()), dtype=np.float64)
+                known = idx >= 0
+                np.add.at(arr, idx[known], values[known])
+            return np.maximum(arr, 0.0)
+
+        return ZoneIndexView(
+            zone_ids, names, lat, lon,
+            to_array(available), to_array(pending), to_array(*recent_buckets),
+            driver_capacity, seeded_at=float(seeded_at)
+        )
+
+
+zone_pressure_tracker = ZonePressureTracker()
+zone_pressure_index = ZonePressureIndex()
+
+def record_changes(changes: List[tuple]):
+    """Feed committed (kind, before, after, created_at, is_new) records to the tracker and the index"""
+    for kind, before, after, created_at, is_new in changes:
+        if kind == "driver":
+            zone_pressure_tracker.driver_changed(before, after)
+        else:
+            zone_pressure_tracker.order_changed(before, after, created_at=created_at, is_new=is_new)
+    if changes:
+        zone_pressure_index.apply(changes)
+
+
+def _previous(obj, attr: str):
+    history = inspect(obj).attrs[attr].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(obj, attr)
+
+def _driver_state(zone_id, driver_status, duty_status) -> DriverState:
+    if duty_status != DutyStatus.ON_DUTY.value:
+        return None
+    return (zone_id, driver_status)
+
+@event.listens_for(Session, "after_flush")
+def _collect_zone_pressure_changes(session, flush_context):
+    changes = session.info.setdefault("zone_pressure_changes", [])
+    for obj in session.new:
+        if isinstance(obj, Driver):
+            changes.append(("driver", None, _driver_state(obj.current_zone, obj.status, obj.duty_status), None, True))
+        elif isinstance(obj, Order):
+            changes.append(("order", None, (obj.pickup_zone, obj.status), obj.created_at, True))
+
+    for obj in session.dirty:
+        if isinstance(obj, Driver):
+            before = _driver_state(_previous(obj, "current_zone"), _previous(obj, "status"), _previous(obj, "duty_status"))
+            after = _driver_state(obj.current_zone, obj.status, obj.duty_status)
+            if before != after:
+                changes.append(("driver", before, after, None, False))
+        elif isinstance(obj, Order):
+            before = (_previous(obj, "pickup_zone"), _previous(obj, "status"))
+            after = (obj.pickup_zone, obj.status)
+            if before != after:
+                changes.append(("order", before, after, obj.created_at, False))
+
+    for obj in session.deleted:
+        if isinstance(obj, Driver):
+            changes.append(("driver", _driver_state(obj.current_zone, obj.status, obj.duty_status), None, None, False))
+        elif isinstance(obj, Order):
+            changes.append(("order", (obj.pickup_zone, obj.status), None, obj.created_at, False))
+
+@event.listens_for(Session, "after_commit")
+def _apply_zone_pressure_changes(session):
+    record_changes(session.info.pop("zone_pressure_changes", []))
+
+@event.listens_for(Session, "after_rollback")
+def _discard_zone_pressure_changes(session):
+    session.info.pop("zone_pressure_changes", None)
@@ -0,0 +1,105 @@
+import logging
+from typing import Dict, Any, Optional
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
+from sqlalchemy import func, case, or_
+
+from app.models.driver import Driver
+from app.models.order import Order
+from app.schemas.driver import DriverStatus, DutyStatus
+from app.schemas.order import OrderStatus
+
+logger = logging.getLogger(__name__)
+
+class ZoneSnapshot:
+    """Point-in-time supply/demand counts for every zone, built from two grouped queries."""
+
+    def __init__(
+        self,
+        drivers_by_zone: Dict[Optional[str], Dict[str, int]],
+        orders_by_zone: Dict[Optional[str], Dict[str, int]],
+        built_at: datetime
+    ):
+        self.drivers_by_zone = drivers_by_zone
+        self.orders_by_zone = orders_by_zone
+        self.built_at = built_at
+
+    @property
+    def age_seconds(self) -> float:
+        return (datetime.utcnow() - self.built_at).total_seconds()
+
+    def driver_count(self, zone_id: Optional[str], status: Optional[str] = None) -> int:
+        counts = self.drivers_by_zone.get(zone_id, {})
+        if status is None:
+            return sum(counts.values())
+        return counts.get(status, 0)
+
+    def pending_orders(self, zone_id: Optional[str]) -> int:
+        return self.orders_by_zone.get(zone_id, {}).get("pending", 0)
+
+    def recent_orders(self, zone_id: Optional[str]) -> int:
+        return self.orders_by_zone.get(zone_id, {}).get("recent", 0)
+
+    def zone_stats(self, zone_id: str, driver_capacity: float) -> Dict[str, Any]:
+        available = self.driver_count(zone_id, DriverStatus.AVAILABLE.value)
+        pending = self.pending_orders(zone_id)
+        recent_orders = self.recent_orders(zone_id)
+
+        # Supply accounts for the fact that a driver can handle multiple orders (batching)
+        effective_supply = (available * driver_capacity) or 1
+        demand_pressure = (pending + recent_orders * 0.5) / effective_supply
+
+        return {
+            "zone_id": zone_id,
+            "available_drivers": available,
+            "busy_drivers": self.driver_count(zone_id, DriverStatus.BUSY.value),
+            "on_break_drivers": self.driver_count(zone_id, DriverStatus.ON_BREAK.value),
+            "total_drivers": self.driver_count(zone_id),
+            "pending_orders": pending,
+            "recent_orders": recent_orders,
+            "effective_supply": effective_supply,
+            "demand_pressure": round(demand_pressure, 2),
+        }
+
+
+class ZoneSnapshotService:
+    RECENT_WINDOW_MINUTES = 15
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def build(self) -> ZoneSnapshot:
+        now = datetime.utcnow()
+        recent_cutoff = now - timedelta(minutes=self.RECENT_WINDOW_MINUTES)
+
+        driver_rows = self.db.query(
+            Driver.current_zone,
+            Driver.status,
+            func.count(Driver.driver_id)
+        ).filter(
+            Driver.duty_status == DutyStatus.ON_DUTY.value
+        ).group_by(Driver.current_zone, Driver.status).all()
+
+        drivers_by_zone: Dict[Optional[str], Dict[str, int]] = {}
+        for zone_id, driver_status, count in driver_rows:
+            drivers_by_zone.setdefault(zone_id, {})[driver_status] = int(count)
+
+        is_pending = Order.status == OrderStatus.pending.value
+        is_recent = Order.created_at >= recent_cutoff
+        order_rows = self.db.query(
+            Order.pickup_zone,
+            func.sum(case((is_pending, 1), else_=0)),
+            func.sum(case((is_recent, 1), else_=0))
+        ).filter(
+            or_(is_pending, is_recent)
+        ).group_by(Order.pickup_zone).all()
+
+        orders_by_zone: Dict[Optional[str], Dict[str, int]] = {}
+        for zone_id, pending, recent in order_rows:
+            orders_by_zone[zone_id] = {
+                "pending": int(pending or 0),
+                "recent": int(recent or 0),
+            }
+
+        logger.debug(f"Zone snapshot built: {len(drivers_by_zone)} driver zones, {len(orders_by_zone)} order zones")
+        return ZoneSnapshot(drivers_by_zone, orders_by_zone, built_at=now)
@@ -18,6 +18,8 @@ from app.models.driver import Driver
 from app.models.zone import DemandForecast, DemandPattern
 from app.models.weather import Weather
 from app.models.analytics import Demand, ZoneMetrics
+from app.services.zone_index_service import build_zone_index
+from app.services.hot_zone_service import hot_zone_cache
 
 logger = logging.getLogger(__name__)
 
@@ -135,13 +137,19 @@ class ZoneClusteringService:
             created_zones.append(new_zone)
 
         self.db.flush()
+        # Other workers pick the new zones up from the after-commit version bump
+        zone_index = build_zone_index(self.db)
+        hot_zone_cache.invalidate()
+
+        from app.services.allocation_service import AllocationService
+        from app.services.order_service import OrderService
+
+        allocation_service = AllocationService(self.db)
+        # Reseed before allocating, otherwise the index still scores the deleted zone ids
+        allocation_service.refresh_zone_pressure(created_zones)
 
         if created_zones:
             try:
-                from app.services.allocation_service import AllocationService
-                from app.services.order_service import OrderService
-
-                allocation_service = AllocationService(self.db)
                 order_service = OrderService(self.db)
 
                 online_drivers = self.db.query(Driver).filter(
@@ -170,11 +178,10 @@ class ZoneClusteringService:
                     Order.pickup_longitude.isnot(None)
                 ).all()
 
-                for order in orders_to_assign:
-                    try:
-                        order_service.assign_zones(order)
-                    except Exception as e:
-                        logger.warning(f"Failed to assign zones for order {order.order_id}: {e}")
+                try:
+                    order_service.assign_zones_bulk(orders_to_assign, index=zone_index)
+                except Exception as e:
+                    logger.warning(f"Failed to assign zones for {len(orders_to_assign)} orders: {e}")
 
                 self.db.commit()
                 logger.info("Successfully migrated all drivers/orders to new zones using existing services.")
@@ -0,0 +1,43 @@
+"""Runtime of the pickup-and-delivery solver for typical driver batches.
+
+Run from Backend/:  python -m tests.benchmarks.bench_pdp_solver
+"""
+import sys
+import time
+import numpy as np
+
+from app.optimization.pdp_solver import solve_pdp, NO_PREDECESSOR
+
+BATCH_SIZES = [2, 3, 4, 6, 8, 10]
+REPEATS = 50
+
+# Rough Dubai bounding box
+LAT_RANGE = (24.95, 25.35)
+LON_RANGE = (55.05, 55.45)
+
+def make_batch(n_orders: int, seed: int = 42):
+    """Travel-time-like asymmetric matrix for a driver plus n_orders pickup/dropoff pairs"""
+    rng = np.random.default_rng(seed)
+    n = 2 * n_orders
+    lat = rng.uniform(*LAT_RANGE, n + 1)
+    lon = rng.uniform(*LON_RANGE, n + 1)
+    dist = np.hypot(lat[:, None] - lat[None, :], lon[:, None] - lon[None, :])
+    dist *= rng.uniform(1.0, 1.4, size=dist.shape)
+    predecessor = [NO_PREDECESSOR] * n
+    for i in range(n_orders):
+        predecessor[2 * i + 1] = 2 * i + 1
+    return dist, predecessor
+
+def run(sizes=BATCH_SIZES):
+    print(f"{'orders':>7} {'nodes':>6} {'mean_ms':>8} {'max_ms':>8}")
+    for n_orders in sizes:
+        timings = []
+        for seed in range(REPEATS):
+            dist, predecessor = make_batch(n_orders, seed)
+            start = time.perf_counter()
+            solve_pdp(dist, predecessor)
+            timings.append((time.perf_counter() - start) * 1000)
+        print(f"{n_orders:>7} {2 * n_orders:>6} {np.mean(timings):>8.2f} {np.max(timings):>8.2f}")
+
+if __name__ == "__main__":
+    run([int(a) for a in sys.argv[1:]] or BATCH_SIZES)
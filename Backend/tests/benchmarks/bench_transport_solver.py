@@ -0,0 +1,77 @@
+"""Runtime of the capacitated transportation solver vs. slot-replicated Hungarian.
+
+Run from Backend/:  python -m tests.benchmarks.bench_transport_solver
+"""
+import sys
+import time
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+from app.optimization.transport_solver import solve_transportation
+from app.optimization.candidates import nearest_zone_candidates
+
+FLEET_SIZES = [1000, 5000, 10000]
+ZONES = 60
+# Dense slot replication needs drivers x slots floats; skip it past this size
+HUNGARIAN_MAX_DRIVERS = 5000
+
+# Rough Dubai bounding box
+LAT_RANGE = (24.95, 25.35)
+LON_RANGE = (55.05, 55.45)
+
+def make_instance(n_drivers: int, n_zones: int, seed: int = 42):
+    rng = np.random.default_rng(seed)
+    cost = rng.uniform(2.0, 60.0, size=(n_drivers, n_zones))
+    weights = rng.dirichlet(np.ones(n_zones))
+    capacities = np.floor(weights * n_drivers * 0.9).astype(int)
+    return cost, capacities
+
+def make_geo_instance(n_drivers: int, n_zones: int, seed: int = 42):
+    rng = np.random.default_rng(seed)
+    drivers = (rng.uniform(*LAT_RANGE, n_drivers), rng.uniform(*LON_RANGE, n_drivers))
+    zones = (rng.uniform(*LAT_RANGE, n_zones), rng.uniform(*LON_RANGE, n_zones))
+    return drivers, zones
+
+def run_pruned(sizes, k: int = 8, max_minutes: float = 40.0):
+    print(f"{'drivers':>8} {'zones':>6} {'nnz':>8} {'candidates_s':>13} {'solve_s':>8}")
+    for n in sizes:
+        (d_lat, d_lon), (z_lat, z_lon) = make_geo_instance(n, ZONES)
+        _, capacities = make_instance(n, ZONES)
+
+        start = time.perf_counter()
+        candidates = nearest_zone_candidates(d_lat, d_lon, z_lat, z_lon, k=k, max_minutes=max_minutes)
+        candidates_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        solve_transportation(candidates, capacities)
+        solve_s = time.perf_counter() - start
+
+        print(f"{n:>8} {ZONES:>6} {candidates.nnz:>8} {candidates_s:>13.3f} {solve_s:>8.3f}")
+
+def run(sizes=FLEET_SIZES):
+    print(f"{'drivers':>8} {'zones':>6} {'slots':>7} {'transport_s':>12} {'hungarian_s':>12} {'cost_match':>10}")
+    for n in sizes:
+        cost, capacities = make_instance(n, ZONES)
+
+        start = time.perf_counter()
+        assignment = solve_transportation(cost, capacities)
+        transport_s = time.perf_counter() - start
+        assigned = assignment >= 0
+        transport_cost = cost[np.flatnonzero(assigned), assignment[assigned]].sum()
+
+        hungarian_s = "-"
+        cost_match = "-"
+        if n <= HUNGARIAN_MAX_DRIVERS:
+            slots = np.repeat(np.arange(ZONES), capacities)
+            start = time.perf_counter()
+            rows, cols = linear_sum_assignment(cost[:, slots])
+            hungarian_s = f"{time.perf_counter() - start:.3f}"
+            cost_match = str(bool(np.isclose(cost[rows, slots[cols]].sum(), transport_cost)))
+
+        print(f"{n:>8} {ZONES:>6} {int(capacities.sum()):>7} {transport_s:>12.3f} {hungarian_s:>12} {cost_match:>10}")
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or FLEET_SIZES
+    run(sizes)
+    print()
+    run_pruned(sizes)
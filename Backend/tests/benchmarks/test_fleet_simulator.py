@@ -0,0 +1,72 @@
+import os
+import json
+import pytest
+from unittest.mock import patch, MagicMock
+
+from tests.benchmarks.fleet_simulator import (
+    generate_fleet, check_budget, record_budget, run_size, BUDGET_PATH, LAT_RANGE, LON_RANGE
+)
+from app.optimization.cost_matrix import decode_points
+
+BENCH_DATABASE_URL = os.environ.get("BENCH_DATABASE_URL")
+
+class TestFleetSimulator:
+
+    def test_generate_fleet_is_deterministic_and_in_dubai(self):
+        fleet = generate_fleet(200, n_zones=12, seed=7)
+        again = generate_fleet(200, n_zones=12, seed=7)
+
+        assert len(fleet["drivers"]) == len(fleet["users"]) == 200
+        assert len(fleet["zones"]) == len(fleet["forecasts"]) == 12
+        assert len(fleet["orders"]) == 120
+        assert [d.current_zone for d in fleet["drivers"]] == [d.current_zone for d in again["drivers"]]
+
+        lat, lon = decode_points(z.centroid for z in fleet["zones"])
+        assert ((lat >= LAT_RANGE[0]) & (lat <= LAT_RANGE[1])).all()
+        assert ((lon >= LON_RANGE[0]) & (lon <= LON_RANGE[1])).all()
+        assert all(z.boundary is not None for z in fleet["zones"])
+
+    def test_check_budget_flags_regressions(self):
+        results = [
+            {"entry": "initial_allocation", "drivers": 500, "wall_s": 2.0},
+            {"entry": "allocate_driver", "drivers": 500, "wall_s": 0.001},
+            {"entry": "reallocation", "drivers": 10000, "wall_s": 99.0},
+        ]
+        budget = {"sizes": {"500": {"initial_allocation": 1.5, "allocate_driver": 0.02}}}
+        violations = check_budget(results, budget)
+        assert len(violations) == 1 and "initial_allocation at 500" in violations[0]
+
+    def test_record_budget_adds_headroom_and_hardware(self):
+        results = [
+            {"entry": "initial_allocation", "drivers": 500, "wall_s": 1.0},
+            {"entry": "allocate_driver", "drivers": 500, "wall_s": 0.01},
+        ]
+        conn = MagicMock()
+        conn.execute.return_value.scalar.side_effect = ["3.4.0", "15.4"]
+        engine = MagicMock()
+        engine.connect.return_value.__enter__.return_value = conn
+
+        with patch("tests.benchmarks.fleet_simulator.create_engine", return_value=engine):
+            budget = record_budget("postgresql://bench", results, headroom=2.0)
+
+        assert budget["sizes"] == {"500": {"initial_allocation": 2.0, "allocate_driver": 0.02}}
+        assert budget["measured_on"]["postgis"] == "3.4.0"
+        assert budget["measured_on"]["cpus"] == os.cpu_count()
+        assert not check_budget(results, budget)
+
+    def test_shipped_budget_covers_every_entry_point(self):
+        with open(BUDGET_PATH) as f:
+            budget = json.load(f)
+        assert "measured_on" in budget
+        for limits in budget["sizes"].values():
+            assert set(limits) == {"initial_allocation", "reallocation", "allocate_driver"}
+
+@pytest.mark.skipif(not BENCH_DATABASE_URL, reason="BENCH_DATABASE_URL (PostGIS) not set")
+def test_allocation_latency_budget():
+    with open(BUDGET_PATH) as f:
+        budget = json.load(f)
+
+    results = []
+    for size in budget["sizes"]:
+        results.extend(run_size(BENCH_DATABASE_URL, int(size)))
+    assert not check_budget(results, budget)
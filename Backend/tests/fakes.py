@@ -0,0 +1,94 @@
+"""In-memory stand-ins shared by unit tests and benchmarks"""
+import math
+
+class MockRedis:
+    """Just enough of redis-py (decode_responses=True) for the zone, driver geo and GPS last-point caches"""
+
+    def __init__(self):
+        self.data = {}
+        self._queue = None
+
+    def pipeline(self, transaction=True):
+        pipe = MockRedis()
+        pipe.data = self.data
+        pipe._queue = []
+        return pipe
+
+    def _run(self, fn, *args, **kwargs):
+        if self._queue is not None:
+            self._queue.append((fn, args, kwargs))
+            return self
+        return fn(*args, **kwargs)
+
+    def execute(self):
+        queue, self._queue = self._queue, []
+        return [fn(*args, **kwargs) for fn, args, kwargs in queue]
+
+    def _delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def _hset(self, key, mapping):
+        self.data.setdefault(key, {}).update({k: str(v) for k, v in mapping.items()})
+
+    def _hincrby(self, key, field, amount):
+        bucket = self.data.setdefault(key, {})
+        bucket[field] = str(int(bucket.get(field, 0)) + amount)
+
+    def delete(self, *keys): return self._run(self._delete, *keys)
+    def hset(self, key, mapping): return self._run(self._hset, key, mapping)
+    def hincrby(self, key, field, amount): return self._run(self._hincrby, key, field, amount)
+    def hgetall(self, key): return self._run(lambda: dict(self.data.get(key, {})))
+    def _set(self, key, value, nx):
+        if nx and key in self.data:
+            return None
+        self.data[key] = str(value)
+        return True
+
+    def _incr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) + 1)
+        return int(self.data[key])
+
+    def _geoadd(self, key, values):
+        members = self.data.setdefault(key, {})
+        for i in range(0, len(values), 3):
+            lng, lat, member = values[i:i + 3]
+            members[member] = (float(lng), float(lat))
+
+    def _zrem(self, key, *members):
+        for member in members:
+            self.data.get(key, {}).pop(member, None)
+
+    def _geosearch(self, key, longitude, latitude, radius, unit="km", sort=None, count=None, withdist=False, withcoord=False):
+        hits = []
+        for member, (lng, lat) in self.data.get(key, {}).items():
+            dlat, dlng = math.radians(lat - latitude), math.radians(lng - longitude)
+            a = math.sin(dlat / 2) ** 2 + math.cos(math.radians(latitude)) * math.cos(math.radians(lat)) * math.sin(dlng / 2) ** 2
+            km = 6372.797560856 * 2 * math.asin(math.sqrt(a))
+            if km <= radius:
+                hits.append([member, round(km, 4), (lng, lat)])
+        hits.sort(key=lambda hit: hit[1])
+        return hits[:count] if count else hits
+
+    def set(self, key, value, nx=False, ex=None): return self._run(self._set, key, value, nx)
+    def geoadd(self, key, values): return self._run(self._geoadd, key, values)
+    def zrem(self, key, *members): return self._run(self._zrem, key, *members)
+    def geosearch(self, key, **kwargs): return self._run(self._geosearch, key, **kwargs)
+    def get(self, key): return self._run(self.data.get, key)
+    def hget(self, key, field): return self._run(lambda: self.data.get(key, {}).get(field))
+
+    def register_script(self, script):
+        # Python stand-ins for the Lua scripts services register
+        from app.services.distance_tracking_service import LastPointCache
+        handler = {LastPointCache.PUT_IF_NEWER: _put_if_newer}[script]
+        return lambda keys=(), args=(): handler(self, list(keys), list(args))
+    def incr(self, key): return self._run(self._incr, key)
+    def expire(self, key, ttl): return self._run(lambda: True)
+
+
+def _put_if_newer(redis, keys, args):
+    ts = redis.hget(keys[0], "ts")
+    if ts is not None and float(ts) > float(args[2]):
+        return 0
+    redis.hset(keys[0], mapping=dict(zip(("lat", "lng", "ts", "km"), args[:4])))
+    return 1
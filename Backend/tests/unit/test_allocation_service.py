@@ -95,3 +95,230 @@ class TestAllocationService:
         # Valid location successfully calls haversine calculation
         time = service._get_travel_time(driver_loc, zone_loc)
         assert time < 999.0
+
+    def test_zone_snapshot_stats(self):
+        from datetime import datetime, timedelta
+        from app.services.zone_snapshot_service import ZoneSnapshot
+
+        snapshot = ZoneSnapshot(
+            drivers_by_zone={"A": {"available": 2, "busy": 1}},
+            orders_by_zone={"A": {"pending": 6, "recent": 4}},
+            built_at=datetime.utcnow() - timedelta(seconds=5)
+        )
+
+        stats = snapshot.zone_stats("A", driver_capacity=1.5)
+        assert stats["available_drivers"] == 2
+        assert stats["busy_drivers"] == 1
+        assert stats["total_drivers"] == 3
+        assert stats["demand_pressure"] == round((6 + 4 * 0.5) / 3.0, 2)
+
+        # Unknown zone has no supply, so effective supply floors at 1
+        empty = snapshot.zone_stats("B", driver_capacity=1.5)
+        assert empty["available_drivers"] == 0
+        assert empty["demand_pressure"] == 0.0
+
+        assert snapshot.age_seconds >= 5
+
+    def test_zone_snapshot_reused_within_service(self):
+        from unittest.mock import MagicMock, patch
+
+        service = AllocationService(db=MagicMock())
+        with patch("app.services.allocation_service.ZoneSnapshotService") as mock_builder:
+            mock_builder.return_value.build.return_value = MagicMock(age_seconds=0.0)
+            first = service.get_zone_snapshot()
+            second = service.get_zone_snapshot()
+            assert first is second
+            assert mock_builder.return_value.build.call_count == 1
+
+            service.invalidate_zone_snapshot()
+            service.get_zone_snapshot()
+            assert mock_builder.return_value.build.call_count == 2
+
+    def test_transportation_solver_matches_slot_hungarian(self):
+        import numpy as np
+        from scipy.optimize import linear_sum_assignment
+        from app.optimization.transport_solver import solve_transportation, UNASSIGNED
+
+        rng = np.random.default_rng(7)
+        for n_drivers, capacities in [(12, [3, 1, 4]), (5, [4, 4, 2]), (9, [0, 2, 2])]:
+            cost = rng.uniform(1.0, 40.0, size=(n_drivers, len(capacities)))
+            assignment = solve_transportation(cost, capacities)
+
+            slots = np.repeat(np.arange(len(capacities)), capacities)
+            rows, cols = linear_sum_assignment(cost[:, slots])
+            expected = cost[rows, slots[cols]].sum()
+
+            assigned = np.flatnonzero(assignment != UNASSIGNED)
+            assert len(assigned) == min(n_drivers, sum(capacities))
+            assert np.all(np.bincount(assignment[assigned], minlength=len(capacities)) <= capacities)
+            assert np.isclose(cost[assigned, assignment[assigned]].sum(), expected)
+
+    def test_assign_drivers_respects_zone_capacity(self):
+        service = AllocationService(db=None)
+        zone_a = Zone(zone_id="A", centroid=WKTElement('POINT(55.27 25.20)', srid=4326))
+        zone_b = Zone(zone_id="B", centroid=WKTElement('POINT(55.14 25.08)', srid=4326))
+        drivers = [
+            MockDriver("d1", lat=25.20, lon=55.27),
+            MockDriver("d2", lat=25.21, lon=55.27),
+            MockDriver("d3", lat=25.08, lon=55.14),
+        ]
+
+        assignments = service._assign_drivers_to_zones_capacitated(drivers, [zone_a, zone_b], [1, 2])
+
+        assert len(assignments) == 3
+        assert sum(1 for _, z in assignments if z == "A") == 1
+        assert ("d3", "B") in assignments
+
+    def test_vectorized_cost_matrix_matches_scalar_path(self):
+        import numpy as np
+        from geoalchemy2.shape import from_shape
+        from shapely.geometry import Point
+
+        service = AllocationService(db=None)
+        drivers = [
+            MockDriver("d1", fatigue=0.5, lat=25.08, lon=55.14),
+            MockDriver("d2", battery=10, lat=25.20, lon=55.27),
+            MockDriver("d3"),  # No location
+        ]
+        zones = [
+            Zone(zone_id="A", centroid=from_shape(Point(55.27, 25.19), srid=4326)),
+            Zone(zone_id="B", centroid=WKTElement('POINT(55.14 25.09)', srid=4326)),
+        ]
+
+        matrix = service._build_cost_matrix(drivers, zones).tocsr()
+
+        for i, driver in enumerate(drivers[:2]):
+            for j, zone in enumerate(zones):
+                expected = service._get_travel_time(driver, zone) + service._calculate_driver_penalties(driver)
+                assert np.isclose(matrix[i, j], expected)
+        # Drivers without a location have no candidate zones
+        assert matrix.getrow(2).nnz == 0
+
+    def test_candidate_pruning_keeps_nearest_zones(self):
+        import numpy as np
+        from app.optimization.candidates import nearest_zone_candidates
+
+        driver_lat = np.array([25.20, 25.08, np.nan])
+        driver_lon = np.array([55.27, 55.14, np.nan])
+        zone_lat = np.array([25.20, 25.08, 24.45, 25.30])
+        zone_lon = np.array([55.27, 55.14, 54.38, 55.40])
+
+        candidates = nearest_zone_candidates(driver_lat, driver_lon, zone_lat, zone_lon, k=2, max_minutes=30.0).tocsr()
+
+        assert candidates.shape == (3, 4)
+        # Abu Dhabi (zone 2) is never a candidate for a Dubai driver
+        assert set(candidates.getrow(0).indices) == {0, 3}
+        assert 2 not in candidates.getrow(1).indices
+        assert candidates.getrow(2).nnz == 0
+
+    def test_cost_matrix_uses_travel_time_cache(self):
+        import numpy as np
+        from app.services.travel_time_service import TravelTimeCache, FakeMatrixProvider
+
+        service = AllocationService(db=None)
+        provider = FakeMatrixProvider(speed_kmh=30.0, detour_factor=1.3)
+        service.travel_time_cache = TravelTimeCache(provider=provider, redis=None)
+
+        drivers = [MockDriver("d1", lat=25.08, lon=55.14), MockDriver("d2", lat=25.20, lon=55.27)]
+        zones = [
+            Zone(zone_id="A", centroid=WKTElement('POINT(55.27 25.19)', srid=4326)),
+            Zone(zone_id="B", centroid=WKTElement('POINT(55.14 25.09)', srid=4326)),
+        ]
+
+        first = service._build_cost_matrix(drivers, zones).toarray()
+        second = service._build_cost_matrix(drivers, zones).toarray()
+
+        haversine = np.array([[service._get_travel_time(d, z) for z in zones] for d in drivers])
+        # Fake road times are 1.3x the distance at 30 instead of 45 km/h
+        assert np.allclose(first, haversine * 1.3 * 45 / 30, rtol=0.05)
+        assert np.array_equal(first, second)
+        assert provider.calls == 1
+
+    def test_apply_assignments_single_bulk_update(self):
+        from unittest.mock import MagicMock, patch
+        from sqlalchemy.dialects import postgresql
+
+        db = MagicMock()
+        db.query.return_value.filter.return_value.all.return_value = [("d1", "B"), ("d2", None)]
+        service = AllocationService(db=db)
+        zones = [
+            Zone(zone_id="A", name="Marina", centroid=WKTElement('POINT(55.14 25.08)', srid=4326)),
+            Zone(zone_id="B", name="Downtown", centroid=None),
+        ]
+
+        with patch("app.services.allocation_service.kafka_producer") as producer, \
+             patch("app.services.allocation_service.emit_sync") as emit, \
+             patch("app.services.allocation_service.socket_manager") as sockets:
+            service._apply_assignments([("d1", "A"), ("d2", "B"), ("ghost", "A")], zones)
+
+        assert db.execute.call_count == 1
+        sql = str(db.execute.call_args[0][0].compile(dialect=postgresql.dialect()))
+        assert sql.startswith("UPDATE drivers SET current_zone=moved.zone_id")
+        assert "FROM (VALUES" in sql and "WHERE drivers.driver_id = moved.driver_id" in sql
+        db.commit.assert_called_once()
+
+        events = producer.publish_batch.call_args[0][1]
+        assert [(e["driver_id"], e["old_zone"], e["new_zone"]) for e in events] == [("d1", "B", "A"), ("d2", None, "B")]
+
+        emit.assert_called_once()
+        notified = sockets.notify_driver_allocations.call_args[0][0]
+        assert notified[0] == {"driver_id": "d1", "zone_id": "A", "zone_lat": 25.08, "zone_lon": 55.14, "zone_name": "Marina"}
+        assert notified[1]["zone_lat"] is None and notified[1]["zone_name"] == "Downtown"
+
+    def test_incremental_reallocation_skips_without_dirty_zones(self):
+        from unittest.mock import MagicMock, patch
+
+        db = MagicMock()
+        service = AllocationService(db=db)
+        with patch("app.services.allocation_service.zone_pressure_tracker") as tracker:
+            tracker.age_seconds.return_value = 1.0
+            tracker.pop_dirty.return_value = set()
+            result = service.incremental_reallocation()
+
+        assert result["status"] == "skipped"
+        tracker.seed.assert_not_called()
+        db.query.assert_not_called()
+
+    def test_allocate_driver_uses_zone_index_without_db_reads(self):
+        import time
+        from unittest.mock import MagicMock, patch
+        from app.services.zone_pressure_service import ZoneIndexView
+        import numpy as np
+
+        view = ZoneIndexView(
+            ["near", "busy_far", "quiet"], ["Marina", "Deira", None],
+            np.array([25.08, 25.27, 25.20]), np.array([55.14, 55.31, 55.27]),
+            available=np.array([1.0, 0.0, 4.0]), pending=np.array([3.0, 9.0, 0.0]), recent=np.zeros(3),
+            driver_capacity=1.5, seeded_at=time.time()
+        )
+        db = MagicMock()
+        service = AllocationService(db=db)
+        driver = MockDriver("d1", lat=25.081, lon=55.141)
+        driver.duty_status, driver.status, driver.current_zone = "on_duty", "available", None
+
+        with patch("app.services.allocation_service.zone_pressure_index") as index, \
+             patch("app.services.allocation_service.emit_sync"), \
+             patch("app.services.allocation_service.socket_manager") as sockets:
+            index.read.return_value = view
+            result = service.allocate_driver("d1", driver)
+
+        # "busy_far" has the highest pressure but is ~20 minutes away
+        assert result == {"status": "ok", "zone_id": "near"}
+        assert driver.current_zone == "near"
+        db.query.assert_not_called()
+        sockets.notify_driver_allocation.assert_called_once_with("d1", "near", 25.08, 55.14, "Marina")
+
+    def test_forecast_demand_per_zone_with_fallback(self):
+        from unittest.mock import MagicMock
+
+        service = AllocationService(db=None)
+        service.forecasting_service = MagicMock()
+        service.forecasting_service.get_zone_forecasts.return_value = {"A": 7.5, "B": 0.0}
+
+        zones = [Zone(zone_id="A"), Zone(zone_id="B"), Zone(zone_id="C", demand_score=0.4)]
+        demand = service._get_forecast_demand(zones)
+
+        assert demand == {"A": 7.5, "B": 0.0, "C": 4.0}
+        service.forecasting_service.get_demand_forecast.assert_not_called()
+        _, kwargs = service.forecasting_service.get_zone_forecasts.call_args
+        assert kwargs["max_age_minutes"] == AllocationService.FORECAST_MAX_AGE_MINUTES
@@ -0,0 +1,130 @@
+import numpy as np
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+from app.models.gps_track import GPSTrack
+from app.optimization.cost_matrix import haversine_km
+from app.schemas.sensor import LocationData
+from app.services.distance_tracking_service import DistanceTrackingService, LastPoint, LastPointCache, chain_distances
+from tests.fakes import MockRedis
+
+T0 = datetime(2026, 3, 1, 8, 0, 0)
+
+def fix(lat, lng, seconds):
+    return LocationData(latitude=lat, longitude=lng, speed=30.0, timestamp=T0 + timedelta(seconds=seconds))
+
+def one_at_a_time(points, last=None):
+    """What record_gps_point stores for each point when they arrive individually"""
+    stored = [last] if last else []
+    out = []
+    for p in points:
+        prev = max(stored, key=lambda t: t.recorded_at) if stored else None
+        segment = float(haversine_km(prev.latitude, prev.longitude, p.latitude, p.longitude)) if prev else 0.0
+        cumulative = (prev.cumulative_distance if prev else 0.0) + segment
+        stored.insert(0, GPSTrack(latitude=p.latitude, longitude=p.longitude, recorded_at=p.timestamp, cumulative_distance=cumulative))
+        out.append((segment, cumulative))
+    return out
+
+def run_batch(points, last=None):
+    epoch = np.array([(p.timestamp - datetime(1970, 1, 1)).total_seconds() for p in points])
+    segment, cumulative = chain_distances(
+        np.array([p.latitude for p in points]), np.array([p.longitude for p in points]), epoch, last
+    )
+    return list(zip(segment.tolist(), cumulative.tolist()))
+
+class TestChainDistances:
+
+    def test_matches_per_point_ingestion_in_order(self):
+        last = GPSTrack(latitude=25.07, longitude=55.13, recorded_at=T0 - timedelta(seconds=10), cumulative_distance=4.2)
+        points = [fix(25.08 + i * 0.001, 55.14 + i * 0.0015, i * 5) for i in range(20)]
+        assert np.allclose(run_batch(points, last), one_at_a_time(points, last), rtol=0, atol=1e-12)
+
+    def test_matches_per_point_ingestion_out_of_order(self):
+        points = [fix(25.080, 55.140, 0), fix(25.085, 55.145, 10), fix(25.082, 55.142, 5), fix(25.090, 55.150, 10), fix(25.095, 55.155, 20)]
+        batch = run_batch(points)
+        assert np.allclose(batch, one_at_a_time(points), rtol=0, atol=1e-12)
+        assert batch[0] == (0.0, 0.0)
+
+class TestRecordGpsPoints:
+
+    def test_single_insert_and_one_commit(self):
+        db = MagicMock()
+        db.query.return_value.filter.return_value.order_by.return_value.first.return_value = None
+        db.get.return_value.status = "offline"
+        db.get.return_value.duty_status = "on_duty"
+        points = [fix(25.08, 55.14, 0), fix(25.09, 55.15, 30)]
+
+        with patch("app.services.distance_tracking_service.location_write_behind") as ingest, \
+             patch("app.services.distance_tracking_service.last_point_cache", LastPointCache(redis=MockRedis())), \
+             patch("app.services.distance_tracking_service.gps_track_maintenance"), \
+             patch("app.services.distance_tracking_service.refresh_driver_eta") as eta:
+            result = DistanceTrackingService(db).record_gps_points("d1", "s1", points)
+
+        rows = db.execute.call_args[0][1]
+        assert db.execute.call_count == 1 and len(rows) == 2
+        assert rows[1]["cumulative_distance"] == result["cumulative_distance_km"] > 1.4
+        db.commit.assert_called_once()
+        assert db.get.return_value.status == "available"
+        assert ingest.ingest.call_args[0][2:4] == (25.09, 55.15)
+        eta.assert_called_once()
+
+    def test_per_point_path_uses_the_same_distance(self):
+        db = MagicMock()
+        db.query.return_value.filter.return_value.order_by.return_value.first.return_value = GPSTrack(
+            latitude=25.08, longitude=55.14, recorded_at=T0, cumulative_distance=1.0
+        )
+        db.query.return_value.filter.return_value.first.return_value = None
+
+        with patch("app.services.distance_tracking_service.last_point_cache", LastPointCache(redis=MockRedis())), \
+             patch("app.services.distance_tracking_service.gps_track_maintenance"), \
+             patch("app.services.distance_tracking_service.refresh_driver_eta"):
+            track = DistanceTrackingService(db).record_gps_point("d1", "s1", fix(25.09, 55.15, 30))
+
+        expected = run_batch([fix(25.09, 55.15, 30)], GPSTrack(latitude=25.08, longitude=55.14, recorded_at=T0, cumulative_distance=1.0))
+        assert (track.distance_from_last, track.cumulative_distance) == expected[0]
+
+class TestLastPointCache:
+
+    def test_only_a_cold_session_reads_gps_tracks(self):
+        db = MagicMock()
+        db.query.return_value.filter.return_value.order_by.return_value.first.return_value = None
+        db.query.return_value.filter.return_value.first.return_value = None
+        cache = LastPointCache(redis=MockRedis())
+        points = [fix(25.08, 55.14, 0), fix(25.09, 55.15, 30), fix(25.085, 55.145, 10), fix(25.10, 55.16, 60)]
+
+        tracks = []
+        with patch("app.services.distance_tracking_service.last_point_cache", cache), \
+             patch("app.services.distance_tracking_service.gps_track_maintenance"), \
+             patch("app.services.distance_tracking_service.refresh_driver_eta"):
+            for p in points:
+                tracks.append(DistanceTrackingService(db).record_gps_point("d1", "s1", p))
+
+        # One order_by(...).first() for the cold start; the rest come from the cache
+        assert db.query.return_value.filter.return_value.order_by.call_count == 1
+        assert [(t.distance_from_last, t.cumulative_distance) for t in tracks] == run_batch(points)
+        assert cache.get("d1", "s1").recorded_at == T0 + timedelta(seconds=60)
+
+    def test_batch_resumes_from_cached_tail(self):
+        cache = LastPointCache(redis=MockRedis())
+        db = MagicMock()
+        db.query.return_value.filter.return_value.order_by.return_value.first.return_value = None
+        with patch("app.services.distance_tracking_service.last_point_cache", cache), \
+             patch("app.services.distance_tracking_service.location_write_behind"), \
+             patch("app.services.distance_tracking_service.gps_track_maintenance"), \
+             patch("app.services.distance_tracking_service.refresh_driver_eta"):
+            first = DistanceTrackingService(db).record_gps_points("d1", "s1", [fix(25.08, 55.14, 0), fix(25.09, 55.15, 30)])
+            second = DistanceTrackingService(db).record_gps_points("d1", "s1", [fix(25.10, 55.16, 60)])
+
+        assert db.query.return_value.filter.return_value.order_by.call_count == 1
+        expected = run_batch([fix(25.08, 55.14, 0), fix(25.09, 55.15, 30), fix(25.10, 55.16, 60)])
+        assert second["cumulative_distance_km"] == expected[-1][1] > first["cumulative_distance_km"]
+
+    def test_older_tail_never_replaces_newer_one(self):
+        cache = LastPointCache(redis=MockRedis())
+        newer = LastPoint(25.10, 55.16, T0 + timedelta(seconds=60), 2.5)
+        older = LastPoint(25.09, 55.15, T0 + timedelta(seconds=30), 1.2)
+
+        # Two workers commit out of order; each only knew the tail it read before its insert
+        assert cache.put("d1", "s1", newer)
+        assert not cache.put("d1", "s1", older)
+        assert cache.get("d1", "s1") == newer
+        assert cache.put("d1", "s1", newer._replace(cumulative_distance=2.6))
@@ -0,0 +1,87 @@
+from unittest.mock import MagicMock, patch
+from sqlalchemy import inspect
+from sqlalchemy.orm.attributes import set_committed_value
+from app.models.driver import Driver
+from app.models.order import Order
+from app.services.driver_capacity_service import order_count_deltas, _apply_order_count_deltas
+from app.services.order_service import OrderService
+
+def loaded_order(order_id, driver_id, status):
+    """An Order whose current values look like they came from the database"""
+    order = Order(order_id=order_id)
+    set_committed_value(order, "driver_id", driver_id)
+    set_committed_value(order, "status", status)
+    return order
+
+def flushing_session(new=(), dirty=(), deleted=()):
+    session = MagicMock()
+    session.new, session.dirty, session.deleted = list(new), list(dirty), list(deleted)
+    session.identity_map = {}
+    return session
+
+class TestOrderCountDeltas:
+
+    def test_lifecycle_transitions(self):
+        offered = loaded_order("o1", "d1", "offered")
+        offered.status = "assigned"
+        broadcast = loaded_order("o2", None, "offered")
+        broadcast.driver_id, broadcast.status = "d2", "assigned"
+        delivered = loaded_order("o3", "d1", "picked_up")
+        delivered.status = "delivered"
+        picked = loaded_order("o4", "d2", "assigned")
+        picked.status = "picked_up"
+        new_offer = Order(order_id="o5", driver_id="d3", status="offered")
+
+        deltas = order_count_deltas(flushing_session(new=[new_offer], dirty=[offered, broadcast, delivered, picked]))
+
+        # d1: offer accepted (+1 active, -1 offered) and one delivery (-1 active)
+        assert deltas["d1"] == {"active_orders": 0, "offered_orders": -1}
+        assert deltas["d2"] == {"active_orders": 1, "offered_orders": 0}
+        assert deltas["d3"] == {"active_orders": 0, "offered_orders": 1}
+
+    def test_reassignment_and_unchanged_orders(self):
+        rescued = loaded_order("o1", "d1", "picked_up")
+        rescued.driver_id, rescued.status = None, "pending"
+        untouched = loaded_order("o2", "d2", "assigned")
+        untouched.price = 12.0
+
+        deltas = order_count_deltas(flushing_session(dirty=[rescued, untouched]))
+
+        assert deltas == {"d1": {"active_orders": -1, "offered_orders": 0}}
+
+class TestCounterListener:
+
+    def test_applies_all_deltas_in_one_statement_and_updates_loaded_drivers(self):
+        offered = loaded_order("o1", "d1", "offered")
+        offered.status = "assigned"
+        session = flushing_session(new=[Order(order_id="o2", driver_id="d2", status="assigned")], dirty=[offered])
+        driver = Driver(driver_id="d1")
+        set_committed_value(driver, "active_orders", 1)
+        session.identity_map = {inspect(Driver).identity_key_from_primary_key(("d1",)): driver}
+
+        _apply_order_count_deltas(session, None)
+
+        statement, params = session.connection.return_value.execute.call_args[0]
+        assert sorted(p["b_driver_id"] for p in params) == ["d1", "d2"]
+        assert driver.active_orders == 2
+        assert not inspect(driver).attrs.active_orders.history.has_changes()
+
+    def test_no_order_changes_skip_the_update(self):
+        session = flushing_session(new=[Driver(driver_id="d1")])
+        _apply_order_count_deltas(session, None)
+        session.connection.assert_not_called()
+
+def test_capacity_lookup_without_geo_index_is_a_single_query():
+    db = MagicMock()
+    query = db.query.return_value
+    query.filter.return_value = query
+    query.order_by.return_value.limit.return_value.all.return_value = [
+        (Driver(driver_id="d1", name="A", status="available", rating=4.5, current_zone="z1"), 120.0, 25.1, 55.2)
+    ]
+
+    with patch("app.services.driver_service.driver_geo_index") as index:
+        index.nearby.return_value = None
+        drivers = OrderService(db)._get_drivers_with_capacity(25.1, 55.2, exclude_driver_ids=["d9"])
+
+    assert [d.driver_id for d in drivers] == ["d1"]
+    assert db.query.call_count == 1
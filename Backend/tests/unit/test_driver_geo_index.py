@@ -0,0 +1,96 @@
+from types import SimpleNamespace
+import redis as redis_lib
+from unittest.mock import MagicMock, patch
+from sqlalchemy.orm.attributes import set_committed_value
+from geoalchemy2.elements import WKTElement
+from app.models.driver import Driver
+from app.services.driver_geo_service import DriverGeoIndex, _collect_driver_positions, _apply_driver_positions
+from app.services.driver_service import DriverService
+from tests.fakes import MockRedis
+
+def point(lat, lng):
+    return WKTElement(f"POINT({lng} {lat})", srid=4326)
+
+def seeded_index(rows):
+    db = MagicMock()
+    db.query.return_value.filter.return_value.all.return_value = [
+        SimpleNamespace(driver_id=driver_id, status=status, location=point(lat, lng)) for driver_id, status, lat, lng in rows
+    ]
+    index = DriverGeoIndex(redis=MockRedis())
+    assert index.rebuild(db)
+    return index
+
+class TestDriverGeoIndex:
+
+    def test_cold_index_rebuilds_once_from_postgis(self):
+        db = MagicMock()
+        db.query.return_value.filter.return_value.all.return_value = [
+            SimpleNamespace(driver_id="d1", status="available", location=point(25.080, 55.140)),
+            SimpleNamespace(driver_id="d2", status="busy", location=point(25.085, 55.145)),
+        ]
+        index = DriverGeoIndex(redis=MockRedis())
+
+        found = index.nearby(db, 25.08, 55.14, 2.0, ["available", "busy"])
+        assert [hit[0] for hit in found] == ["d1", "d2"]
+        assert found[1][1] > 500 and abs(found[1][2] - 25.085) < 1e-9
+        index.nearby(db, 25.08, 55.14, 2.0)
+        assert db.query.call_count == 1
+
+    def test_status_partitions_and_moves(self):
+        index = seeded_index([("d1", "available", 25.08, 55.14), ("d2", "available", 25.09, 55.15)])
+
+        index.upsert("d1", "busy", 25.081, 55.141)
+        assert [hit[0] for hit in index.nearby(None, 25.08, 55.14, 5.0, ["available"])] == ["d2"]
+        assert [hit[0] for hit in index.nearby(None, 25.08, 55.14, 5.0, ["busy"])] == ["d1"]
+
+        index.apply([("d2", None, None, None)])
+        assert [(hit[0], hit[2], hit[3]) for hit in index.nearby(None, 25.08, 55.14, 5.0)] == [("d1", 25.081, 55.141)]
+
+    def test_radius_and_count(self):
+        index = seeded_index([("near", "available", 25.080, 55.140), ("mid", "busy", 25.090, 55.150), ("far", "available", 25.300, 55.400)])
+
+        assert [hit[0] for hit in index.nearby(None, 25.08, 55.14, 5.0, count=1)] == ["near"]
+        assert [hit[0] for hit in index.nearby(None, 25.08, 55.14, 5.0)] == ["near", "mid"]
+
+    def test_redis_errors_mean_fall_back(self):
+        redis = MagicMock()
+        redis.pipeline.return_value.execute.side_effect = redis_lib.exceptions.ConnectionError("down")
+        assert DriverGeoIndex(redis=redis).nearby(MagicMock(), 25.08, 55.14, 5.0) is None
+
+class TestSessionHooks:
+
+    def test_committed_status_and_location_changes_reach_the_index(self):
+        moved = Driver(driver_id="d1")
+        set_committed_value(moved, "status", "available")
+        set_committed_value(moved, "location", point(25.08, 55.14))
+        moved.status = "on_break"
+        untouched = Driver(driver_id="d2")
+        set_committed_value(untouched, "status", "available")
+        untouched.rating = 4.0
+        session = MagicMock()
+        session.info = {}
+        session.new, session.dirty, session.deleted = [Driver(driver_id="d3", status="available", location=point(25.1, 55.2))], [moved, untouched], []
+
+        index = seeded_index([("d1", "available", 25.08, 55.14)])
+        with patch("app.services.driver_geo_service.driver_geo_index", index):
+            _collect_driver_positions(session, None)
+            _apply_driver_positions(session)
+
+        assert index.nearby(None, 25.08, 55.14, 5.0, ["available"]) == []
+        assert [hit[0] for hit in index.nearby(None, 25.08, 55.14, 50.0)] == ["d1", "d3"]
+        assert "driver_geo_changes" not in session.info
+
+def test_capacity_lookup_loads_index_hits_by_key_and_widens_when_short():
+    db = MagicMock()
+    db.query.return_value.filter.return_value.all.side_effect = [
+        [Driver(driver_id="d1", name="A", status="available", rating=4.5)],
+        [Driver(driver_id="d1", name="A", status="available", rating=4.5), Driver(driver_id="d4", name="B", status="busy", rating=4.0)],
+    ]
+    hits = [("d1", 100.0, 25.08, 55.14), ("d2", 200.0, 25.08, 55.14), ("d3", 300.0, 25.08, 55.14)]
+    with patch("app.services.driver_service.driver_geo_index") as index:
+        index.nearby.side_effect = [hits, hits + [("d4", 900.0, 25.09, 55.15)]]
+        with patch.object(DriverService, "CAPACITY_OVERSAMPLE", 1):
+            drivers = DriverService(db).get_nearby_drivers_with_capacity(25.08, 55.14, 10.0, max_orders=3, limit=2, exclude_driver_ids=["d9"])
+
+    assert [(d.driver_id, d.distance_meters) for d in drivers] == [("d1", 100.0), ("d4", 900.0)]
+    assert index.nearby.call_args_list[0].kwargs["count"] == 3
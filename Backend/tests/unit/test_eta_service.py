@@ -0,0 +1,119 @@
+import numpy as np
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+from app.models.assignment import Assignment
+from app.models.order import Order
+from app.optimization.polyline import encode_polyline
+from app.services.eta_service import EtaTracker, RouteProgress, load_active_route, refresh_driver_eta
+
+NOW = datetime(2026, 1, 5, 12, 0)
+
+# Straight road heading north, ~1.1 km per vertex; 10 minutes end to end
+LATS = 25.10 + np.arange(5) * 0.01
+LNGS = np.full(5, 55.20)
+POLYLINE = encode_polyline(LATS, LNGS)
+STOPS = [("o-1", "pickup", LATS[1], LNGS[1]), ("o-1", "dropoff", LATS[4], LNGS[4])]
+
+def make_route(assignment_id="a-1"):
+    return RouteProgress.build(assignment_id, POLYLINE, 10.0, STOPS)
+
+class TestRouteProgress:
+
+    def test_stop_offsets_and_interpolated_time(self):
+        route = make_route()
+        assert [kind for _, kind, _ in route.stops] == ["pickup", "dropoff"]
+        assert np.isclose(route.stops[1][2], route.cum_m[-1])
+        assert np.isclose(route.seconds_between(0.0, route.cum_m[-1]), 600.0)
+        assert np.isclose(route.seconds_between(route.cum_m[1], route.cum_m[3]), 300.0)
+
+    def test_advance_projects_and_flags_off_route(self):
+        route = make_route()
+        offset, off_route = route.advance(25.115, 55.2001)
+        assert np.isclose(offset, route.cum_m[1] * 1.5, rtol=0.01)
+        assert off_route < 20
+
+        _, off_route = route.advance(25.12, 55.22)
+        assert off_route > 1500
+
+    def test_without_polyline_uses_straight_legs_from_origin(self):
+        route = RouteProgress.build("a-2", "", 6.0, STOPS, origin=(LATS[0], LNGS[0]))
+        assert route.xy.shape == (3, 2)
+        assert np.isclose(route.seconds_between(0.0, route.cum_m[-1]), 360.0)
+
+class TestEtaTracker:
+
+    def test_pushes_only_when_eta_shifts_past_threshold(self):
+        tracker = EtaTracker(push_threshold_seconds=60)
+        tracker.track("d1", make_route())
+
+        _, route_eta, updates = tracker.observe("d1", LATS[0], LNGS[0], now=NOW)
+        assert [u["order_id"] for u in updates] == ["o-1"]
+        assert updates[0]["eta"] == NOW + timedelta(minutes=10)
+        assert route_eta == NOW + timedelta(minutes=10)
+
+        # Ten seconds later, right on schedule: nothing to push
+        _, _, updates = tracker.observe("d1", LATS[0] + 0.0004, LNGS[0], now=NOW + timedelta(seconds=10))
+        assert updates == []
+
+        # Stuck in traffic for five minutes at the same spot: ETA slips
+        _, _, updates = tracker.observe("d1", LATS[0] + 0.0004, LNGS[0], now=NOW + timedelta(minutes=5))
+        assert len(updates) == 1
+        assert updates[0]["remaining_min"] < 10
+
+    def test_off_route_adds_rejoin_time(self):
+        tracker = EtaTracker()
+        tracker.track("d1", make_route())
+        _, on_route_eta, _ = tracker.observe("d1", LATS[2], LNGS[2], now=NOW)
+        tracker.track("d1", make_route())
+        _, detour_eta, _ = tracker.observe("d1", LATS[2], LNGS[2] + 0.02, now=NOW)
+        assert (detour_eta - on_route_eta).total_seconds() > 300
+
+    def test_loader_runs_on_recheck_and_keeps_progress_for_same_assignment(self):
+        loader = MagicMock(side_effect=lambda driver_id: make_route())
+        tracker = EtaTracker(recheck_seconds=0)
+
+        tracker.observe("d1", LATS[3], LNGS[3], now=NOW, loader=loader)
+        tracker.observe("d1", LATS[3], LNGS[3], now=NOW, loader=loader)
+        assert loader.call_count == 2
+        assert tracker.route_for("d1").segment == 3
+
+        loader.side_effect = lambda driver_id: None
+        route, _, updates = tracker.observe("d1", LATS[3], LNGS[3], now=NOW, loader=loader)
+        assert route is None and updates == []
+
+class TestEtaPersistence:
+
+    def test_load_active_route_follows_optimized_sequence(self):
+        db = MagicMock()
+        assignment = Assignment(
+            assignment_id="a-1", route_polyline=POLYLINE, estimated_time_min=10.0,
+            optimized_sequence=["pickup_o-1", "dropoff_o-1"]
+        )
+        order = Order(
+            order_id="o-1", pickup_latitude=LATS[1], pickup_longitude=LNGS[1],
+            dropoff_latitude=LATS[4], dropoff_longitude=LNGS[4]
+        )
+        db.query.return_value.filter.return_value.order_by.return_value.first.return_value = assignment
+        db.query.return_value.filter.return_value.all.return_value = [order]
+
+        route = load_active_route(db, "d1")
+        assert route.assignment_id == "a-1"
+        assert [(order_id, kind) for order_id, kind, _ in route.stops] == [("o-1", "pickup"), ("o-1", "dropoff")]
+
+    def test_refresh_persists_and_emits_only_on_change(self):
+        db = MagicMock()
+        tracker = EtaTracker()
+        tracker.track("d1", make_route())
+
+        with patch("app.services.eta_service.eta_tracker", tracker), \
+             patch("app.services.eta_service.load_active_route", return_value=None), \
+             patch("app.services.eta_service.emit_sync") as emit, \
+             patch("app.services.eta_service.socket_manager") as sockets:
+            tracker._drivers["d1"].checked_at = float("inf")
+            first = refresh_driver_eta(db, "d1", LATS[0], LNGS[0], now=NOW)
+            again = refresh_driver_eta(db, "d1", LATS[0], LNGS[0], now=NOW + timedelta(seconds=5))
+
+        assert len(first) == 1 and again == []
+        db.commit.assert_called_once()
+        emit.assert_called_once()
+        assert sockets.notify_order_updates.call_args[0][0][0][0] == "o-1"
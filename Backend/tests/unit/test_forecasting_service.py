@@ -96,3 +96,23 @@ class TestForecastingService:
         # Test empty zones protection
         sum_empty = service._aggregate_city_wide_prediction(zone_preds, time_index=0, zones=["GhostTown"], local_hour=0)
         assert sum_empty == 0.0
+
+    def test_get_zone_forecasts_single_latest_per_zone_query(self):
+        from unittest.mock import patch
+        from sqlalchemy.orm import Session
+        from sqlalchemy.dialects import postgresql
+
+        session = Session()
+        captured = {}
+        def fake_all(query):
+            captured["sql"] = str(query.statement.compile(dialect=postgresql.dialect()))
+            return [("A", 12.0), ("B", 0.0)]
+
+        service = ForecastingService(db=session)
+        with patch("sqlalchemy.orm.Query.all", fake_all):
+            result = service.get_zone_forecasts(["A", "B", "C"], horizon_minutes=30, max_age_minutes=15)
+
+        assert result == {"A": 12.0, "B": 0.0}
+        assert "DISTINCT ON (demand_forecasts.zone_id)" in captured["sql"]
+        assert "ORDER BY demand_forecasts.zone_id, demand_forecasts.created_at DESC" in captured["sql"]
+        assert service.get_zone_forecasts([]) == {}
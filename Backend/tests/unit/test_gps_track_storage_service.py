@@ -0,0 +1,148 @@
+import numpy as np
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+from app.services.distance_tracking_service import DistanceTrackingService
+from app.services.gps_track_storage_service import (
+    downsample_track, compact_partition, run_maintenance, partition_name, ensure_partitions, prepare_partitions,
+    PARTITION_AHEAD_DAYS
+)
+
+DAY = date(2026, 3, 1)
+T0 = datetime(2026, 3, 1, 8, 0, 0)
+
+def session_rows(driver_id, session_id, n, step_s=5):
+    # An L-shaped drive: east for the first half, then north
+    rows = []
+    for i in range(n):
+        east, north = min(i, n // 2), max(0, i - n // 2)
+        rows.append(SimpleNamespace(
+            track_id=f"{session_id}-{i}", driver_id=driver_id, session_id=session_id,
+            latitude=25.08 + north * 0.0002, longitude=55.14 + east * 0.0002,
+            speed=40.0, recorded_at=T0 + timedelta(seconds=i * step_s)
+        ))
+    return rows
+
+class TestDownsampleTrack:
+
+    def test_keeps_corners_endpoints_time_floor_and_fastest_point(self):
+        rows = session_rows("d1", "s1", 120)
+        speed = np.full(120, 40.0)
+        speed[37] = 95.0
+        epoch = np.array([(r.recorded_at - datetime(1970, 1, 1)).total_seconds() for r in rows])
+
+        keep = downsample_track(
+            np.array([r.latitude for r in rows]), np.array([r.longitude for r in rows]), epoch, speed
+        )
+
+        assert keep[0] and keep[-1] and keep[60] and keep[37]
+        assert keep[::12].all()  # 5 s samples, one per minute
+        assert keep.sum() <= 14
+
+    def test_missing_speeds_and_empty_tracks(self):
+        assert downsample_track(np.array([25.0, 25.1]), np.array([55.0, 55.1]), np.array([0.0, 5.0]), np.array([np.nan, np.nan])).all()
+        assert downsample_track(np.empty(0), np.empty(0), np.empty(0), np.empty(0)).size == 0
+
+class TestCompactPartition:
+
+    def test_sessions_spanning_chunks_are_compacted_whole_and_swapped_in(self):
+        rows = session_rows("d1", "s1", 120) + session_rows("d2", "s2", 30)
+        db = MagicMock()
+        db.execute.return_value.partitions.return_value = [rows[:100], rows[100:]]
+
+        with patch("app.services.gps_track_storage_service.COMPACT_CHUNK_ROWS", 5):
+            raw, kept = compact_partition(db, DAY)
+
+        assert raw == 150 and kept < 30
+        statements = [str(c.args[0]) for c in db.execute.call_args_list]
+        inserts = [c.args[1]["ids"] for c in db.execute.call_args_list if "INSERT INTO" in str(c.args[0])]
+        assert sum(len(ids) for ids in inserts) == kept
+        # No statement mixes part of one session with another
+        assert all(len({i.split("-")[0] for i in ids}) == 1 for ids in inserts)
+        name = partition_name(DAY)
+        swap = [s for s in statements if "ALTER TABLE" in s or s.startswith("DROP TABLE " + name)]
+        assert swap[1:] == [
+            f"ALTER TABLE gps_tracks DETACH PARTITION {name}",
+            f"DROP TABLE {name}",
+            f"ALTER TABLE {name}_c RENAME TO {name}",
+            f"ALTER TABLE gps_tracks ATTACH PARTITION {name} FOR VALUES FROM ('2026-03-01') TO ('2026-03-02')",
+        ]
+
+def catalog_db(existing):
+    """MagicMock session whose to_regclass lookups only find the tables in existing"""
+    db = MagicMock()
+
+    def execute(statement, params=None):
+        result = MagicMock()
+        if "to_regclass" in str(statement):
+            result.scalar.return_value = params["name"] if params["name"] in existing else None
+        return result
+    db.execute.side_effect = execute
+    return db
+
+def sql_of(db):
+    return [str(c.args[0]) for c in db.execute.call_args_list if "to_regclass" not in str(c.args[0])]
+
+class TestPartitions:
+
+    def test_missing_days_take_their_rows_from_the_default_partition(self):
+        db = catalog_db({partition_name(DAY)})
+        ensure_partitions(db, DAY, days=2)
+
+        name = partition_name(DAY + timedelta(days=1))
+        ddl = [s for s in sql_of(db) if "INSERT INTO gps_track_partitions" not in s]
+        assert ddl[0] == "CREATE TABLE IF NOT EXISTS gps_tracks_default PARTITION OF gps_tracks DEFAULT"
+        assert ddl[1] == f"CREATE TABLE {name} (LIKE gps_tracks INCLUDING DEFAULTS)"
+        assert ddl[2].startswith(
+            "WITH moved AS (DELETE FROM gps_tracks_default WHERE recorded_at >= '2026-03-02' AND recorded_at < '2026-03-03'"
+        )
+        assert f"INSERT INTO {name} (" in ddl[2]
+        assert ddl[-1] == f"ALTER TABLE gps_tracks ATTACH PARTITION {name} FOR VALUES FROM ('2026-03-02') TO ('2026-03-03')"
+        assert len(ddl) == 5
+
+    def test_first_use_creates_partitions_under_the_maintenance_lock(self):
+        ready = catalog_db({"gps_tracks_default", partition_name(DAY)})
+        assert prepare_partitions(ready, today=DAY) is False
+        assert sql_of(ready) == []
+
+        fresh = catalog_db(set())
+        assert prepare_partitions(fresh, today=DAY) is True
+        statements = sql_of(fresh)
+        assert "pg_advisory_xact_lock" in statements[0]
+        assert sum(s.startswith("CREATE TABLE gps_tracks_p") for s in statements) == PARTITION_AHEAD_DAYS + 1
+
+class TestRunMaintenance:
+
+    def test_other_worker_holding_the_lock_skips(self):
+        db = MagicMock()
+        db.get_bind.return_value.connect.return_value.execute.return_value.scalar.return_value = False
+        assert run_maintenance(db, today=DAY)["skipped"] is True
+        db.execute.assert_not_called()
+
+    def test_drops_expired_then_compacts_due_days(self):
+        db = MagicMock()
+        lock = db.get_bind.return_value.connect.return_value
+        lock.execute.return_value.scalar.return_value = True
+        db.query.return_value.filter.return_value.all.return_value = [(date(2025, 11, 1),)]
+        db.query.return_value.filter.return_value.order_by.return_value.all.return_value = [(date(2026, 2, 20),)]
+
+        with patch("app.services.gps_track_storage_service.compact_partition", return_value=(1000, 80)) as compact:
+            summary = run_maintenance(db, today=DAY)
+
+        assert summary["dropped"] == ["2025-11-01"]
+        assert summary["compacted"] == [{"day": "2026-02-20", "raw_points": 1000, "kept_points": 80}]
+        compact.assert_called_once_with(db, date(2026, 2, 20))
+        assert "pg_advisory_unlock" in str(lock.execute.call_args_list[-1].args[0])
+        lock.close.assert_called_once()
+
+def test_session_stats_come_from_one_aggregate_query():
+    db = MagicMock()
+    db.query.return_value.filter.return_value.one.return_value = SimpleNamespace(
+        points=240, start_time=T0, end_time=T0 + timedelta(minutes=30),
+        total_km=12.5, avg_speed=31.0, max_speed=74.0
+    )
+
+    stats = DistanceTrackingService(db).compute_distance_stats("d1", "s1")
+
+    assert db.query.call_count == 1
+    assert (stats.total_distance_km, stats.total_duration_hours, stats.max_speed_kmh) == (12.5, 0.5, 74.0)
@@ -0,0 +1,61 @@
+import numpy as np
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+from geoalchemy2.elements import WKTElement
+from app.services.hot_zone_service import HotZones, HotZoneCache, build_hot_zones
+
+def zones(*points):
+    lat = np.array([p[0] for p in points])
+    lng = np.array([p[1] for p in points])
+    return HotZones([f"z{i}" for i in range(len(points))], [f"Zone {i}" for i in range(len(points))], lat, lng, np.arange(len(points), 0, -1.0))
+
+class TestHotZones:
+
+    def test_best_detour_picks_highest_demand_within_ratio(self):
+        origin, destination = (25.00, 55.00), (25.10, 55.00)
+        hot = zones((25.05, 55.30), (25.05, 55.01), (25.06, 55.00))
+
+        waypoint = hot.best_detour(origin, destination)
+
+        # z0 is far off the leg; z1 is the first acceptable zone in demand order
+        assert waypoint["zone_id"] == "z1"
+        assert waypoint["lat"] == 25.05 and waypoint["lng"] == 55.01
+        assert 0 < waypoint["detour_km"] < 1
+
+    def test_no_zone_within_ratio_or_empty(self):
+        assert zones((26.0, 56.0)).best_detour((25.0, 55.0), (25.1, 55.0)) is None
+        assert zones().best_detour((25.0, 55.0), (25.1, 55.0)) is None
+
+    def test_build_from_forecasts_keeps_demand_order(self):
+        db = MagicMock()
+        db.query.return_value.filter.return_value.group_by.return_value.order_by.return_value.limit.return_value.all.return_value = [
+            SimpleNamespace(zone_id="b", max_demand=9.0),
+            SimpleNamespace(zone_id="a", max_demand=4.0),
+        ]
+        db.query.return_value.filter.return_value.all.return_value = [
+            SimpleNamespace(zone_id="a", name="A", centroid=WKTElement("POINT(55.1 25.1)", srid=4326)),
+            SimpleNamespace(zone_id="b", name="B", centroid=WKTElement("POINT(55.2 25.2)", srid=4326)),
+        ]
+
+        hot = build_hot_zones(db)
+
+        assert hot.zone_ids == ["b", "a"]
+        assert np.allclose(hot.lat, [25.2, 25.1]) and np.allclose(hot.lng, [55.2, 55.1])
+        assert np.allclose(hot.demand, [9.0, 4.0])
+
+class TestHotZoneCache:
+
+    def test_serves_snapshot_without_querying_and_refreshes_stale_in_background(self):
+        cache = HotZoneCache(refresh_seconds=60)
+        snapshot = zones((25.0, 55.0))
+        db = MagicMock()
+
+        with patch("app.services.hot_zone_service.build_hot_zones", return_value=snapshot) as build:
+            assert cache.get(db) is snapshot
+            assert cache.get(db) is snapshot
+            assert build.call_count == 1
+
+            snapshot.built_at -= 120
+            with patch.object(cache, "_refresh_in_background") as background:
+                assert cache.get(db) is snapshot
+                background.assert_called_once()
@@ -0,0 +1,117 @@
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+from geoalchemy2.elements import WKTElement
+from app.models.driver import Driver
+from app.schemas.driver import LocationSchema
+from app.services.location_ingest_service import LocationWriteBehind
+from app.services.driver_service import DriverService
+from tests.fakes import MockRedis
+
+class CountingRedis(MockRedis):
+    pipelines = 0
+
+    def pipeline(self, transaction=True):
+        CountingRedis.pipelines += 1
+        return super().pipeline(transaction)
+
+def write_behind(db=None):
+    ingest = LocationWriteBehind(redis=CountingRedis(), session_factory=lambda: db or MagicMock())
+    ingest._ensure_flusher = lambda: None
+    return ingest
+
+class TestLocationWriteBehind:
+
+    def test_one_round_trip_per_fix_and_cached_speed_fills_gaps(self):
+        ingest = write_behind()
+        CountingRedis.pipelines = 0
+
+        assert ingest.ingest("d1", "available", 25.08, 55.14, speed=32.0, heading=90.0) == (32.0, 90.0)
+        assert ingest.ingest("d1", "available", 25.09, 55.15) == (32.0, 90.0)
+        assert CountingRedis.pipelines == 2
+        assert "d1" in ingest.redis.data["driver_geo:available"]
+
+    def test_flush_sends_newest_fix_per_driver_in_one_statement(self):
+        db = MagicMock()
+        ingest = write_behind(db)
+        ingest.ingest("d1", "available", 25.08, 55.14, speed=30.0)
+        ingest.ingest("d2", "busy", 25.20, 55.30)
+        ingest.ingest("d1", "available", 25.09, 55.15, heading=180.0)
+
+        assert ingest.flush() == 2
+        rows = db.execute.call_args[0][1]
+        d1 = next(r for r in rows if r["b_driver_id"] == "d1")
+        assert (d1["b_lat"], d1["b_lng"], d1["b_speed"], d1["b_heading"]) == (25.09, 55.15, 30.0, 180.0)
+        db.commit.assert_called_once()
+        assert ingest.pending() == 0 and ingest.flush() == 0
+
+    def test_failed_flush_keeps_fixes_without_overwriting_newer_ones(self):
+        db = MagicMock()
+        db.execute.side_effect = RuntimeError("connection reset")
+        ingest = write_behind(db)
+        ingest.ingest("d1", "available", 25.08, 55.14)
+        ingest.ingest("d2", "available", 25.20, 55.30)
+
+        assert ingest.flush() == 0
+        db.rollback.assert_called_once()
+        ingest.ingest("d1", "available", 25.10, 55.16)
+        assert ingest.pending() == 2
+        assert ingest._pending["d1"][:2] == (25.10, 55.16)
+
+def sqlite_drivers():
+    """Just the drivers columns the flush touches, with the two PostGIS functions it calls"""
+    engine = create_engine("sqlite://")
+
+    @event.listens_for(engine, "connect")
+    def _functions(dbapi_connection, connection_record):
+        dbapi_connection.create_function("ST_MakePoint", 2, lambda x, y: f"POINT({x} {y})")
+        dbapi_connection.create_function("ST_SetSRID", 2, lambda geom, srid: geom)
+
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE drivers (driver_id VARCHAR PRIMARY KEY, location VARCHAR, current_speed FLOAT, "
+            "heading FLOAT, location_updated_at DATETIME, updated_at DATETIME)"
+        ))
+        conn.execute(text("INSERT INTO drivers (driver_id, current_speed, heading) VALUES ('d1', 0, 0)"))
+    return engine
+
+def test_other_driver_writes_do_not_drop_buffered_fix():
+    engine = sqlite_drivers()
+    ingest = LocationWriteBehind(redis=MockRedis(), session_factory=sessionmaker(bind=engine))
+    ingest._ensure_flusher = lambda: None
+
+    ingest.ingest("d1", "available", 25.08, 55.14, speed=30.0)
+    # A telemetry update bumps updated_at after the fix was received
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE drivers SET updated_at = :now"), {"now": datetime.utcnow()})
+    assert ingest.flush() == 1
+
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT location, current_speed FROM drivers")).one() == ("POINT(55.14 25.08)", 30.0)
+
+    # A position stamped later than the buffered fix still wins
+    ingest.ingest("d1", "available", 25.20, 55.30)
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE drivers SET location = 'POINT(55.0 25.0)', location_updated_at = :now"), {"now": datetime.utcnow()})
+    ingest.flush()
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT location FROM drivers")).scalar() == "POINT(55.0 25.0)"
+
+def test_orm_location_writes_are_stamped():
+    driver = Driver(driver_id="d1")
+    driver.location = WKTElement("POINT(55.14 25.08)", srid=4326)
+    assert driver.location_updated_at is not None
+
+def test_update_location_does_not_touch_postgres():
+    db = MagicMock()
+    db.get.return_value.status = "available"
+    with patch("app.services.driver_service.location_write_behind") as ingest, \
+         patch("app.services.driver_service.kafka_producer") as kafka, \
+         patch("app.services.driver_service.refresh_driver_eta"):
+        ingest.ingest.return_value = (40.0, 12.0)
+        DriverService(db).update_location("d1", LocationSchema(latitude=25.08, longitude=55.14, speed=40.0))
+
+    db.commit.assert_not_called()
+    db.query.assert_not_called()
+    assert kafka.publish.call_args[0][1]["speed"] == 40.0
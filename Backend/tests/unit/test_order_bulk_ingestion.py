@@ -0,0 +1,114 @@
+import csv
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+from geoalchemy2.elements import WKTElement
+from shapely.geometry import Point, box
+from app.optimization.zone_index import ZoneIndex
+from app.schemas.order import OrderCreate
+from app.services.order_service import OrderService, enrich_order_routes, copy_orders, ORDER_COPY_COLUMNS
+
+def order_at(lat, lng):
+    return OrderCreate(
+        pickup_address="Pickup", pickup_latitude=lat, pickup_longitude=lng,
+        dropoff_address="Dropoff", dropoff_latitude=lat + 0.02, dropoff_longitude=lng + 0.02,
+        customer_name="C", customer_contact="000", restaurant_name="R", restaurant_contact="111", price=20.0
+    )
+
+def driver_row(driver_id, lat, lng, active=0, offered=0):
+    return SimpleNamespace(driver_id=driver_id, latitude=lat, longitude=lng, active_orders=active, offered_orders=offered)
+
+class TestCreateOrdersBulk:
+
+    def run_bulk(self, orders, drivers, auto_offer=True):
+        db = MagicMock()
+        db.query.return_value.filter.return_value.all.return_value = drivers
+        index = ZoneIndex(["marina"], [box(55.10, 25.05, 55.20, 25.12)], [Point(55.15, 25.08)])
+        with patch("app.services.order_service.zone_index_cache") as zones, \
+             patch("app.services.order_service.kafka_producer") as kafka, \
+             patch("app.services.order_service.emit_sync") as emit, \
+             patch("app.services.order_service.socket_manager") as sockets, \
+             patch("app.services.order_service.record_zone_pressure_changes") as pressure, \
+             patch("app.services.order_service.apply_order_count_deltas") as counters, \
+             patch("app.services.order_service.copy_orders") as copy:
+            zones.get.return_value = index
+            result = OrderService(db).create_orders_bulk(orders, auto_offer=auto_offer)
+        rows = copy.call_args[0][1]
+        return SimpleNamespace(
+            db=db, result=result, rows=rows, copy=copy, kafka=kafka, emit=emit, sockets=sockets,
+            pressure=pressure, deltas=counters.call_args[0][1]
+        )
+
+    def test_single_copy_with_zones_and_fallback_distance(self):
+        run = self.run_bulk([order_at(25.08, 55.14), order_at(25.30, 55.40)], [], auto_offer=False)
+
+        run.copy.assert_called_once()
+        run.db.commit.assert_called_once()
+        assert run.result["created"] == 2 and run.result["offered"] == 0
+        assert [r["pickup_zone"] for r in run.rows] == ["marina", "marina"]
+        assert all(r["status"] == "pending" and r["distance_km"] > 2 and r["delivery_fee"] > 7 for r in run.rows)
+        assert [r["order_id"] for r in run.rows] == run.result["order_ids"]
+        run.kafka.publish_batch.assert_called_once()
+        assert len(run.pressure.call_args[0][0]) == 2
+        run.emit.assert_not_called()
+
+    def test_matching_pass_respects_spare_capacity_and_radius(self):
+        orders = [order_at(25.080, 55.140), order_at(25.081, 55.141), order_at(25.082, 55.142), order_at(25.60, 55.90)]
+        drivers = [
+            driver_row("near", 25.080, 55.140, active=2),  # one slot left
+            driver_row("next", 25.090, 55.150),
+        ]
+
+        run = self.run_bulk(orders, drivers)
+
+        assert [r["driver_id"] for r in run.rows] == ["near", "next", "next", None]
+        assert [r["status"] for r in run.rows] == ["offered", "offered", "offered", "pending"]
+        assert run.rows[0]["pickup_time"] is not None
+        assert run.deltas == {
+            "near": {"active_orders": 0, "offered_orders": 1},
+            "next": {"active_orders": 0, "offered_orders": 2},
+        }
+        offers = run.sockets.notify_order_offers.call_args[0][0]
+        assert [driver_id for driver_id, _ in offers] == ["near", "next", "next"]
+
+def test_copy_orders_writes_csv_on_session_connection():
+    db = MagicMock()
+    cursor = db.connection.return_value.connection.cursor.return_value
+    sent = []
+    cursor.copy_expert.side_effect = lambda sql, buffer: sent.append((sql, buffer.read()))
+    row = {column: None for column in ORDER_COPY_COLUMNS}
+    row.update(
+        order_id="o1", pickup=WKTElement("POINT(55.14 25.08)", srid=4326), pickup_address="Shop 4, Marina Walk",
+        pickup_zone="", created_at=datetime(2026, 1, 5, 12, 0)
+    )
+
+    copy_orders(db, [row])
+
+    sql, data = sent[0]
+    assert sql.startswith("COPY orders (order_id, pickup, dropoff, pickup_address,")
+    values = dict(zip(ORDER_COPY_COLUMNS, next(csv.reader(data.splitlines()))))
+    assert values["pickup"] == "SRID=4326;POINT(55.14 25.08)"
+    assert values["pickup_address"] == "Shop 4, Marina Walk"
+    assert values["dropoff"] == "\\N" and values["pickup_zone"] == ""
+    assert values["created_at"] == "2026-01-05T12:00:00"
+    cursor.close.assert_called_once()
+
+def test_enrich_order_routes_updates_only_routed_orders():
+    db = MagicMock()
+    db.query.return_value.filter.return_value.all.return_value = [
+        SimpleNamespace(order_id="o1", pickup_latitude=25.1, pickup_longitude=55.1, dropoff_latitude=25.2, dropoff_longitude=55.2),
+        SimpleNamespace(order_id="o2", pickup_latitude=25.1, pickup_longitude=55.1, dropoff_latitude=25.3, dropoff_longitude=55.3),
+    ]
+    route = {"distanceMeters": 12400, "duration": "960s", "polyline": {"encodedPolyline": "abc"}}
+    with patch("app.services.order_service.SessionLocal", return_value=db), \
+         patch("app.services.order_service.routes_client") as client:
+        client.compute_routes.return_value = [route, RuntimeError("circuit open")]
+        assert enrich_order_routes(["o1", "o2"]) == 1
+
+    updates = db.execute.call_args[0][1]
+    assert updates == [{
+        "order_id": "o1", "distance_km": 12.4, "duration_min": 16.0,
+        "route_polyline": "abc", "delivery_fee": 21.88
+    }]
+    db.commit.assert_called_once()
+    db.close.assert_called_once()
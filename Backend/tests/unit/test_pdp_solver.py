@@ -0,0 +1,173 @@
+import itertools
+import numpy as np
+from unittest.mock import MagicMock, patch
+from geoalchemy2.elements import WKTElement
+from app.models.driver import Driver
+from app.models.order import Order
+from app.optimization.pdp_solver import solve_pdp, solve_multi_vehicle_pdp, route_cost, is_feasible, NO_PREDECESSOR
+from app.services.routing_service import RoutingEngine
+from app.services.order_service import OrderService
+from app.core.routes_client import RoutesProviderError
+
+def make_instance(n_pairs, n_free=0, asymmetric=False, seed=0):
+    """Random instance where node 2i+2 is the dropoff of pickup 2i+1; free nodes trail"""
+    rng = np.random.default_rng(seed)
+    n = 2 * n_pairs + n_free
+    points = rng.uniform(0.0, 10.0, size=(n + 1, 2))
+    dist = np.linalg.norm(points[:, None] - points[None, :], axis=2)
+    if asymmetric:
+        dist *= rng.uniform(1.0, 1.5, size=dist.shape)
+    predecessor = [NO_PREDECESSOR] * n
+    for i in range(n_pairs):
+        predecessor[2 * i + 1] = 2 * i + 1
+    return dist, predecessor
+
+def brute_force(dist, predecessor):
+    n = len(predecessor)
+    return min(
+        route_cost(dist, route)
+        for route in itertools.permutations(range(1, n + 1))
+        if is_feasible(route, predecessor)
+    )
+
+class TestSolvePdp:
+
+    def test_exact_matches_brute_force(self):
+        for seed in range(12):
+            dist, predecessor = make_instance(3, n_free=seed % 2, asymmetric=bool(seed % 3), seed=seed)
+            route, cost = solve_pdp(dist, predecessor)
+
+            assert sorted(route) == list(range(1, len(predecessor) + 1))
+            assert is_feasible(route, predecessor)
+            assert np.isclose(cost, brute_force(dist, predecessor))
+
+    def test_heuristic_is_feasible_and_close_to_optimal(self):
+        for seed in range(12):
+            dist, predecessor = make_instance(3, n_free=1, asymmetric=bool(seed % 2), seed=seed)
+            route, cost = solve_pdp(dist, predecessor, exact_max_nodes=0)
+
+            assert sorted(route) == list(range(1, len(predecessor) + 1))
+            assert is_feasible(route, predecessor)
+            assert cost <= brute_force(dist, predecessor) * 1.15
+
+    def test_large_batch_keeps_precedence(self):
+        dist, predecessor = make_instance(10, n_free=2, asymmetric=True)
+        route, cost = solve_pdp(dist, predecessor)
+
+        assert sorted(route) == list(range(1, 23))
+        assert is_feasible(route, predecessor)
+        assert np.isclose(cost, route_cost(dist, route))
+
+    def test_empty_and_single_node(self):
+        assert solve_pdp(np.zeros((1, 1)), []) == ([], 0.0)
+        assert solve_pdp(np.array([[0.0, 2.0], [2.0, 0.0]]), [NO_PREDECESSOR]) == ([1], 2.0)
+
+class TestSolveMultiVehiclePdp:
+
+    def line_instance(self):
+        # Points on a line: vehicles at 0 and 100, orders near each end
+        coords = np.array([0.0, 100.0, 1.0, 3.0, 99.0, 97.0, 2.0, 4.0])
+        dist = np.abs(coords[:, None] - coords[None, :])
+        return dist, [(2, 3), (4, 5), (6, 7)]
+
+    def test_orders_go_to_nearby_vehicle_within_capacity(self):
+        dist, pairs = self.line_instance()
+        routes, unassigned = solve_multi_vehicle_pdp(dist, [0, 1], pairs, capacities=[2, 2])
+
+        assert unassigned == []
+        assert sorted(routes[0]) == [2, 3, 6, 7]
+        assert routes[1] == [4, 5]
+        for route in routes:
+            for pickup, dropoff in pairs:
+                if pickup in route:
+                    assert route.index(pickup) < route.index(dropoff)
+
+    def test_capacity_and_insertion_cap_leave_orders_unassigned(self):
+        dist, pairs = self.line_instance()
+
+        routes, unassigned = solve_multi_vehicle_pdp(dist, [0, 1], pairs, capacities=[1, 0])
+        assert routes[1] == [] and len(routes[0]) == 2
+        assert len(unassigned) == 2
+
+        routes, unassigned = solve_multi_vehicle_pdp(dist, [0], pairs, capacities=[3], max_insertion_cost=10.0)
+        assert unassigned == [1]
+
+class TestRoutingPdpSequence:
+
+    def test_dropoff_without_pickup_is_unconstrained(self):
+        engine = RoutingEngine(MagicMock())
+        engine.travel_time_cache = MagicMock(provider=None)
+        nodes = [
+            {"id": "order-a", "type": "pickup", "lat": 25.30, "lng": 55.30},
+            {"id": "order-a", "type": "dropoff", "lat": 25.31, "lng": 55.31},
+            # Already picked up, and right next to the driver
+            {"id": "order-b", "type": "dropoff", "lat": 25.001, "lng": 55.001},
+        ]
+
+        sequence = engine._get_pdp_sequence((25.0, 55.0), nodes)
+
+        assert [(n["id"], n["type"]) for n in sequence] == [
+            ("order-b", "dropoff"), ("order-a", "pickup"), ("order-a", "dropoff")
+        ]
+
+class TestRoutingDispatchBatch:
+
+    def make_order(self, order_id, pickup, dropoff):
+        return Order(
+            order_id=order_id, status="pending",
+            pickup_latitude=pickup[0], pickup_longitude=pickup[1],
+            dropoff_latitude=dropoff[0], dropoff_longitude=dropoff[1]
+        )
+
+    def test_single_solve_and_single_commit(self):
+        db = MagicMock()
+        engine = RoutingEngine(db)
+        engine.routes_client = MagicMock()
+        engine.routes_client.compute_routes.side_effect = lambda requests: [RoutesProviderError("down")] * len(requests)
+        drivers = [
+            Driver(driver_id="north", status="available", location=WKTElement("POINT(55.20 25.20)", srid=4326)),
+            Driver(driver_id="south", status="busy", location=WKTElement("POINT(55.20 25.00)", srid=4326)),
+            Driver(driver_id="full", status="busy", location=WKTElement("POINT(55.20 25.10)", srid=4326)),
+        ]
+        orders = [
+            self.make_order("o1", (25.201, 55.201), (25.21, 55.21)),
+            self.make_order("o2", (25.001, 55.201), (25.01, 55.21)),
+            self.make_order("o3", (25.202, 55.202), (25.19, 55.19)),
+        ]
+
+        with patch("app.services.routing_service.kafka_producer") as producer, \
+             patch("app.services.routing_service.emit_sync"), \
+             patch("app.services.routing_service.socket_manager") as sockets:
+            result = engine.dispatch_batch(drivers, orders, {"north": 3, "south": 1, "full": 0})
+
+        assert result["status"] == "ok"
+        assert result["data"]["unassigned_order_ids"] == []
+        assert {p["driver_id"]: p["order_count"] for p in result["data"]["assignments"]} == {"north": 2, "south": 1}
+        assert {o.order_id: o.driver_id for o in orders} == {"o1": "north", "o2": "south", "o3": "north"}
+        assert all(o.status == "assigned" for o in orders)
+        assert drivers[0].status == "busy"
+
+        db.add_all.assert_called_once()
+        assert [a.driver_id for a in db.add_all.call_args[0][0]] == ["north", "south"]
+        db.commit.assert_called_once()
+        producer.publish_batch.assert_called_once()
+        assert len(sockets.notify_driver_assignments.call_args[0][0]) == 2
+
+    def test_zone_batch_capacity_counts_offers(self):
+        db = MagicMock()
+        db.query.return_value.filter.return_value.order_by.return_value.all.return_value = [
+            self.make_order("o1", (25.201, 55.201), (25.21, 55.21))
+        ]
+        db.query.return_value.filter.return_value.all.return_value = [
+            Driver(driver_id="idle", active_orders=0, offered_orders=0),
+            Driver(driver_id="offered", active_orders=1, offered_orders=2),
+        ]
+
+        service = OrderService(db)
+        with patch("app.services.order_service.RoutingEngine") as engine:
+            service.dispatch_zone_batch(["marina"])
+
+        assert engine.return_value.dispatch_batch.call_args[0][2] == {
+            "idle": service.MAX_CONCURRENT_ORDERS,
+            "offered": service.MAX_CONCURRENT_ORDERS - 3
+        }
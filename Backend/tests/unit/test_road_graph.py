@@ -0,0 +1,119 @@
+import os
+import numpy as np
+import pytest
+from app.core.routes_client import RoutesProviderError
+from app.optimization.polyline import encode_polyline, decode_polyline
+from app.optimization.road_graph import RoadGraph
+from app.services.road_graph_service import LocalRoutesProvider
+from app.services.travel_time_service import RouteMatrixProvider
+
+GRAPH_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'road_graph_small.json')
+
+# The bundled extract is an 8 x 8 grid (node index = row * 8 + col) with a 60 km/h
+# arterial on row 3, a northbound one-way on column 2, a southbound one on column 5
+# and a detached two-node service road at indices 64-65.
+def node(row, col):
+    return row * 8 + col
+
+def waypoint(lat, lng):
+    return {"location": {"latLng": {"latitude": lat, "longitude": lng}}}
+
+@pytest.fixture(scope="module")
+def graph():
+    return RoadGraph.load(GRAPH_PATH)
+
+class TestRoadGraph:
+
+    def test_loads_osm_extract_into_csr(self, graph):
+        assert graph.n_nodes == 66
+        assert graph.indptr.size == graph.n_nodes + 1
+        assert graph.indptr[-1] == graph.n_edges
+        # Footway between the grid corners is not routable
+        assert node(7, 7) not in graph.indices[graph.indptr[0]:graph.indptr[1]]
+
+    def test_search_methods_agree_with_full_dijkstra(self, graph):
+        full = graph.matrix(np.arange(graph.n_nodes), np.arange(graph.n_nodes))
+        rng = np.random.default_rng(7)
+        for source, target in rng.integers(0, graph.n_nodes, size=(100, 2)):
+            for method in ("bidirectional", "astar"):
+                seconds, meters, path = graph.shortest_path(source, target, method=method)
+                if np.isinf(full[source, target]):
+                    assert np.isinf(seconds) and path == []
+                else:
+                    assert np.isclose(seconds, full[source, target])
+                    assert path[0] == source and path[-1] == target
+                    assert meters > 0 or source == target
+
+    def test_one_way_streets_and_arterial(self, graph):
+        up, _, up_path = graph.shortest_path(node(0, 2), node(1, 2))
+        down, _, down_path = graph.shortest_path(node(1, 2), node(0, 2))
+        assert up_path == [node(0, 2), node(1, 2)]
+        assert len(down_path) > 2 and down > up
+
+        # Crossing the grid is faster along the 60 km/h arterial than the 25 km/h row
+        _, _, path = graph.shortest_path(node(4, 0), node(4, 7))
+        assert node(3, 3) in path
+
+    def test_unreachable_component(self, graph):
+        seconds, meters, path = graph.shortest_path(node(0, 0), 64)
+        assert np.isinf(seconds) and np.isinf(meters) and path == []
+        assert np.isinf(graph.matrix([node(0, 0)], [64])[0, 0])
+
+class TestLocalRoutesProvider:
+
+    def test_compute_route_matches_google_shape(self, graph):
+        provider = LocalRoutesProvider(graph)
+        start = (graph.lat[node(0, 0)], graph.lon[node(0, 0)])
+        end = (graph.lat[node(6, 6)] + 0.0002, graph.lon[node(6, 6)])
+        payload = {
+            "origin": waypoint(*start),
+            "destination": waypoint(*end),
+            "intermediates": [waypoint(graph.lat[node(3, 4)], graph.lon[node(3, 4)])]
+        }
+
+        route = provider.compute_route(payload, "routes.duration")
+
+        assert route["duration"].endswith("s") and int(route["duration"][:-1]) > 0
+        assert route["distanceMeters"] > 2000
+        lat, lon = decode_polyline(route["polyline"]["encodedPolyline"])
+        assert np.isclose(lat[0], start[0], atol=1e-5) and np.isclose(lat[-1], end[0], atol=1e-5)
+
+    def test_unreachable_route_raises(self, graph):
+        provider = LocalRoutesProvider(graph)
+        payload = {"origin": waypoint(graph.lat[0], graph.lon[0]), "destination": waypoint(graph.lat[64], graph.lon[64])}
+        with pytest.raises(RoutesProviderError):
+            provider.compute_route(payload)
+
+    def test_matrix_interfaces(self, graph):
+        provider = LocalRoutesProvider(graph)
+        origins = [(graph.lat[0], graph.lon[0]), (graph.lat[64], graph.lon[64])]
+        destinations = [(graph.lat[node(5, 5)], graph.lon[node(5, 5)])]
+
+        seconds = provider.fetch(origins, destinations)
+        assert seconds.shape == (2, 1) and seconds[0, 0] > 0 and np.isnan(seconds[1, 0])
+
+        elements = provider.compute_route_matrix({
+            "origins": [{"waypoint": waypoint(*p)} for p in origins],
+            "destinations": [{"waypoint": waypoint(*p)} for p in destinations]
+        })
+        assert [e["condition"] for e in elements] == ["ROUTE_EXISTS", "ROUTE_NOT_FOUND"]
+
+    def test_route_matrix_provider_falls_back_to_local_graph(self, graph):
+        class DownClient:
+            def compute_route_matrix(self, payload, field_mask):
+                raise RoutesProviderError("circuit open")
+
+        local = LocalRoutesProvider(graph)
+        provider = RouteMatrixProvider(client=DownClient(), fallback=local)
+        points = [(graph.lat[0], graph.lon[0])], [(graph.lat[node(2, 2)], graph.lon[node(2, 2)])]
+
+        assert np.allclose(provider.fetch(*points), local.fetch(*points))
+        with pytest.raises(RoutesProviderError):
+            RouteMatrixProvider(client=DownClient()).fetch(*points)
+
+def test_polyline_round_trip():
+    lat = np.array([38.5, 40.7, 43.252])
+    lon = np.array([-120.2, -120.95, -126.453])
+    encoded = encode_polyline(lat, lon)
+    assert encoded == "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+    assert np.allclose(np.column_stack(decode_polyline(encoded)), np.column_stack([lat, lon]))
@@ -0,0 +1,66 @@
+import numpy as np
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+from app.optimization.polyline import encode_polyline, simplify_polyline
+from app.services.route_geometry_service import RouteGeometry, RouteGeometryStore, detail_for_zoom, FULL_DETAIL
+
+def l_shaped_route(n=50, jitter_m=1.0, seed=0):
+    """Two straight ~2 km legs meeting at a right angle, with small GPS-like noise"""
+    rng = np.random.default_rng(seed)
+    east = np.column_stack([np.full(n, 25.20), np.linspace(55.25, 55.27, n)])
+    north = np.column_stack([np.linspace(25.20, 25.22, n)[1:], np.full(n - 1, 55.27)])
+    points = np.vstack([east, north]) + rng.normal(0, jitter_m / 111000.0, size=(2 * n - 1, 2))
+    return points[:, 0], points[:, 1]
+
+class TestSimplifyPolyline:
+
+    def test_keeps_endpoints_and_corner(self):
+        lat, lon = l_shaped_route()
+        keep = simplify_polyline(lat, lon, tolerance_m=15.0)
+        assert keep[0] == 0 and keep[-1] == lat.size - 1
+        assert keep.size <= 5
+        corner = np.argmin(np.abs(keep - 49))
+        assert abs(keep[corner] - 49) <= 2
+
+    def test_zero_tolerance_and_short_lines_keep_everything(self):
+        lat, lon = l_shaped_route(n=10)
+        assert simplify_polyline(lat, lon, 0.0).size == lat.size
+        assert np.array_equal(simplify_polyline(lat[:2], lon[:2], 50.0), [0, 1])
+
+class TestRouteGeometry:
+
+    def test_levels_shrink_with_tolerance(self):
+        lat, lon = l_shaped_route(jitter_m=4.0)
+        encoded = encode_polyline(lat, lon)
+        geometry = RouteGeometry.from_encoded(encoded)
+
+        assert geometry.encoded(FULL_DETAIL) == encoded
+        counts = [geometry.point_counts[level] for level in (FULL_DETAIL, "high", "medium", "low")]
+        assert counts == sorted(counts, reverse=True)
+        assert counts[-1] < counts[0] // 10
+        assert len(geometry.encoded("low")) < len(encoded) // 5
+        assert geometry.linestring().data.startswith("LINESTRING(55.25")
+
+    def test_detail_for_zoom(self):
+        assert detail_for_zoom(None) == FULL_DETAIL
+        assert [detail_for_zoom(z) for z in (18, 15, 13, 10)] == [FULL_DETAIL, "high", "medium", "low"]
+
+    def test_empty_polyline_has_no_geometry(self):
+        assert RouteGeometry.from_encoded("") is None
+        assert RouteGeometry.from_encoded(encode_polyline([25.2], [55.2])) is None
+
+class TestRouteGeometryStore:
+
+    def test_loads_from_db_once_then_serves_from_memory(self):
+        lat, lon = l_shaped_route()
+        db = MagicMock()
+        db.query.return_value.filter.return_value.first.return_value = SimpleNamespace(route_polyline=encode_polyline(lat, lon))
+        store = RouteGeometryStore(max_entries=1)
+
+        first = store.get(db, "a-1")
+        assert store.get(db, "a-1") is first
+        assert db.query.call_count == 1
+
+        store.put("a-2", first)
+        store.get(db, "a-1")
+        assert db.query.call_count == 2
@@ -0,0 +1,105 @@
+import asyncio
+import httpx
+import pytest
+from app.core.routes_client import RoutesClient, CircuitBreaker, RoutesProviderError, CircuitOpenError
+
+ROUTE = {"routes": [{"duration": "600s", "distanceMeters": 4200, "polyline": {"encodedPolyline": "abc"}}]}
+
+def make_client(handler, **breaker_kwargs):
+    client = RoutesClient("test-key", breaker=CircuitBreaker(**breaker_kwargs))
+    client._client = httpx.Client(transport=httpx.MockTransport(handler))
+    return client
+
+class TestRoutesClient:
+
+    def test_successful_call_records_latency(self):
+        seen = []
+        def handler(request):
+            seen.append(request.headers["X-Goog-FieldMask"])
+            return httpx.Response(200, json=ROUTE)
+
+        client = make_client(handler)
+        route = client.compute_route({"origin": {}}, "routes.duration")
+
+        assert route["distanceMeters"] == 4200
+        assert seen == ["routes.duration"]
+        stats = client.stats()
+        assert stats["ok"] == 1 and stats["circuit"] == "closed" and "p95_ms" in stats
+
+    def test_breaker_opens_then_short_circuits(self):
+        calls = []
+        def handler(request):
+            calls.append(1)
+            return httpx.Response(503, text="unavailable")
+
+        client = make_client(handler, failure_threshold=2, reset_seconds=60)
+        for _ in range(2):
+            with pytest.raises(RoutesProviderError):
+                client.compute_route({}, "routes.duration")
+        with pytest.raises(CircuitOpenError):
+            client.compute_route({}, "routes.duration")
+
+        assert len(calls) == 2
+        assert client.stats()["short_circuited"] == 1
+        assert client.stats()["circuit"] == "open"
+
+    def test_half_open_trial_closes_breaker(self):
+        responses = [httpx.Response(500), httpx.Response(200, json=ROUTE)]
+        client = make_client(lambda request: responses.pop(0), failure_threshold=1, reset_seconds=0)
+
+        with pytest.raises(RoutesProviderError):
+            client.compute_route({}, "routes.duration")
+        assert client.breaker.state == "half_open"
+
+        client.compute_route({}, "routes.duration")
+        assert client.breaker.state == "closed"
+
+    def test_slow_calls_count_as_failures(self):
+        breaker = CircuitBreaker(failure_threshold=2, slow_call_seconds=0.5)
+        breaker.record(True, 1.0)
+        breaker.record(True, 1.0)
+        assert breaker.state == "open"
+
+    def test_missing_key_and_timeouts(self):
+        with pytest.raises(RoutesProviderError):
+            RoutesClient(None).compute_route({}, "routes.duration")
+
+        def handler(request):
+            raise httpx.ReadTimeout("slow", request=request)
+        client = make_client(handler)
+        with pytest.raises(RoutesProviderError):
+            client.compute_route({}, "routes.duration")
+        assert client.stats()["timeout"] == 1
+
+    def test_compute_routes_returns_exceptions_in_place(self):
+        def handler(request):
+            if b"fail" in request.content:
+                return httpx.Response(500)
+            return httpx.Response(200, json=ROUTE)
+
+        client = make_client(handler)
+        results = client.compute_routes([({"ok": 1}, "m"), ({"fail": 1}, "m"), ({"ok": 2}, "m")])
+
+        assert results[0]["distanceMeters"] == 4200
+        assert isinstance(results[1], RoutesProviderError)
+        assert results[2]["distanceMeters"] == 4200
+
+    def test_async_interface_shares_one_client_until_closed(self):
+        client = RoutesClient("test-key")
+        client._async_client = httpx.AsyncClient(
+            transport=httpx.MockTransport(lambda request: httpx.Response(200, json=ROUTE))
+        )
+        pool = client._async_client
+
+        async def run():
+            routes = await client.acompute_routes([({}, "m"), ({}, "m")])
+            matrix = await client.acompute_route_matrix({}, "m")
+            assert client.async_client is pool
+            await client.aclose()
+            return routes, matrix
+
+        routes, matrix = asyncio.run(run())
+        assert [r["distanceMeters"] for r in routes] == [4200, 4200]
+        assert matrix == ROUTE
+        assert pool.is_closed and client._async_client is None
+        assert client.stats()["ok"] == 3
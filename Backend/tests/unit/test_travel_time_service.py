@@ -0,0 +1,137 @@
+import asyncio
+import numpy as np
+from datetime import datetime
+from unittest.mock import MagicMock, AsyncMock
+from app.core.routes_client import CircuitOpenError
+from app.services.travel_time_service import TravelTimeCache, FakeMatrixProvider, RouteMatrixProvider
+
+class MockRedis:
+    def __init__(self):
+        self.store = {}
+
+    def mget(self, keys):
+        return [self.store.get(k) for k in keys]
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def setex(self, key, ttl, value):
+        self.store[key] = str(value)
+
+    def execute(self):
+        pass
+
+NOON = datetime(2026, 1, 5, 12, 0)
+
+class TestTravelTimeCache:
+
+    def test_misses_are_chunked_into_provider_batches(self):
+        provider = FakeMatrixProvider()
+        cache = TravelTimeCache(provider=provider, redis=None)
+
+        origins = [(25.05 + i * 0.01, 55.10) for i in range(30)]
+        destinations = [(25.20, 55.15 + j * 0.01) for j in range(12)]
+        matrix = cache.get_matrix(origins, destinations, now=NOON)
+
+        assert matrix.shape == (30, 12)
+        assert np.isfinite(matrix).all()
+        # 30 x 12 misses with 25 origins / 100 elements per call -> (25 x 4) x 3 + (5 x 12) x 1
+        assert provider.calls == 4
+        assert provider.elements == 360
+        assert cache.stats()["misses"] == 360
+
+    def test_local_tier_serves_nearby_points_in_same_bucket(self):
+        provider = FakeMatrixProvider()
+        cache = TravelTimeCache(provider=provider, redis=None)
+
+        first = cache.get_pairs([(25.1001, 55.2001)], [(25.2001, 55.3001)], now=NOON)
+        again = cache.get_pairs([(25.1003, 55.2003)], [(25.2003, 55.3003)], now=NOON.replace(minute=10))
+
+        assert provider.calls == 1
+        assert again[0] == first[0]
+        assert cache.stats()["local_hits"] == 1
+
+        cache.get_pairs([(25.1001, 55.2001)], [(25.2001, 55.3001)], now=NOON.replace(minute=20))
+        assert provider.calls == 2
+
+    def test_redis_tier_shared_between_instances(self):
+        redis = MockRedis()
+        provider = FakeMatrixProvider()
+        warm = TravelTimeCache(provider=provider, redis=redis)
+        cold = TravelTimeCache(provider=provider, redis=redis)
+
+        pairs = ([(25.10, 55.20), (25.12, 55.22)], [(25.20, 55.30), (25.21, 55.31)])
+        expected = warm.get_pairs(*pairs, now=NOON)
+        calls = provider.calls
+        result = cold.get_pairs(*pairs, now=NOON)
+
+        assert provider.calls == calls
+        assert np.allclose(result, expected, atol=0.1)
+        assert cold.stats()["redis_hits"] == 2
+
+    def test_local_tier_evicts_least_recently_used(self):
+        cache = TravelTimeCache(provider=FakeMatrixProvider(), redis=None, max_local_entries=2)
+
+        for lat in (25.10, 25.20, 25.30):
+            cache.get_pairs([(lat, 55.20)], [(25.0, 55.0)], now=NOON)
+
+        assert cache.stats()["local_entries"] == 2
+        assert cache._local_get(cache.key((25.10, 55.20), (25.0, 55.0), NOON)) is None
+
+    def test_ttl_expiry_and_missing_provider(self):
+        cache = TravelTimeCache(provider=FakeMatrixProvider(), redis=None, ttl_seconds=-1)
+        cache.get_pairs([(25.10, 55.20)], [(25.20, 55.30)], now=NOON)
+        assert cache.stats()["local_hits"] == 0
+        assert cache._local_get(cache.key((25.10, 55.20), (25.20, 55.30), NOON)) is None
+
+        offline = TravelTimeCache(provider=None, redis=None)
+        result = offline.get_pairs([(25.10, 55.20), (25.10, 55.20)], [(25.20, 55.30), (25.10, 55.20)], now=NOON)
+        assert np.isnan(result[0]) and result[1] == 0.0
+
+    def test_sparse_pairs_are_not_fetched_as_a_cross_product(self):
+        provider = FakeMatrixProvider()
+        cache = TravelTimeCache(provider=provider, redis=None)
+
+        # Allocation-style k-nearest pairs: each driver wants 3 of 20 zones, mostly different ones
+        rng = np.random.default_rng(4)
+        drivers = [(25.05 + i * 0.01, 55.10) for i in range(20)]
+        zones = [(25.20, 55.15 + j * 0.01) for j in range(20)]
+        origins, destinations = [], []
+        for i, driver in enumerate(drivers):
+            for j in rng.choice(20, 3, replace=False):
+                origins.append(driver)
+                destinations.append(zones[j])
+
+        result = cache.get_pairs(origins, destinations, now=NOON)
+
+        assert np.isfinite(result).all()
+        assert cache.stats()["misses"] == 60
+        assert provider.elements <= cache.max_overfetch * 60
+
+    def test_same_destination_sets_share_one_call(self):
+        provider = FakeMatrixProvider()
+        cache = TravelTimeCache(provider=provider, redis=None)
+
+        a, b = (25.10, 55.20), (25.12, 55.22)
+        x, y = (25.20, 55.30), (25.21, 55.31)
+        cache.get_pairs([a, a, b, b], [x, y, x, y], now=NOON)
+        assert provider.calls == 1 and provider.elements == 4
+
+        cache.get_pairs([a, b], [(25.30, 55.40), (25.31, 55.41)], now=NOON)
+        # Disjoint destinations would double the elements, so they stay separate calls
+        assert provider.calls == 3 and provider.elements == 6
+
+
+class TestRouteMatrixProvider:
+
+    def test_async_fetch_falls_back_to_local_router(self):
+        client = MagicMock()
+        client.acompute_route_matrix = AsyncMock(side_effect=CircuitOpenError("open"))
+        fallback = MagicMock()
+        fallback.fetch.return_value = np.array([[60.0]])
+
+        provider = RouteMatrixProvider(client=client, fallback=fallback)
+        seconds = asyncio.run(provider.afetch([(25.10, 55.20)], [(25.20, 55.30)]))
+
+        assert seconds[0, 0] == 60.0
+        fallback.fetch.assert_called_once_with([(25.10, 55.20)], [(25.20, 55.30)])
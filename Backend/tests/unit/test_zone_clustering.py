@@ -0,0 +1,44 @@
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+from geoalchemy2.elements import WKTElement
+from app.models.zone import Zone
+from app.services.allocation_service import AllocationService
+from app.services.zone_snapshot_service import ZoneSnapshot
+from app.services.zone_pressure_service import ZonePressureIndex, ZonePressureTracker
+from ml.zone_clustering import ZoneClusteringService
+from tests.fakes import MockRedis
+
+def empty_snapshot():
+    return ZoneSnapshot({}, {}, built_at=datetime.utcnow())
+
+class TestGenerateZones:
+
+    def test_regenerated_zones_reach_allocation(self):
+        index = ZonePressureIndex(redis=MockRedis())
+        index.seed(empty_snapshot(), [Zone(zone_id="zone_old", centroid=WKTElement('POINT(55.14 25.08)', srid=4326))])
+
+        orders = [SimpleNamespace(pickup_latitude=25.08 + i * 0.0001, pickup_longitude=55.14) for i in range(6)]
+        driver = SimpleNamespace(
+            driver_id="d1", duty_status="on_duty", status="available", current_zone="zone_old",
+            location=WKTElement('POINT(55.14 25.08)', srid=4326)
+        )
+        db = MagicMock()
+        db.query.return_value.filter.return_value.all.side_effect = [orders, [driver], orders]
+        db.query.return_value.filter.return_value.first.return_value = driver
+
+        with patch("app.services.allocation_service.zone_pressure_index", index), \
+             patch("app.services.allocation_service.zone_pressure_tracker", ZonePressureTracker()), \
+             patch.object(AllocationService, "get_zone_snapshot", return_value=empty_snapshot()), \
+             patch("app.services.allocation_service.emit_sync"), \
+             patch("app.services.order_service.OrderService.assign_zones_bulk"), \
+             patch("ml.zone_clustering.build_zone_index"), \
+             patch("ml.zone_clustering.hot_zone_cache"), \
+             patch.object(ZoneClusteringService, "_get_neighborhood_name", return_value="Marina"):
+            result = ZoneClusteringService(db).generate_zones()
+            assert result["zones_created"] == 1
+            assert driver.current_zone == "zone_marina"
+
+            driver.current_zone = None
+            AllocationService(db).allocate_driver("d1")
+            assert driver.current_zone == "zone_marina"
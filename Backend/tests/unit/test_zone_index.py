@@ -0,0 +1,97 @@
+import numpy as np
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+from shapely.geometry import Point, box
+from geoalchemy2.elements import WKTElement
+from app.optimization.zone_index import ZoneIndex
+from app.models.zone import Zone
+from app.services.zone_index_service import ZoneIndexCache, _collect_zone_changes, _publish_zone_changes
+from app.services.order_service import OrderService
+from tests.fakes import MockRedis
+
+def make_index():
+    # "marina" and "jlt" overlap on 55.15-55.16; "creek" has no boundary
+    return ZoneIndex(
+        ["marina", "jlt", "creek"],
+        [box(55.13, 25.07, 55.16, 25.10), box(55.15, 25.06, 55.18, 25.09), None],
+        [Point(55.145, 25.085), Point(55.165, 25.075), Point(55.33, 25.26)]
+    )
+
+class TestZoneIndex:
+
+    def test_point_in_polygon_then_nearest_centroid(self):
+        index = make_index()
+        lat = np.array([25.08, 25.065, 25.25, 25.08, np.nan])
+        lon = np.array([55.14, 55.17, 55.30, 55.155, 55.20])
+
+        zones = index.lookup(lat, lon)
+
+        assert list(zones[:3]) == ["marina", "jlt", "creek"]
+        assert zones[3] in ("marina", "jlt")
+        assert zones[4] is None
+
+    def test_bulk_matches_single_lookups(self):
+        index = make_index()
+        rng = np.random.default_rng(3)
+        lat = rng.uniform(25.0, 25.3, 500)
+        lon = rng.uniform(55.1, 55.4, 500)
+        bulk = index.lookup(lat, lon)
+        assert all(index.lookup_one(a, b) == z for a, b, z in zip(lat, lon, bulk))
+
+    def test_empty_index(self):
+        assert ZoneIndex([], [], []).lookup_one(25.1, 55.1) is None
+        assert make_index().lookup_one(None, 55.1) is None
+
+def zone_rows_db():
+    db = MagicMock()
+    db.query.return_value.all.return_value = [
+        SimpleNamespace(
+            zone_id="marina",
+            boundary=WKTElement("POLYGON((55.13 25.07, 55.16 25.07, 55.16 25.10, 55.13 25.10, 55.13 25.07))", srid=4326),
+            centroid=WKTElement("POINT(55.145 25.085)", srid=4326)
+        )
+    ]
+    return db
+
+class TestZoneIndexCache:
+
+    def test_builds_from_zone_rows_and_rebuilds_on_refresh(self):
+        db = zone_rows_db()
+        cache = ZoneIndexCache(redis=MockRedis())
+
+        index = cache.get(db)
+        assert cache.get(db) is index
+        assert index.lookup_one(25.08, 55.14) == "marina"
+        assert cache.refresh(db) is not index
+        assert db.query.call_count == 2
+
+    def test_published_version_rebuilds_other_workers(self):
+        redis = MockRedis()
+        db = zone_rows_db()
+        worker, regenerating = ZoneIndexCache(redis=redis), ZoneIndexCache(redis=redis)
+
+        index = worker.get(db)
+        regenerating.publish()
+        assert worker.get(db) is not index
+        assert db.query.call_count == 2
+
+    def test_committed_zone_changes_publish(self):
+        session = SimpleNamespace(new=[Zone(zone_id="marina")], dirty=[], deleted=[], info={})
+        with patch("app.services.zone_index_service.zone_index_cache") as cache:
+            _collect_zone_changes(session, None)
+            _publish_zone_changes(session)
+            _publish_zone_changes(session)
+
+        cache.publish.assert_called_once()
+
+def test_assign_zones_bulk_sets_pickup_and_dropoff():
+    orders = [
+        SimpleNamespace(pickup_latitude=25.08, pickup_longitude=55.14, dropoff_latitude=25.065, dropoff_longitude=55.17),
+        SimpleNamespace(pickup_latitude=None, pickup_longitude=None, dropoff_latitude=25.25, dropoff_longitude=55.30),
+    ]
+    with patch("app.services.order_service.zone_index_cache") as cache:
+        cache.get.return_value = make_index()
+        OrderService(MagicMock()).assign_zones_bulk(orders)
+
+    assert (orders[0].pickup_zone, orders[0].dropoff_zone) == ("marina", "jlt")
+    assert (orders[1].pickup_zone, orders[1].dropoff_zone) == (None, "creek")
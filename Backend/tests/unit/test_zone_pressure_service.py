@@ -0,0 +1,117 @@
+from datetime import datetime, timedelta
+from geoalchemy2.elements import WKTElement
+from app.models.zone import Zone
+from app.services.zone_snapshot_service import ZoneSnapshot
+from app.services.zone_pressure_service import ZonePressureTracker, SURGE, SURPLUS, BALANCED
+from tests.fakes import MockRedis
+
+def make_zones():
+    return [
+        Zone(zone_id="A", centroid=WKTElement('POINT(55.14 25.08)', srid=4326)),
+        Zone(zone_id="B", centroid=WKTElement('POINT(55.15 25.09)', srid=4326)),
+        Zone(zone_id="C", centroid=WKTElement('POINT(54.38 24.45)', srid=4326)),  # Abu Dhabi
+    ]
+
+def seeded_tracker(drivers_by_zone=None, orders_by_zone=None):
+    tracker = ZonePressureTracker()
+    snapshot = ZoneSnapshot(drivers_by_zone or {}, orders_by_zone or {}, built_at=datetime.utcnow())
+    tracker.seed(snapshot, make_zones(), surge_ratio=3.0, idle_threshold=2, driver_capacity=1.5,
+                 neighbour_k=3, neighbour_max_minutes=40.0)
+    return tracker
+
+class TestZonePressureTracker:
+
+    def test_seed_marks_unbalanced_zones_dirty(self):
+        tracker = seeded_tracker(
+            drivers_by_zone={"A": {"available": 5}},
+            orders_by_zone={"B": {"pending": 4, "recent": 0}}
+        )
+        assert tracker.zone_class("A") == SURPLUS
+        assert tracker.zone_class("B") == SURGE
+        assert tracker.pop_dirty() == {"A", "B"}
+        assert tracker.pop_dirty() == set()
+
+    def test_orders_push_zone_over_surge_threshold(self):
+        tracker = seeded_tracker(drivers_by_zone={"A": {"available": 1}})
+        tracker.pop_dirty()
+
+        # 1 available driver -> supply 1.5; pending + 0.5 * recent must exceed 4.5
+        for _ in range(4):
+            tracker.order_changed(None, ("A", "pending"), created_at=datetime.utcnow(), is_new=True)
+        assert tracker.pop_dirty() == {"A"}
+        assert tracker.zone_stats(["A"])["A"]["pending_orders"] == 4
+
+        # Offering the orders drops pending pressure back below the boundary
+        for _ in range(4):
+            tracker.order_changed(("A", "pending"), ("A", "offered"))
+        assert tracker.zone_class("A") == BALANCED
+        assert tracker.pop_dirty() == {"A"}
+
+    def test_driver_moves_update_counts(self):
+        tracker = seeded_tracker(drivers_by_zone={"A": {"available": 3}})
+        tracker.pop_dirty()
+
+        tracker.driver_changed(("A", "available"), ("B", "available"))
+        stats = tracker.zone_stats(["A", "B"])
+        assert stats["A"]["available_drivers"] == 2 and stats["B"]["available_drivers"] == 1
+        assert tracker.pop_dirty() == {"A"}  # A is no longer surplus
+
+        tracker.driver_changed(("B", "available"), None)  # goes off duty
+        assert tracker.zone_stats(["B"])["B"]["total_drivers"] == 0
+
+    def test_recent_orders_expire(self):
+        tracker = seeded_tracker()
+        tracker.pop_dirty()
+        old = datetime.utcnow() - timedelta(minutes=14, seconds=59)
+        tracker.order_changed(None, ("A", "assigned"), created_at=old, is_new=True)
+        assert tracker.zone_stats(["A"])["A"]["recent_orders"] == 1
+
+        tracker.recent_window = timedelta(minutes=10)
+        tracker.pop_dirty()
+        assert tracker.zone_stats(["A"])["A"]["recent_orders"] == 0
+
+    def test_neighbourhood_excludes_distant_zones(self):
+        tracker = seeded_tracker()
+        assert tracker.neighbourhood(["A"]) == {"A", "B"}
+        assert tracker.neighbourhood(["C"]) == {"C"}
+
+
+class TestZonePressureIndex:
+
+    def seeded_index(self):
+        from app.services.zone_pressure_service import ZonePressureIndex
+        index = ZonePressureIndex(redis=MockRedis())
+        snapshot = ZoneSnapshot(
+            {"A": {"available": 2, "busy": 1}, "B": {"available": 0}},
+            {"A": {"pending": 1, "recent": 2}, "B": {"pending": 3, "recent": 0}},
+            built_at=datetime.utcnow()
+        )
+        index.seed(snapshot, make_zones())
+        return index, snapshot
+
+    def test_read_matches_snapshot_pressure(self):
+        index, snapshot = self.seeded_index()
+        view = index.read(driver_capacity=1.5)
+
+        assert view.zone_ids == ["A", "B", "C"]
+        for i, zone_id in enumerate(view.zone_ids):
+            assert round(view.pressure[i], 2) == snapshot.zone_stats(zone_id, 1.5)["demand_pressure"]
+        assert abs(view.lat[0] - 25.08) < 1e-9 and abs(view.lon[0] - 55.14) < 1e-9
+
+    def test_apply_committed_changes(self):
+        index, _ = self.seeded_index()
+        index.apply([
+            ("driver", ("A", "available"), ("B", "available"), None, False),
+            ("driver", ("A", "available"), ("A", "busy"), None, False),
+            ("order", None, ("C", "pending"), datetime.utcnow(), True),
+            ("order", ("B", "pending"), ("B", "offered"), datetime.utcnow(), False),
+        ])
+        view = index.read(driver_capacity=1.0)
+
+        assert list(view.available) == [0, 1, 0]
+        assert list(view.pending) == [1, 2, 1]
+        assert list(view.recent) == [2, 0, 1]
+
+    def test_unseeded_index_reads_none(self):
+        from app.services.zone_pressure_service import ZonePressureIndex
+        assert ZonePressureIndex(redis=MockRedis()).read(driver_capacity=1.5) is None